@@ -291,7 +291,7 @@ async function loadFeedback() {
 // Load knowledge base
 async function loadKnowledgeBase() {
     try {
-        const response = await fetch('http://localhost:5000/api/admin/knowledge-base', {
+        const response = await fetch('http://localhost:5000/api/admin/knowledge-base?include_content=true', {
             headers: {
                 'Authorization': `Bearer ${currentToken}`
             }
@@ -350,12 +350,8 @@ function addKnowledgeEntry() {
     }
 }
 
-// Auto-refresh dashboard every 30 seconds
-setInterval(() => {
-    if (document.getElementById('dashboard').classList.contains('active')) {
-        loadDashboardData();
-    }
-}, 30000);// admin.js - Complete real data integration
+// Dashboard updates are pushed over /api/admin/stream (see startDashboardStream below)
+// admin.js - Complete real data integration
 currentToken = localStorage.getItem('adminToken') || localStorage.getItem('token');
 let currentSection = 'dashboard';
 const API_BASE = 'http://localhost:5000/api';
@@ -423,21 +419,8 @@ async function loadDashboardStats() {
         if (!response.ok) throw new Error('Failed to fetch stats');
         
         const data = await response.json();
-        
-        // Update stat cards with real data
-        animateCounter('totalUsers', data.total_users);
-        animateCounter('totalQueries', data.total_queries);
-        animateCounter('healthTopics', data.health_topics);
-        document.getElementById('positiveFeedback').textContent = `${data.positive_feedback_percentage}%`;
-        
-        // Update subtexts
-        document.getElementById('activeUsers').textContent = `${data.active_users} active`;
-        document.getElementById('totalConversations').textContent = `${data.total_conversations} conversations`;
-        document.getElementById('totalFeedback').textContent = `${data.positive_feedback_percentage > 0 ? 'With ratings' : 'No ratings yet'}`;
-        
-        // Create charts with real data
-        createQueryTrendsChart(data.query_trends);
-        createIntentsChart(data.top_intents);
+        dashboardStats = data;
+        renderDashboardStats(data);
         
         // Load recent activities
         loadRecentActivity(data.recent_activities);
@@ -448,12 +431,38 @@ async function loadDashboardStats() {
     }
 }
 
-// Load knowledge base with real data
-async function loadKnowledgeBase() {
+// Update stat cards and charts; `changed` limits the update to the keys of a pushed delta
+function renderDashboardStats(data, changed = null) {
+    const has = key => !changed || key in changed;
+    
+    // Update stat cards with real data
+    if (has('total_users')) animateCounter('totalUsers', data.total_users);
+    if (has('total_queries')) animateCounter('totalQueries', data.total_queries);
+    if (has('health_topics')) animateCounter('healthTopics', data.health_topics);
+    document.getElementById('positiveFeedback').textContent = `${data.positive_feedback_percentage}%`;
+    
+    // Update subtexts
+    document.getElementById('activeUsers').textContent = `${data.active_users} active`;
+    document.getElementById('totalConversations').textContent = `${data.total_conversations} conversations`;
+    document.getElementById('totalFeedback').textContent = `${data.positive_feedback_percentage > 0 ? 'With ratings' : 'No ratings yet'}`;
+    
+    // Create charts with real data
+    if (has('query_trends')) createQueryTrendsChart(data.query_trends);
+    if (has('top_intents')) createIntentsChart(data.top_intents);
+}
+
+// Load knowledge base with real data (one page at a time)
+let knowledgeCursor = null;
+
+async function loadKnowledgeBase(append = false) {
     try {
-        showLoading('knowledge');
+        if (!append) {
+            showLoading('knowledge');
+            knowledgeCursor = null;
+        }
         
-        const response = await fetch(`${API_BASE}/admin/knowledge-base`, {
+        const params = knowledgeCursor ? `&cursor=${encodeURIComponent(knowledgeCursor)}` : '';
+        const response = await fetch(`${API_BASE}/admin/knowledge-base?include_content=true${params}`, {
             headers: getHeaders()
         });
         
@@ -461,7 +470,10 @@ async function loadKnowledgeBase() {
         
         const data = await response.json();
         const table = document.getElementById('knowledgeTable');
-        table.innerHTML = '';
+        if (!append) table.innerHTML = '';
+        
+        knowledgeCursor = data.next_cursor;
+        document.getElementById('knowledgeLoadMore').style.display = data.has_more ? 'inline-block' : 'none';
         
         data.knowledge_base.forEach(entry => {
             const row = document.createElement('tr');
@@ -495,12 +507,20 @@ async function loadKnowledgeBase() {
     }
 }
 
-// Load users with real data
-async function loadUsers() {
+// Load users with real data (one page at a time)
+let usersCursor = null;
+let usersLoaded = 0;
+
+async function loadUsers(append = false) {
     try {
-        showLoading('users');
+        if (!append) {
+            showLoading('users');
+            usersCursor = null;
+            usersLoaded = 0;
+        }
         
-        const response = await fetch(`${API_BASE}/admin/users`, {
+        const params = usersCursor ? `?cursor=${encodeURIComponent(usersCursor)}` : '';
+        const response = await fetch(`${API_BASE}/admin/users${params}`, {
             headers: getHeaders()
         });
         
@@ -508,9 +528,12 @@ async function loadUsers() {
         
         const data = await response.json();
         const table = document.getElementById('usersTable');
-        table.innerHTML = '';
+        if (!append) table.innerHTML = '';
         
-        document.getElementById('usersCount').textContent = `Total: ${data.users.length} users`;
+        usersCursor = data.next_cursor;
+        usersLoaded += data.users.length;
+        document.getElementById('usersCount').textContent = `Showing ${usersLoaded} users${data.has_more ? '+' : ''}`;
+        document.getElementById('usersLoadMore').style.display = data.has_more ? 'inline-block' : 'none';
         
         data.users.forEach(user => {
             const row = document.createElement('tr');
@@ -586,12 +609,19 @@ async function loadQueries() {
     }
 }
 
-// Load feedback with real data
-async function loadFeedback() {
+// Load feedback with real data (one page at a time)
+let feedbackCursor = null;
+
+async function loadFeedback(append = false) {
     try {
-        showLoading('feedback');
+        if (!append) {
+            showLoading('feedback');
+            feedbackCursor = null;
+            loadFeedbackTotals();
+        }
         
-        const response = await fetch(`${API_BASE}/admin/feedback`, {
+        const params = feedbackCursor ? `?cursor=${encodeURIComponent(feedbackCursor)}` : '';
+        const response = await fetch(`${API_BASE}/admin/feedback${params}`, {
             headers: getHeaders()
         });
         
@@ -599,25 +629,21 @@ async function loadFeedback() {
         
         const data = await response.json();
         const table = document.getElementById('feedbackTable');
-        table.innerHTML = '';
-        
-        // Calculate feedback stats
-        const total = data.feedback.length;
-        const positive = data.feedback.filter(f => f.rating === 'positive').length;
-        const positivePercent = total > 0 ? Math.round((positive / total) * 100) : 0;
+        if (!append) table.innerHTML = '';
         
-        document.getElementById('feedbackInfo').textContent = 
-            `${positivePercent}% Positive (${positive}/${total} feedbacks)`;
+        feedbackCursor = data.next_cursor;
+        document.getElementById('feedbackLoadMore').style.display = data.has_more ? 'inline-block' : 'none';
         
         data.feedback.forEach(fb => {
             const row = document.createElement('tr');
             const date = new Date(fb.created_at).toLocaleDateString();
-            const messagePreview = fb.message.length > 50 ? 
-                fb.message.substring(0, 50) + '...' : fb.message;
+            const message = fb.user_message || fb.bot_response || '';
+            const messagePreview = message.length > 50 ? 
+                message.substring(0, 50) + '...' : message;
             
             row.innerHTML = `
                 <td>${fb.user_email}</td>
-                <td title="${fb.message}">${messagePreview}</td>
+                <td title="${message}">${messagePreview}</td>
                 <td class="${fb.rating === 'positive' ? 'rating-positive' : 'rating-negative'}">
                     ${fb.rating === 'positive' ? '👍 Positive' : '👎 Negative'}
                 </td>
@@ -633,6 +659,24 @@ async function loadFeedback() {
     }
 }
 
+// Feedback totals come from the dashboard rollups, not from the loaded page
+async function loadFeedbackTotals() {
+    try {
+        const response = await fetch(`${API_BASE}/admin/dashboard/stats`, {
+            headers: getHeaders()
+        });
+        
+        if (!response.ok) throw new Error('Failed to fetch feedback totals');
+        
+        const data = await response.json();
+        document.getElementById('feedbackInfo').textContent = 
+            `${Math.round(data.positive_feedback_percentage)}% Positive (${data.positive_feedback_count}/${data.total_feedback_count} feedbacks)`;
+        
+    } catch (error) {
+        console.error('Error loading feedback totals:', error);
+    }
+}
+
 // Load activities with real data
 async function loadActivities() {
     try {
@@ -742,7 +786,7 @@ function showKnowledgeForm(entry = null) {
         document.getElementById('content').value = entry.content;
         document.getElementById('language').value = entry.language;
         document.getElementById('tags').value = entry.tags.join(', ');
-        document.getElementById('source').value = entry.source;
+        document.getElementById('source').value = entry.source || '';
         document.getElementById('isActive').checked = entry.is_active;
     } else {
         formTitle.textContent = '➕ Add New Health Information';
@@ -803,18 +847,14 @@ document.getElementById('knowledgeEntryForm').addEventListener('submit', async (
 
 async function editKnowledgeEntry(id) {
     try {
-        const response = await fetch(`${API_BASE}/admin/knowledge-base`, {
+        // The listing is paged, so the entry may not be on a loaded page
+        const response = await fetch(`${API_BASE}/admin/knowledge-base/${id}`, {
             headers: getHeaders()
         });
         
-        if (!response.ok) throw new Error('Failed to fetch entries');
+        if (!response.ok) throw new Error('Failed to fetch entry');
         
-        const data = await response.json();
-        const entry = data.knowledge_base.find(e => e.id === id);
-        
-        if (entry) {
-            showKnowledgeForm(entry);
-        }
+        showKnowledgeForm(await response.json());
     } catch (error) {
         console.error('Error editing entry:', error);
         showError('Failed to load entry for editing');
@@ -923,6 +963,7 @@ function createQueryTrendsChart(trends) {
         return trend ? trend.count : 0;
     });
     
+    Chart.getChart(ctx.canvas)?.destroy();
     new Chart(ctx, {
         type: 'line',
         data: {
@@ -966,6 +1007,7 @@ function createIntentsChart(intents) {
     const labels = intents.map(i => i.intent ? i.intent.replace('_', ' ').toUpperCase() : 'GENERAL');
     const counts = intents.map(i => i.count);
     
+    Chart.getChart(ctx.canvas)?.destroy();
     new Chart(ctx, {
         type: 'doughnut',
         data: {
@@ -998,6 +1040,7 @@ function createIntentsChart(intents) {
 function animateCounter(elementId, targetValue) {
     const element = document.getElementById(elementId);
     const current = parseInt(element.textContent) || 0;
+    if (current === targetValue) return;
     const increment = targetValue > current ? 1 : -1;
     
     let currentValue = current;
@@ -1082,14 +1125,80 @@ function logout() {
     window.location.href = '/';
 }
 
-// Auto-refresh dashboard every 30 seconds
-setInterval(() => {
-    if (currentSection === 'dashboard') {
-        loadDashboardStats();
+// Live dashboard: server-pushed snapshot + deltas, falling back to 30-second polling
+let dashboardStats = null;
+let dashboardStream = null;
+let dashboardPollTimer = null;
+
+async function startDashboardStream() {
+    if (!window.EventSource) {
+        startDashboardPolling();
+        return;
     }
-}, 30000);
+    
+    // EventSource can't send headers, so the stream is opened with a short-lived
+    // stream token in the query string instead of the session token
+    let streamToken;
+    try {
+        const response = await fetch(`${API_BASE}/admin/stream-token`, {
+            method: 'POST',
+            headers: getHeaders()
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        streamToken = (await response.json()).token;
+    } catch (error) {
+        console.error('Dashboard stream unavailable:', error);
+        startDashboardPolling();
+        return;
+    }
+    
+    let opened = false;
+    dashboardStream = new EventSource(`${API_BASE}/admin/stream?token=${encodeURIComponent(streamToken)}`);
+    
+    dashboardStream.addEventListener('open', () => {
+        opened = true;
+        stopDashboardPolling();
+    });
+    
+    dashboardStream.addEventListener('snapshot', (e) => {
+        dashboardStats = JSON.parse(e.data);
+        if (currentSection === 'dashboard') renderDashboardStats(dashboardStats);
+    });
+    
+    dashboardStream.addEventListener('delta', (e) => {
+        const changed = JSON.parse(e.data);
+        dashboardStats = Object.assign(dashboardStats || {}, changed);
+        if (currentSection === 'dashboard') renderDashboardStats(dashboardStats, changed);
+    });
+    
+    dashboardStream.onerror = () => {
+        // The stream token expires soon after opening, so the browser's own reconnect
+        // would be refused: reconnect with a fresh token, or poll if the stream was refused
+        dashboardStream.close();
+        dashboardStream = null;
+        startDashboardPolling();
+        if (opened) {
+            setTimeout(startDashboardStream, 1000);
+        }
+    };
+}
+
+function startDashboardPolling() {
+    if (dashboardPollTimer) return;
+    dashboardPollTimer = setInterval(() => {
+        if (currentSection === 'dashboard') {
+            loadDashboardStats();
+        }
+    }, 30000);
+}
+
+function stopDashboardPolling() {
+    clearInterval(dashboardPollTimer);
+    dashboardPollTimer = null;
+}
 
 // Initialize on load
 document.addEventListener('DOMContentLoaded', () => {
     loadDashboardStats();
+    startDashboardStream();
 });
\ No newline at end of file
@@ -1,103 +1,233 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, send_file
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 import jwt
+import codecs
 import datetime
+import io
 from functools import wraps
+from collections import namedtuple
 import json
-import requests
-from sqlalchemy import func, desc
+import logging
+import os
+import time
+import click
+from sqlalchemy import event, func, desc, select, tuple_, case, literal, union_all
+from sqlalchemy.orm import aliased
+from intent_matcher import intent_matcher
+from intent_classifier import IntentClassifier, load_nlu_examples, load_domain_responses, train_model, save_model
+from response_index import ResponseIndex, BUILTIN_RESPONSES
+from retrieval import RetrievalIndex
+from chat_store import ChatStore
+from models import (
+    db, User, Conversation, Message, ArchivedConversation, ArchivedRatedMessage, Feedback, HealthKnowledgeBase,
+    IdAllocation, StatsDaily, StatsCounter, DailyActiveUser, StatsWatermark, AdminActivity, SchemaMigration
+)
+from storage import engine_options, normalize_url, read_replica, dispose_engines, REPLICA_BIND
+from db_tuning import install_sqlite_pragmas, sqlite_pragmas, install_query_timing
+from migrations import upgrade as upgrade_schema, status as schema_status
+from pagination import encode_cursor, decode_cursor, page_size
+from rollups import Rollups
+from dashboard_events import DashboardPublisher
+from auth_cache import AuthCache
+from profile_cache import ProfileCache, LastLoginWriter, PROFILE_COLUMNS, make_profile
+from rasa_gateway import RasaGateway
+from response_cache import ResponseCache
+from instrumentation import Registry, instrument_app, setup_logging
+from profiler import SamplingProfiler
+from archive import ConversationArchive
+from kb_pipeline import KnowledgeBaseImporter, FORMATS as KB_IMPORT_FORMATS, format_for, read as read_knowledge_base, export_rows, to_ndjson, to_csv
+from config import Config
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 # ==================== CONFIGURATION ====================
 app.config['SECRET_KEY'] = 'wellbot-secret-key-2024-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///wellbot.db'
+# DATABASE_URL; relative SQLite paths resolve against the instance folder, as the old hard-coded URI did
+app.config['SQLALCHEMY_DATABASE_URI'] = normalize_url(Config.SQLALCHEMY_DATABASE_URI)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+def database_engine_options(url):
+    """Pool and session settings for the engine behind url (see storage.engine_options)"""
+    return engine_options(
+        url,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=Config.DB_POOL_RECYCLE_SECONDS,
+        statement_timeout_ms=Config.DB_STATEMENT_TIMEOUT_MS
+    )
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# Admin analytics routes (@read_replica) read from here when it is set
+if Config.DATABASE_REPLICA_URL:
+    replica_url = normalize_url(Config.DATABASE_REPLICA_URL)
+    app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: dict(database_engine_options(replica_url), url=replica_url)}
 app.config['JSON_SORT_KEYS'] = False
 
 # Rasa Configuration
 RASA_API_URL = "http://localhost:5005/webhooks/rest/webhook"
 USE_RASA = False  # Set to True if Rasa is running
 
-db = SQLAlchemy(app)
-
-# ==================== DATABASE MODELS ====================
-
-class User(db.Model):
-    __tablename__ = 'users'
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(255), nullable=False)
-    email = db.Column(db.String(255), unique=True, nullable=False)
-    password_hash = db.Column(db.String(255), nullable=False)
-    preferred_language = db.Column(db.String(50), default='en')
-    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    age_group = db.Column(db.String(50))
-    gender = db.Column(db.String(50))
-    exercise_hours = db.Column(db.String(50))
-    health_conditions = db.Column(db.Text)
-    role = db.Column(db.String(20), default='user')
-    last_login = db.Column(db.DateTime)
-    is_active = db.Column(db.Boolean, default=True)
-    conversations = db.relationship('Conversation', backref='user', lazy=True, cascade='all, delete-orphan')
-    feedbacks = db.relationship('Feedback', backref='user', lazy=True)
-
-class Conversation(db.Model):
-    __tablename__ = 'conversations'
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    start_time = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    end_time = db.Column(db.DateTime)
-    messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
-
-class Message(db.Model):
-    __tablename__ = 'messages'
-    id = db.Column(db.Integer, primary_key=True)
-    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
-    sender = db.Column(db.String(50), nullable=False)  # 'user' or 'bot'
-    message = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    intent = db.Column(db.String(100))
-    confidence = db.Column(db.Float, default=0.0)
-
-class Feedback(db.Model):
-    __tablename__ = 'feedback'
-    id = db.Column(db.Integer, primary_key=True)
-    message_id = db.Column(db.Integer, db.ForeignKey('messages.id'))
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    rating = db.Column(db.String(20))  # 'positive' or 'negative'
-    comment = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-
-class HealthKnowledgeBase(db.Model):
-    __tablename__ = 'health_knowledge_base'
-    id = db.Column(db.Integer, primary_key=True)
-    category = db.Column(db.String(100), nullable=False)
-    title = db.Column(db.String(255), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    language = db.Column(db.String(10), default='en')
-    tags = db.Column(db.Text)
-    is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
-
-class AdminActivity(db.Model):
-    __tablename__ = 'admin_activities'
-    id = db.Column(db.Integer, primary_key=True)
-    admin_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    action = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text)
-    ip_address = db.Column(db.String(50))
-    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+# Pooled, bounded and circuit-broken so a slow Rasa can't stall chat requests
+rasa_gateway = RasaGateway(
+    RASA_API_URL,
+    connect_timeout=Config.RASA_CONNECT_TIMEOUT,
+    read_timeout=Config.RASA_READ_TIMEOUT,
+    pool_size=Config.RASA_POOL_SIZE,
+    max_concurrent=Config.RASA_MAX_CONCURRENT,
+    failure_threshold=Config.RASA_FAILURE_THRESHOLD,
+    probe_interval=Config.RASA_PROBE_INTERVAL_SECONDS,
+    cache_size=Config.RASA_CACHE_SIZE,
+    cache_ttl=Config.RASA_CACHE_TTL_SECONDS,
+    cacheable_intents=Config.RASA_CACHEABLE_INTENTS
+)
+
+# WAL, synchronous=NORMAL, mmap/cache sizing and busy_timeout on every SQLite connection
+install_sqlite_pragmas(sqlite_pragmas(
+    Config.SQLITE_MMAP_SIZE,
+    Config.SQLITE_CACHE_SIZE_KB,
+    Config.SQLITE_BUSY_TIMEOUT_MS
+))
+
+if Config.DB_TIMING_HEADERS:
+    install_query_timing(app)
+
+# Structured logging through a buffered writer thread, and per-worker metrics for /api/admin/metrics
+log_handler = setup_logging(Config.LOG_LEVEL, Config.LOG_FORMAT == 'json', Config.LOG_QUEUE_SIZE)
+log = logging.getLogger('wellbot')
+metrics = Registry()
+instrument_app(app, metrics, log, n_plus_one_threshold=Config.METRICS_N_PLUS_ONE_THRESHOLD)
+
+# Switched on per worker through /api/admin/profiles (or PROFILE_ON_START_SECONDS)
+profiler = SamplingProfiler(
+    Config.PROFILE_DIR or os.path.join(app.instance_path, 'profiles'),
+    max_files=Config.PROFILE_MAX_FILES,
+    interval_ms=Config.PROFILE_INTERVAL_MS,
+    max_seconds=Config.PROFILE_MAX_SECONDS
+)
+profile_on_start = {'pid': None}
+
+@app.before_request
+def profile_request():
+    if profile_on_start['pid'] != os.getpid():
+        # First request of this worker process
+        profile_on_start['pid'] = os.getpid()
+        if Config.PROFILE_ON_START_SECONDS:
+            try:
+                profiler.start(Config.PROFILE_ON_START_SECONDS, Config.PROFILE_ON_START_ROUTE)
+            except (ValueError, RuntimeError) as e:
+                log.warning("⚠️ Profiling on start skipped: %s", e)
+    if profiler.session is not None:
+        profiler.enter(request.url_rule.rule if request.url_rule else None)
+
+@app.teardown_request
+def profile_request_done(exc):
+    profiler.leave()
+
+# Models are defined once in models.py; the engine (and replica bind) come from the URL
+db.init_app(app)
+
+def intent_model_path():
+    """Prefix of the trained intent classifier files (<path>.npy weights + <path>.json metadata)"""
+    return Config.INTENT_MODEL_PATH or os.path.join(app.instance_path, 'wellbot_intents')
+
+# In-process intent classifier trained from nlu.yml by `flask train-intents`; None until trained
+intent_classifier = IntentClassifier.load(intent_model_path())
+
+# Compiled response table; the database half is loaded in init_db(). The classifier
+# brings domain.yml answers for the intents the keyword matcher doesn't know.
+response_index = ResponseIndex(
+    dict(intent_classifier.responses, **BUILTIN_RESPONSES) if intent_classifier else BUILTIN_RESPONSES,
+    refresh_seconds=Config.RESPONSE_INDEX_REFRESH_SECONDS
+)
+
+# BM25 index over knowledge base entries; loaded from disk and synced in init_db()
+retrieval_index = RetrievalIndex(languages=Config.SUPPORTED_LANGUAGES, refresh_seconds=Config.RESPONSE_INDEX_REFRESH_SECONDS)
+
+# Finished chat answers by (normalized message, language), tagged with the knowledge base version
+response_cache = ResponseCache(
+    maxsize=Config.RESPONSE_CACHE_SIZE,
+    ttl=Config.RESPONSE_CACHE_TTL_SECONDS,
+    disk_path=Config.RESPONSE_CACHE_DISK_PATH
+)
+
+# Dashboard summary tables, updated in the same transaction as the rows they count
+rollups = Rollups(StatsDaily, StatsCounter, DailyActiveUser, StatsWatermark, {
+    'messages': Message,
+    'conversations': Conversation,
+    'feedback': Feedback,
+    'users': User
+})
+
+# One transaction per chat turn, optionally group-committed in the background
+chat_store = ChatStore(
+    db, Conversation, Message, IdAllocation,
+    rollups=rollups,
+    write_behind=Config.CHAT_WRITE_BEHIND,
+    queue_size=Config.CHAT_QUEUE_SIZE,
+    flush_interval_ms=Config.CHAT_FLUSH_INTERVAL_MS,
+    flush_max_rows=Config.CHAT_FLUSH_MAX_ROWS,
+    id_block_size=Config.MESSAGE_ID_BLOCK_SIZE,
+    idle_timeout=datetime.timedelta(minutes=Config.CONVERSATION_IDLE_MINUTES)
+)
+
+# Cold tier: closed conversations moved out of the hot tables by `flask archive-conversations`
+conversation_archive = ConversationArchive(
+    db, Conversation, Message, Feedback, ArchivedConversation, ArchivedRatedMessage,
+    Config.ARCHIVE_DIR or os.path.join(app.instance_path, 'archive'),
+    idle_timeout=datetime.timedelta(minutes=Config.CONVERSATION_IDLE_MINUTES),
+    archive_after=datetime.timedelta(days=Config.ARCHIVE_AFTER_DAYS),
+    batch_size=Config.ARCHIVE_BATCH_SIZE,
+    cache_size=Config.ARCHIVE_RECORD_CACHE_SIZE
+)
+
+def load_user_profile(user_id):
+    """The user columns the profile cache holds, without loading the full row"""
+    return db.session.query(
+        *[getattr(User, column) for column in PROFILE_COLUMNS]
+    ).filter(User.id == user_id).first()
+
+# Parsed user profiles for token_required, chat and GET /api/profile; shared by the
+# workers on a host through PROFILE_CACHE_DISK_PATH
+profile_cache = ProfileCache(
+    load_user_profile,
+    maxsize=Config.PROFILE_CACHE_SIZE,
+    ttl=Config.PROFILE_CACHE_TTL_SECONDS,
+    revalidate=Config.PROFILE_CACHE_REVALIDATE_SECONDS,
+    disk_path=Config.PROFILE_CACHE_DISK_PATH
+)
+
+# Verified tokens, so authenticated calls skip jwt.decode; users come from profile_cache
+auth_cache = AuthCache(
+    app.config['SECRET_KEY'],
+    profile_cache,
+    token_maxsize=Config.AUTH_TOKEN_CACHE_SIZE,
+    token_ttl=Config.AUTH_TOKEN_CACHE_TTL_SECONDS
+)
+
+# users.last_login and the daily active users rollup, written in batches off the sign-in path
+last_login_writer = LastLoginWriter(db, User, rollups=rollups, interval=Config.LAST_LOGIN_FLUSH_SECONDS)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    """Role, status and profile changes must not be served from a stale profile"""
+    profile_cache.invalidate(target.id)
 
 # ==================== HELPER FUNCTIONS ====================
 
 def init_db():
     """Initialize database with admin user and sample data"""
     with app.app_context():
-        db.create_all()
+        # Missing tables and indexes, then pending migrations (serialized across nodes)
+        upgrade_schema(db.engine, db.metadata, SchemaMigration)
+        
+        # Fold rows that predate the dashboard rollups into them (no-op once done)
+        backfilled = rollups.backfill(db.session)
+        if backfilled:
+            log.info("📊 Dashboard rollups backfilled", extra={'ids_scanned': backfilled})
         
         # Create admin user if not exists
         admin_email = "admin@wellbot.com"
@@ -112,33 +242,59 @@ def init_db():
                 role="admin"
             )
             db.session.add(admin_user)
+            rollups.record_new_user(db.session)
             db.session.commit()
         
-        print("✅ Database initialized successfully!")
+        reload_response_index()
+        load_retrieval_index()
+        
+        if intent_classifier is None:
+            log.info("ℹ️ Intent classifier not trained, using keyword matching (run: flask --app app train-intents)")
+        
+        log.info("✅ Database initialized successfully!")
+
+def refresh_lookup_tables():
+    """Reload the knowledge base lookup tables (the server master does this on SIGHUP)"""
+    with app.app_context():
+        reload_response_index()
+        load_retrieval_index()
+
+@metrics.timed('auth')
+def authenticate_token(token, scope=None):
+    """Resolve a JWT (optionally 'Bearer '-prefixed) to (user, None) or (None, error response)
+    
+    Session tokens carry no scope; a scoped token (see admin_stream_token) is
+    only accepted where that scope is asked for.
+    """
+    if not token:
+        return None, (jsonify({'message': 'Token is missing'}), 401)
+    
+    try:
+        if token.startswith('Bearer '):
+            token = token.split(' ')[1]
+        
+        data = auth_cache.claims(token)
+        if data.get('scope') != scope:
+            return None, (jsonify({'message': 'Invalid token'}), 401)
+        current_user = auth_cache.user(data['user_id'])
+        
+        if not current_user or not current_user.is_active:
+            return None, (jsonify({'message': 'User not found or inactive'}), 401)
+            
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'message': 'Token has expired'}), 401)
+    except jwt.InvalidTokenError:
+        return None, (jsonify({'message': 'Invalid token'}), 401)
+    
+    return current_user, None
 
 def token_required(f):
     """Decorator to protect routes with JWT authentication"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            if token.startswith('Bearer '):
-                token = token.split(' ')[1]
-            
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.get(data['user_id'])
-            
-            if not current_user or not current_user.is_active:
-                return jsonify({'message': 'User not found or inactive'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Invalid token'}), 401
+        current_user, error = authenticate_token(request.headers.get('Authorization'))
+        if error:
+            return error
         
         return f(current_user, *args, **kwargs)
     
@@ -155,139 +311,187 @@ def admin_required(f):
 
 def detect_intent_and_language(message):
     """Detect intent and language from message"""
-    message_lower = message.lower()
-    
-    # Language detection
-    hindi_chars = any('\u0900' <= char <= '\u097F' for char in message)
-    detected_lang = 'hi' if hindi_chars else 'en'
-    
-    # Intent detection
-    intent_keywords = {
-        'headache': ['headache', 'head pain', 'migraine', 'sir dard', 'सिरदर्द'],
-        'fever': ['fever', 'temperature', 'bukhar', 'बुखार', 'tap'],
-        'cold_flu': ['cold', 'flu', 'cough', 'sardi', 'jukam', 'सर्दी', 'जुकाम'],
-        'cut_wound': ['cut', 'wound', 'bleeding', 'injury', 'chot', 'ghav', 'घाव'],
-        'exercise': ['exercise', 'workout', 'fitness', 'vyayam', 'व्यायाम'],
-        'diet': ['diet', 'food', 'nutrition', 'bhojan', 'भोजन', 'khana'],
-    }
-    
-    detected_intent = 'general'
-    max_matches = 0
-    
-    for intent, keywords in intent_keywords.items():
-        matches = sum(1 for keyword in keywords if keyword in message_lower)
-        if matches > max_matches:
-            max_matches = matches
-            detected_intent = intent
+    return intent_matcher.detect(message)
+
+def resolve_intent(keyword_intent, language, probs):
+    """(intent, language, confidence): the classifier when it is confident, else the keyword matcher"""
+    if probs is None:
+        return keyword_intent, language, 0.85 if keyword_intent != 'general' else 0.5
     
-    return detected_intent, detected_lang
+    intent, confidence = intent_classifier.best(probs)
+    if confidence >= Config.INTENT_CONFIDENCE_THRESHOLD:
+        return intent, language, confidence
+    if keyword_intent != 'general':
+        return keyword_intent, language, intent_classifier.probability(probs, keyword_intent)
+    return 'general', language, confidence
+
+@metrics.timed('intent')
+def classify_message(message):
+    """Intent, language and confidence for one message"""
+    keyword_intent, language = detect_intent_and_language(message)
+    probs = intent_classifier.predict_proba(message) if intent_classifier else None
+    return resolve_intent(keyword_intent, language, probs)
+
+@metrics.timed('intent')
+def classify_messages(messages):
+    """classify_message() for a batch: one keyword pass and one vectorized classifier pass"""
+    if not messages:
+        return []
+    detected = intent_matcher.detect_many(messages)
+    probs = intent_classifier.predict_proba_many(messages) if intent_classifier else [None] * len(messages)
+    return [resolve_intent(intent, language, p) for (intent, language), p in zip(detected, probs)]
+
+def load_knowledge_base_entries():
+    """Active knowledge base rows as (category, language, content), oldest first"""
+    return db.session.query(
+        HealthKnowledgeBase.category,
+        HealthKnowledgeBase.language,
+        HealthKnowledgeBase.content
+    ).filter_by(is_active=True).order_by(HealthKnowledgeBase.updated_at, HealthKnowledgeBase.id).all()
+
+def knowledge_base_version():
+    """Cheap fingerprint that changes whenever a knowledge base row is added, edited or removed"""
+    count, last_updated = db.session.query(
+        func.count(HealthKnowledgeBase.id),
+        func.max(HealthKnowledgeBase.updated_at)
+    ).one()
+    return count, last_updated
 
+def reload_response_index():
+    """Rebuild the response index from the database right away"""
+    response_index.reload(load_knowledge_base_entries(), knowledge_base_version())
+
+def knowledge_index_path():
+    """Location of the persisted retrieval index: next to the SQLite file, else the instance folder"""
+    if Config.KNOWLEDGE_INDEX_PATH:
+        return Config.KNOWLEDGE_INDEX_PATH
+    database = db.engine.url.database if db.engine.url.get_backend_name() == 'sqlite' else None
+    directory = os.path.dirname(os.path.abspath(database)) if database else app.instance_path
+    return os.path.join(directory, 'wellbot_kb.index')
+
+def knowledge_base_fingerprints():
+    """(id, updated_at, is_active) for every knowledge base row"""
+    return db.session.query(
+        HealthKnowledgeBase.id,
+        HealthKnowledgeBase.updated_at,
+        HealthKnowledgeBase.is_active
+    ).all()
+
+def fetch_knowledge_base_rows(entry_ids):
+    """Full knowledge base rows for a batch of ids"""
+    return HealthKnowledgeBase.query.filter(HealthKnowledgeBase.id.in_(entry_ids)).all()
+
+def refresh_knowledge_base():
+    """Bring this worker's lookup tables up to date after a bulk knowledge base change"""
+    reload_response_index()
+    response_cache.invalidate()
+    retrieval_index.sync(knowledge_base_fingerprints(), fetch_knowledge_base_rows)
+    retrieval_index.version = knowledge_base_version()
+    if retrieval_index.dirty:
+        retrieval_index.save()
+
+def load_retrieval_index():
+    """Load the persisted retrieval index and re-tokenize only rows changed since it was saved"""
+    retrieval_index.path = knowledge_index_path()
+    loaded = retrieval_index.load()
+    changed = retrieval_index.sync(knowledge_base_fingerprints(), fetch_knowledge_base_rows)
+    retrieval_index.version = knowledge_base_version()
+    if retrieval_index.dirty:
+        retrieval_index.save()
+    log.info("🔎 Knowledge index ready", extra={'source': 'loaded' if loaded else 'built', 'reindexed': changed})
+
+@metrics.timed('kb_search')
+def search_knowledge_base(query, language, k=5):
+    """Top-k knowledge base entries for free text, ranked by BM25"""
+    retrieval_index.maybe_sync(knowledge_base_version, knowledge_base_fingerprints, fetch_knowledge_base_rows)
+    # MIN_MATCH_SCORE keeps its keyword-count meaning: distinct query terms an entry must contain
+    return retrieval_index.search(query, language, k=k, min_terms=Config.MIN_MATCH_SCORE)
+
+@metrics.timed('kb_lookup')
 def get_response_from_knowledge_base(intent, language):
     """Get response based on intent and language"""
-    
-    knowledge_base = {
-        'headache': {
-            'en': """For mild headaches:
-- Rest in a quiet, dark room
-- Drink plenty of water (dehydration causes headaches)
-- Apply cold compress to forehead
-- Take over-the-counter pain relievers if needed
-- Avoid screens and bright lights
-
-⚠️ Seek medical help if:
-- Headache is sudden and severe
-- Persists for more than 3 days
-- Accompanied by fever, stiff neck, or vision changes
-
-⚠️ Medical Disclaimer: This is general information only. Always consult a healthcare professional for medical advice.""",
-            'hi': """हल्के सिरदर्द के लिए:
-- शांत, अंधेरे कमरे में आराम करें
-- भरपूर पानी पिएं (निर्जलीकरण से सिरदर्द होता है)
-- माथे पर ठंडा सेक करें
-- यदि आवश्यक हो तो दर्द निवारक लें
-- स्क्रीन और तेज रोशनी से बचें
-
-⚠️ चिकित्सा सहायता लें यदि:
-- सिरदर्द अचानक और गंभीर है
-- 3 दिनों से अधिक समय तक बना रहता है
-- बुखार, गर्दन में अकड़न या दृष्टि परिवर्तन के साथ
-
-⚠️ चिकित्सा अस्वीकरण: यह केवल सामान्य जानकारी है। चिकित्सा सलाह के लिए हमेशा स्वास्थ्य पेशेवर से परामर्श करें。"""
-        },
-        'fever': {
-            'en': """Managing mild fever (below 102°F/38.9°C):
-
-✅ Do:
-- Rest and stay hydrated
-- Drink plenty of water, juice, or soup
-- Take lukewarm bath (not cold)
-- Wear light clothing
-- Monitor temperature regularly
-
-⚠️ Seek immediate help if:
-- Fever above 103°F (39.4°C)
-- Lasts more than 3 days
-- Accompanied by severe symptoms
-
-⚠️ Medical Disclaimer: This is general information only. Consult a healthcare professional.""",
-            'hi': """हल्के बुखार का प्रबंधन (102°F/38.9°C से नीचे):
-
-✅ करें:
-- आराम करें और हाइड्रेटेड रहें
-- भरपूर पानी, जूस या सूप पिएं
-- गुनगुना स्नान करें (ठंडा नहीं)
-- हल्के कपड़े पहनें
-- नियमित रूप से तापमान की निगरानी करें
-
-⚠️ तत्काल सहायता लें यदि:
-- बुखार 103°F (39.4°C) से ऊपर
-- 3 दिनों से अधिक समय तक रहता है
-- गंभीर लक्षणों के साथ
-
-⚠️ चिकित्सा अस्वीकरण: यह केवल सामान्य जानकारी है। स्वास्थ्य पेशेवर से परामर्श करें।"""
-        },
-        'general': {
-            'en': """I'm here to help with general health information. You can ask me about:
-- Common symptoms (headache, fever, cold)
-- First aid basics
-- Exercise and wellness tips
-- Healthy eating habits
-
-⚠️ For serious health concerns, please consult a healthcare professional immediately.
-
-What would you like to know?""",
-            'hi': """मैं सामान्य स्वास्थ्य जानकारी में मदद के लिए यहां हूं। आप मुझसे पूछ सकते हैं:
-- सामान्य लक्षण (सिरदर्द, बुखार, सर्दी)
-- प्राथमिक चिकित्सा मूल बातें
-- व्यायाम और स्वास्थ्य सुझाव
-- स्वस्थ खान-पान की आदतें
-
-⚠️ गंभीर स्वास्थ्य समस्याओं के लिए, कृपया तुरंत स्वास्थ्य पेशेवर से परामर्श करें।
-
-आप क्या जानना चाहेंगे?"""
-        }
-    }
-    
-    return knowledge_base.get(intent, knowledge_base['general']).get(language, knowledge_base[intent]['en'])
+    # Picks up edits made by other workers within RESPONSE_INDEX_REFRESH_SECONDS
+    response_index.maybe_reload(knowledge_base_version, load_knowledge_base_entries)
+    return response_index.lookup(intent, language)
 
-def get_rasa_response(user_message, sender_id):
+@metrics.timed('rasa')
+def get_rasa_response(user_message, sender_id, intent=None):
     """Get response from Rasa (optional)"""
     if not USE_RASA:
         return None
+    
+    return rasa_gateway.respond(user_message, sender_id, intent)
+
+# Result of start_chat_turn(); cached_response is set on a response cache hit
+ChatTurnPlan = namedtuple('ChatTurnPlan', ['cache_key', 'generation', 'intent', 'language', 'confidence', 'cached_response'])
+
+def start_chat_turn(user, user_message):
+    """First half of a chat turn: response cache lookup, else intent and language detection
+    
+    The caller asks Rasa (unless the answer was cached) and passes its reply to finish_chat_turn().
+    """
+    # Repeated questions skip detection, Rasa and search; entries from an older
+    # knowledge base version miss, so edits made by other workers are honoured too
+    response_index.maybe_reload(knowledge_base_version, load_knowledge_base_entries)
+    generation = response_index.version
+    cache_key = response_cache.key(user_message, user.preferred_language)
+    with metrics.span('response_cache'):
+        cached = response_cache.get(cache_key, generation)
+    
+    if cached:
+        log.info("💬 Message", extra={'text': user_message[:50], 'intent': cached.intent, 'cached': True})
+        return ChatTurnPlan(cache_key, generation, cached.intent, None, cached.confidence, cached.response)
+    
+    # Detect intent and language
+    intent, detected_lang, confidence = classify_message(user_message)
+    
+    # Use user's preferred language if set, otherwise use detected
+    response_lang = user.preferred_language or detected_lang
+    
+    log.info("💬 Message", extra={'text': user_message[:50], 'intent': intent, 'lang': response_lang})
+    return ChatTurnPlan(cache_key, generation, intent, response_lang, confidence, None)
+
+def finish_chat_turn(user, user_message, plan, rasa_response, received_at, started):
+    """Second half of a chat turn: knowledge base fallback, caching and storage; returns the response body"""
+    intent, confidence = plan.intent, plan.confidence
+    
+    if plan.cached_response is not None:
+        response = plan.cached_response
+    else:
+        response = rasa_response
+        # Rasa answers can depend on conversation state; only stateless intents are reusable.
+        # Fallback answers (Rasa down or silent) follow the same rule, so they don't
+        # keep hiding Rasa's answer for the whole TTL once it is back
+        cacheable = intent in Config.RASA_CACHEABLE_INTENTS
+        
+        if not response and intent == 'general':
+            # No keyword intent matched: fall back to free-text search over knowledge base entries
+            hits = search_knowledge_base(user_message, plan.language, k=1)
+            if hits:
+                entry = HealthKnowledgeBase.query.get(hits[0].doc_id)
+                if entry:
+                    response = entry.content
+                    intent = hits[0].category
         
-    try:
-        payload = {"sender": sender_id, "message": user_message}
-        response = requests.post(RASA_API_URL, json=payload, timeout=5)
-        
-        if response.status_code == 200:
-            rasa_responses = response.json()
-            if rasa_responses:
-                combined_response = "\n\n".join([r.get('text', '') for r in rasa_responses if 'text' in r])
-                return combined_response
-    except Exception as e:
-        print(f"❌ Rasa error: {str(e)}")
+        if not response:
+            response = get_response_from_knowledge_base(intent, plan.language)
+        
+        if cacheable:
+            response_cache.set(plan.cache_key, plan.generation, response, intent, confidence)
     
-    return None
+    response_cache.record_turn(plan.cached_response is not None, time.perf_counter() - started)
+    
+    # Conversation row and both messages are written in a single transaction
+    with metrics.span('store'):
+        turn = chat_store.record_turn(user.id, user_message, response, intent, confidence, received_at)
+    
+    return {
+        'response': response,
+        'intent': intent,
+        'confidence': confidence,
+        'message_id': turn.bot_message_id,
+        'timestamp': datetime.datetime.utcnow().isoformat()
+    }
 
 # ==================== FRONTEND ROUTES ====================
 
@@ -346,6 +550,7 @@ def signup():
         )
         
         db.session.add(new_user)
+        rollups.record_new_user(db.session)
         db.session.commit()
         
         token = jwt.encode({
@@ -353,7 +558,7 @@ def signup():
             'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
         }, app.config['SECRET_KEY'], algorithm='HS256')
         
-        print(f"✅ User registered: {new_user.email}")
+        log.info("✅ User registered", extra={'email': new_user.email})
         
         return jsonify({
             'message': 'Account created successfully!',
@@ -364,7 +569,7 @@ def signup():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Signup error: {str(e)}")
+        log.exception("❌ Signup error")
         return jsonify({'message': 'Registration failed. Please try again.'}), 500
 
 @app.route('/api/signin', methods=['POST'])
@@ -381,16 +586,16 @@ def signin():
         if not user or not check_password_hash(user.password_hash, data['password']):
             return jsonify({'message': 'Invalid email or password'}), 401
         
-        # Update last login
-        user.last_login = datetime.datetime.utcnow()
-        db.session.commit()
+        # last_login is written by the next batched flush; the row just read also warms the profile cache
+        last_login_writer.record(user.id, datetime.datetime.utcnow())
+        profile_cache.put(make_profile(user))
         
         token = jwt.encode({
             'user_id': user.id,
             'exp': datetime.datetime.utcnow() + datetime.timedelta(days=30)
         }, app.config['SECRET_KEY'], algorithm='HS256')
         
-        print(f"✅ User logged in: {user.email}")
+        log.info("✅ User logged in", extra={'email': user.email})
         
         return jsonify({
             'message': 'Login successful!',
@@ -402,7 +607,7 @@ def signin():
         }), 200
         
     except Exception as e:
-        print(f"❌ Signin error: {str(e)}")
+        log.exception("❌ Signin error")
         return jsonify({'message': 'Login failed. Please try again.'}), 500
 
 @app.route('/api/profile', methods=['GET', 'POST'])
@@ -411,35 +616,39 @@ def profile(current_user):
     """Get or update user profile"""
     try:
         if request.method == 'GET':
+            # current_user is the cached profile, health_conditions already parsed
             return jsonify({
                 'username': current_user.username,
                 'email': current_user.email,
                 'age_group': current_user.age_group,
                 'gender': current_user.gender,
                 'exercise_hours': current_user.exercise_hours,
-                'health_conditions': json.loads(current_user.health_conditions) if current_user.health_conditions else [],
+                'health_conditions': list(current_user.health_conditions),
                 'preferred_language': current_user.preferred_language
             }), 200
         
         elif request.method == 'POST':
+            user = User.query.get(current_user.id)
             data = request.get_json()
             
             if data.get('name'):
-                current_user.username = data['name']
+                user.username = data['name']
             if data.get('age_group'):
-                current_user.age_group = data['age_group']
+                user.age_group = data['age_group']
             if data.get('gender'):
-                current_user.gender = data['gender']
+                user.gender = data['gender']
             if data.get('exercise_hours'):
-                current_user.exercise_hours = data['exercise_hours']
+                user.exercise_hours = data['exercise_hours']
             if 'health_conditions' in data:
-                current_user.health_conditions = json.dumps(data['health_conditions'])
+                user.health_conditions = json.dumps(data['health_conditions'])
             if data.get('language'):
-                current_user.preferred_language = data['language']
+                user.preferred_language = data['language']
             
             db.session.commit()
+            # Also drop anything re-cached between the flush and the commit
+            profile_cache.invalidate(user.id)
             
-            print(f"✅ Profile updated: {current_user.email}")
+            log.info("✅ Profile updated", extra={'email': user.email})
             
             return jsonify({
                 'message': 'Profile updated successfully!',
@@ -448,7 +657,7 @@ def profile(current_user):
             
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Profile error: {str(e)}")
+        log.exception("❌ Profile error")
         return jsonify({'message': 'Profile update failed'}), 500
 
 @app.route('/api/chat', methods=['POST'])
@@ -466,98 +675,355 @@ def chat(current_user):
         if not user_message or len(user_message) > 1000:
             return jsonify({'message': 'Invalid message length'}), 400
         
-        # Get or create active conversation
-        active_conv = Conversation.query.filter_by(
-            user_id=current_user.id,
-            end_time=None
-        ).first()
-        
-        if not active_conv:
-            active_conv = Conversation(user_id=current_user.id)
-            db.session.add(active_conv)
-            db.session.commit()
-        
-        # Save user message
-        user_msg = Message(
-            conversation_id=active_conv.id,
-            sender='user',
-            message=user_message
-        )
-        db.session.add(user_msg)
-        db.session.commit()
-        
-        # Detect intent and language
-        intent, detected_lang = detect_intent_and_language(user_message)
-        
-        # Use user's preferred language if set, otherwise use detected
-        response_lang = current_user.preferred_language or detected_lang
-        
-        print(f"💬 Message: {user_message[:50]}... | Intent: {intent} | Lang: {response_lang}")
+        received_at = datetime.datetime.utcnow()
+        started = time.perf_counter()
+        plan = start_chat_turn(current_user, user_message)
         
         # Try Rasa first (if enabled), fallback to knowledge base
-        response = get_rasa_response(user_message, f"user_{current_user.id}") if USE_RASA else None
+        rasa_response = None
+        if plan.cached_response is None and USE_RASA:
+            rasa_response = get_rasa_response(user_message, f"user_{current_user.id}", plan.intent)
         
-        if not response:
-            response = get_response_from_knowledge_base(intent, response_lang)
+        return jsonify(finish_chat_turn(current_user, user_message, plan, rasa_response, received_at, started)), 200
         
-        confidence = 0.85 if intent != 'general' else 0.5
+    except Exception as e:
+        db.session.rollback()
+        log.exception("❌ Chat error")
+        return jsonify({'message': 'Failed to process message'}), 500
+
+@app.route('/api/chat/batch', methods=['POST'])
+@token_required
+def chat_batch(current_user):
+    """Answer (and optionally store) many messages in one call
+    
+    Body: {"messages": ["...", {"message": "...", "user_id": 3, "timestamp": "..."}], "persist": true}
+    user_id and timestamp (transcript replay) are admin-only. Results come back
+    in input order; invalid items get an "error" instead of failing the batch.
+    Rasa is not consulted: its tracker is per conversation and would bound throughput.
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get('messages')
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'message': 'messages must be a non-empty list'}), 400
+        if len(items) > Config.CHAT_BATCH_MAX_MESSAGES:
+            return jsonify({'message': f'At most {Config.CHAT_BATCH_MAX_MESSAGES} messages per batch'}), 400
+        
+        persist = data.get('persist', True) is not False
+        is_admin = current_user.role == 'admin'
+        results = [None] * len(items)
+        accepted = []  # (index, text, user_id, received_at)
+        
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {'message': item}
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'error': 'Item must be a string or an object'}
+                continue
+            
+            text = str(item.get('message') or '').strip()
+            if not text or len(text) > Config.MAX_MESSAGE_LENGTH:
+                results[index] = {'index': index, 'error': 'Invalid message length'}
+                continue
+            
+            user_id = item.get('user_id', current_user.id)
+            received_at = None
+            if (user_id != current_user.id or item.get('timestamp')) and not is_admin:
+                results[index] = {'index': index, 'error': 'user_id and timestamp require admin access'}
+                continue
+            if item.get('timestamp'):
+                try:
+                    received_at = datetime.datetime.fromisoformat(item['timestamp'])
+                except (TypeError, ValueError):
+                    results[index] = {'index': index, 'error': 'Invalid timestamp'}
+                    continue
+            
+            accepted.append((index, text, user_id, received_at))
+        
+        # Preferred languages for every user in the batch, in one query
+        languages = {current_user.id: current_user.preferred_language}
+        other_users = {user_id for _, _, user_id, _ in accepted} - set(languages)
+        if other_users:
+            languages.update(db.session.query(User.id, User.preferred_language).filter(User.id.in_(other_users)).all())
+        
+        valid = []
+        for entry in accepted:
+            if entry[2] in languages:
+                valid.append(entry)
+            else:
+                results[entry[0]] = {'index': entry[0], 'error': 'User not found'}
+        
+        classified = classify_messages([text for _, text, _, _ in valid])
+        
+        answers = []
+        search_hits = {}
+        for (index, text, user_id, _), (intent, detected_lang, confidence) in zip(valid, classified):
+            response_lang = languages[user_id] or detected_lang
+            if intent == 'general':
+                hits = search_knowledge_base(text, response_lang, k=1)
+                if hits:
+                    search_hits[index] = hits[0]
+            answers.append([index, text, user_id, intent, response_lang, confidence])
+        
+        # Knowledge base entries behind the free-text matches, in one query
+        entries = {}
+        if search_hits:
+            doc_ids = {hit.doc_id for hit in search_hits.values()}
+            entries = {entry.id: entry for entry in HealthKnowledgeBase.query.filter(HealthKnowledgeBase.id.in_(doc_ids))}
+        
+        for answer in answers:
+            hit = search_hits.get(answer[0])
+            entry = entries.get(hit.doc_id) if hit else None
+            if entry:
+                answer[3] = hit.category
+                answer.append(entry.content)
+            else:
+                answer.append(get_response_from_knowledge_base(answer[3], answer[4]))
+        
+        turns = []
+        if persist and answers:
+            received = {index: received_at for index, _, _, received_at in valid}
+            turns = chat_store.record_turns(
+                (user_id, text, response, intent, confidence, received[index])
+                for index, text, user_id, intent, _, confidence, response in answers
+            )
         
-        # Save bot response
-        bot_msg = Message(
-            conversation_id=active_conv.id,
-            sender='bot',
-            message=response,
-            intent=intent,
-            confidence=confidence
-        )
-        db.session.add(bot_msg)
-        db.session.commit()
+        for position, (index, _, _, intent, language, confidence, response) in enumerate(answers):
+            results[index] = {
+                'index': index,
+                'response': response,
+                'intent': intent,
+                'language': language,
+                'confidence': confidence,
+                'message_id': turns[position].bot_message_id if turns else None
+            }
         
         return jsonify({
-            'response': response,
-            'intent': intent,
-            'confidence': confidence,
-            'message_id': bot_msg.id,
-            'timestamp': datetime.datetime.utcnow().isoformat()
+            'results': results,
+            'processed': len(answers),
+            'errors': len(items) - len(answers),
+            'persisted': bool(turns)
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Chat error: {str(e)}")
-        return jsonify({'message': 'Failed to process message'}), 500
+        log.exception("❌ Batch chat error")
+        return jsonify({'message': 'Failed to process batch'}), 500
+
+def serialize_history_message(row):
+    """History JSON for one message row"""
+    return {
+        'id': row.id,
+        'sender': row.sender,
+        'message': row.message,
+        'intent': row.intent,
+        'timestamp': row.timestamp.isoformat()
+    }
+
+def conversation_page(user_id, before, limit):
+    """(conversation rows newest first, has_more) for the page below the (start_time, id) cursor
+    
+    Hot and archived conversations are merged in one statement, each tier
+    limited on its own (user_id, start_time) index first; rows carry an
+    `archived` flag telling serialize_history_page where the messages are.
+    """
+    tiers = []
+    for model, archived in ((Conversation, False), (ArchivedConversation, True)):
+        query = select(model.id, model.start_time, literal(archived).label('archived')).where(model.user_id == user_id)
+        if before:
+            query = query.where(tuple_(model.start_time, model.id) < tuple_(*before))
+        tiers.append(select(query.order_by(desc(model.start_time), desc(model.id)).limit(limit + 1).subquery()))
+    page = union_all(*tiers).subquery()
+    rows = db.session.execute(
+        select(page).order_by(desc(page.c.start_time), desc(page.c.id)).limit(limit + 1)
+    ).all()
+    return rows[:limit], len(rows) > limit
+
+def latest_messages(conversation_ids, per_conversation):
+    """Last messages of each conversation, oldest first, in one batched query
+
+    Returns {conversation_id: rows}; a conversation holding more than
+    per_conversation messages gets per_conversation + 1 rows so the caller can
+    tell there is more.
+    """
+    if not conversation_ids:
+        return {}
+    
+    position = func.row_number().over(
+        partition_by=Message.conversation_id,
+        order_by=(desc(Message.timestamp), desc(Message.id))
+    ).label('position')
+    ranked = select(
+        Message.id, Message.conversation_id, Message.sender, Message.message,
+        Message.intent, Message.timestamp, position
+    ).where(Message.conversation_id.in_(conversation_ids)).subquery()
+    
+    rows = db.session.execute(
+        select(ranked)
+        .where(ranked.c.position <= per_conversation + 1)
+        .order_by(ranked.c.conversation_id, ranked.c.timestamp, ranked.c.id)
+    ).all()
+    
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.conversation_id, []).append(row)
+    return grouped
+
+def serialize_history_page(conversations, per_conversation):
+    """Yield history JSON for each conversation on a page, newest conversation first"""
+    messages = latest_messages([conv.id for conv in conversations if not conv.archived], per_conversation)
+    archived = conversation_archive.records(db.session, [conv.id for conv in conversations if conv.archived])
+    for conv in conversations:
+        if conv.archived:
+            rows = archived[conv.id]['messages'][-(per_conversation + 1):] if conv.id in archived else []
+        else:
+            rows = messages.get(conv.id, [])
+        has_more_messages = len(rows) > per_conversation
+        rows = rows[-per_conversation:] if per_conversation else []
+        yield {
+            'conversation_id': conv.id,
+            'start_time': conv.start_time.isoformat(),
+            'messages': [serialize_history_message(row) for row in rows],
+            'has_more_messages': has_more_messages,
+            # Older messages: GET /api/conversation/<id>/messages?cursor=...
+            'messages_cursor': encode_cursor(rows[0].timestamp, rows[0].id) if has_more_messages else None
+        }
+
+def history_page_params(limit, cursor):
+    """(page size, (start_time, id) to page before) from the history query string; ValueError on a bad cursor"""
+    limit = page_size(limit, Config.HISTORY_PAGE_SIZE, Config.HISTORY_MAX_PAGE_SIZE)
+    before = decode_cursor(cursor, datetime.datetime, int) if cursor else None
+    return limit, before
 
 @app.route('/api/conversation/history', methods=['GET'])
 @token_required
 def get_history(current_user):
-    """Get conversation history"""
+    """Get conversation history, one page of conversations at a time
+    
+    ?format=ndjson streams the whole history from the cursor on, one
+    conversation per line, followed by a final {"next_cursor", "has_more"} line.
+    """
     try:
-        conversations = Conversation.query.filter_by(
-            user_id=current_user.id
-        ).order_by(Conversation.start_time.desc()).limit(10).all()
+        per_conversation = Config.MAX_CONVERSATION_HISTORY
+        try:
+            limit, before = history_page_params(request.args.get('limit', type=int), request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
         
-        history = []
-        for conv in conversations:
-            messages = []
-            for msg in conv.messages:
-                messages.append({
-                    'sender': msg.sender,
-                    'message': msg.message,
-                    'intent': msg.intent,
-                    'timestamp': msg.timestamp.isoformat()
-                })
+        if request.args.get('format') == 'ndjson':
+            user_id = current_user.id
             
-            history.append({
-                'conversation_id': conv.id,
-                'start_time': conv.start_time.isoformat(),
-                'messages': messages
-            })
+            def generate(before):
+                # Page by page, so memory stays bounded by one page whatever the history size
+                while True:
+                    conversations, has_more = conversation_page(user_id, before, limit)
+                    for item in serialize_history_page(conversations, per_conversation):
+                        yield json.dumps(item) + '\n'
+                    if not has_more:
+                        break
+                    before = (conversations[-1].start_time, conversations[-1].id)
+                yield json.dumps({'next_cursor': None, 'has_more': False}) + '\n'
+            
+            return Response(stream_with_context(generate(before)), mimetype='application/x-ndjson')
         
-        return jsonify({'history': history}), 200
+        conversations, has_more = conversation_page(current_user.id, before, limit)
+        history = list(serialize_history_page(conversations, per_conversation))
+        
+        return jsonify({
+            'history': history,
+            'next_cursor': encode_cursor(conversations[-1].start_time, conversations[-1].id) if has_more else None,
+            'has_more': has_more
+        }), 200
         
     except Exception as e:
-        print(f"❌ History error: {str(e)}")
+        log.exception("❌ History error")
         return jsonify({'message': 'Failed to fetch history'}), 500
 
+@app.route('/api/conversation/<int:conversation_id>/messages', methods=['GET'])
+@token_required
+def get_conversation_messages(current_user, conversation_id):
+    """Get one conversation's messages, newest page first (each page oldest to newest)"""
+    try:
+        conversation = db.session.query(Conversation.id).filter_by(
+            id=conversation_id,
+            user_id=current_user.id
+        ).first()
+        record = None
+        if not conversation:
+            record = conversation_archive.record(db.session, conversation_id, current_user.id)
+            if not record:
+                return jsonify({'message': 'Conversation not found'}), 404
+        
+        limit = page_size(request.args.get('limit', type=int), Config.MAX_CONVERSATION_HISTORY, Config.MAX_CONVERSATION_HISTORY)
+        
+        before = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                before = tuple(decode_cursor(cursor, datetime.datetime, int))
+            except ValueError:
+                return jsonify({'message': 'Invalid cursor'}), 400
+        
+        if record:
+            # Archived: the whole conversation is one decompressed record, paged in memory
+            rows = [row for row in reversed(record['messages']) if not before or (row.timestamp, row.id) < before]
+            rows = rows[:limit + 1]
+        else:
+            query = db.session.query(
+                Message.id, Message.sender, Message.message, Message.intent, Message.timestamp
+            ).filter(Message.conversation_id == conversation_id)
+            if before:
+                query = query.filter(tuple_(Message.timestamp, Message.id) < tuple_(*before))
+            rows = query.order_by(desc(Message.timestamp), desc(Message.id)).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        return jsonify({
+            'conversation_id': conversation_id,
+            'messages': [serialize_history_message(row) for row in reversed(rows)],
+            'next_cursor': encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None,
+            'has_more': has_more
+        }), 200
+        
+    except Exception as e:
+        log.exception("❌ Conversation messages error")
+        return jsonify({'message': 'Failed to fetch messages'}), 500
+
+def rated_message_problem(message_id):
+    """(status, message) when feedback can't point at the message yet, else None
+    
+    With write-behind the rated message may still be queued, by this worker
+    (waited for) or by another one (not in the database yet); either way the
+    client is told to retry rather than the feedback referencing a missing row.
+    """
+    if not chat_store.write_behind:
+        return None
+    if not chat_store.wait_for(message_id):
+        if chat_store.is_quarantined(message_id):
+            return 409, 'Message could not be saved'
+        return 503, 'Message is not saved yet, try again shortly'
+    stored = (db.session.query(Message.id).filter(Message.id == message_id).first()
+              or db.session.query(ArchivedRatedMessage.message_id).filter(ArchivedRatedMessage.message_id == message_id).first())
+    if not stored:
+        return 503, 'Message is not saved yet, try again shortly'
+    return None
+
+def store_feedback(user_id, message_id, rating, comment):
+    """Insert a feedback row and count it in the dashboard rollups, in one transaction"""
+    feedback = Feedback(
+        message_id=message_id,
+        user_id=user_id,
+        rating=rating,
+        comment=comment,
+        created_at=datetime.datetime.utcnow()
+    )
+    
+    db.session.add(feedback)
+    rollups.record_feedback(db.session, feedback.rating, feedback.created_at)
+    db.session.commit()
+    return feedback
+
 @app.route('/api/feedback', methods=['POST'])
 @token_required
 def submit_feedback(current_user):
@@ -568,15 +1034,13 @@ def submit_feedback(current_user):
         if not data or not data.get('message_id'):
             return jsonify({'message': 'Message ID is required'}), 400
         
-        feedback = Feedback(
-            message_id=data['message_id'],
-            user_id=current_user.id,
-            rating=data.get('rating'),
-            comment=data.get('comment')
-        )
+        # The rated message may still be waiting in a write-behind queue
+        problem = rated_message_problem(data['message_id'])
+        if problem:
+            status, message = problem
+            return jsonify({'message': message}), status, {'Retry-After': '1'} if status == 503 else {}
         
-        db.session.add(feedback)
-        db.session.commit()
+        store_feedback(current_user.id, data['message_id'], data.get('rating'), data.get('comment'))
         
         return jsonify({'message': 'Feedback submitted successfully!'}), 201
         
@@ -584,131 +1048,369 @@ def submit_feedback(current_user):
         db.session.rollback()
         return jsonify({'message': 'Failed to submit feedback'}), 500
 
+@app.route('/api/knowledge-base/search', methods=['GET'])
+@token_required
+def knowledge_base_search(current_user):
+    """Search knowledge base entries"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'message': 'Query is required'}), 400
+        
+        language = request.args.get('language') or current_user.preferred_language or Config.DEFAULT_LANGUAGE
+        k = min(request.args.get('k', 5, type=int), 50)
+        
+        hits = search_knowledge_base(query, language, k=k)
+        
+        return jsonify({
+            'results': [{
+                'id': hit.doc_id,
+                'category': hit.category,
+                'title': hit.title,
+                'score': hit.score
+            } for hit in hits]
+        }), 200
+        
+    except Exception as e:
+        log.exception("❌ Search error")
+        return jsonify({'message': 'Search failed'}), 500
+
 # ==================== ADMIN API ROUTES ====================
 
+def dashboard_stats():
+    """Admin dashboard numbers (shared by the stats endpoint and the event stream)"""
+    # Totals, trends and top intents come from the rollup tables
+    stats = rollups.dashboard(db.session)
+    
+    # Health topics (small table, counted live)
+    health_topics = HealthKnowledgeBase.query.filter_by(is_active=True).count()
+    
+    return {
+        'total_users': stats['total_users'],
+        'active_users': stats['active_users'],
+        'total_queries': stats['total_queries'],
+        'total_conversations': stats['total_conversations'],
+        'health_topics': health_topics,
+        'positive_feedback_percentage': stats['positive_feedback_percentage'],
+        'positive_feedback_count': stats['positive_feedback_count'],
+        'total_feedback_count': stats['total_feedback_count'],
+        'query_trends': stats['query_trends'],
+        'top_intents': stats['top_intents']
+    }
+
+def dashboard_version():
+    """Changes whenever dashboard_stats() can return something different"""
+    return rollups.version(db.session), knowledge_base_version()
+
+# One publisher per process feeds every open /api/admin/stream connection
+dashboard_publisher = DashboardPublisher(
+    dashboard_version,
+    dashboard_stats,
+    context_fn=app.app_context,
+    poll_seconds=Config.DASHBOARD_STREAM_POLL_SECONDS,
+    min_interval_seconds=Config.DASHBOARD_STREAM_MIN_INTERVAL_SECONDS,
+    heartbeat_seconds=Config.DASHBOARD_STREAM_HEARTBEAT_SECONDS,
+    max_subscribers=Config.DASHBOARD_STREAM_MAX_CLIENTS
+)
+
+STREAM_TOKEN_SCOPE = 'dashboard-stream'
+
 @app.route('/api/admin/dashboard/stats', methods=['GET'])
 @token_required
 @admin_required
+@read_replica
 def admin_dashboard_stats(current_user):
     """Get admin dashboard statistics"""
     try:
-        # Total users
-        total_users = User.query.count()
-        
-        # Active users (last 30 days)
-        thirty_days_ago = datetime.datetime.utcnow() - datetime.timedelta(days=30)
-        active_users = User.query.filter(User.last_login >= thirty_days_ago).count()
-        
-        # Total queries
-        total_queries = Message.query.filter_by(sender='user').count()
-        
-        # Total conversations
-        total_conversations = Conversation.query.count()
-        
-        # Health topics
-        health_topics = HealthKnowledgeBase.query.filter_by(is_active=True).count()
-        
-        # Feedback stats
-        total_feedback = Feedback.query.count()
-        positive_feedback = Feedback.query.filter_by(rating='positive').count()
-        positive_percentage = round((positive_feedback / total_feedback * 100), 2) if total_feedback > 0 else 0
-        
-        # Recent queries (last 7 days)
-        seven_days_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
-        daily_queries = db.session.query(
-            func.date(Message.timestamp).label('date'),
-            func.count(Message.id).label('count')
-        ).filter(
-            Message.sender == 'user',
-            Message.timestamp >= seven_days_ago
-        ).group_by(func.date(Message.timestamp)).all()
-        
-        query_trends = [{'date': str(q.date), 'count': q.count} for q in daily_queries]
-        
-        # Top intents
-        top_intents = db.session.query(
-            Message.intent,
-            func.count(Message.id).label('count')
-        ).filter(
-            Message.intent.isnot(None)
-        ).group_by(Message.intent).order_by(desc('count')).limit(5).all()
-        
-        top_intents_data = [{'intent': i.intent or 'general', 'count': i.count} for i in top_intents]
-        
-        return jsonify({
-            'total_users': total_users,
-            'active_users': active_users,
-            'total_queries': total_queries,
-            'total_conversations': total_conversations,
-            'health_topics': health_topics,
-            'positive_feedback_percentage': positive_percentage,
-            'positive_feedback_count': positive_feedback,
-            'total_feedback_count': total_feedback,
-            'query_trends': query_trends,
-            'top_intents': top_intents_data
-        }), 200
+        return jsonify(dashboard_stats()), 200
         
     except Exception as e:
         return jsonify({'message': 'Failed to fetch dashboard stats'}), 500
 
+@app.route('/api/admin/stream-token', methods=['POST'])
+@token_required
+@admin_required
+def admin_stream_token(current_user):
+    """Short-lived token that only opens /api/admin/stream
+    
+    EventSource can't set headers, so browsers pass it as ?token=, where
+    access and proxy logs record it; the session JWT never goes there.
+    """
+    expires_in = Config.DASHBOARD_STREAM_TOKEN_SECONDS
+    token = jwt.encode({
+        'user_id': current_user.id,
+        'scope': STREAM_TOKEN_SCOPE,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=expires_in)
+    }, app.config['SECRET_KEY'], algorithm='HS256')
+    return jsonify({'token': token, 'expires_in': expires_in}), 200
+
+@app.route('/api/admin/stream', methods=['GET'])
+def admin_stream():
+    """Server-Sent Events: a dashboard snapshot, then deltas as numbers change
+    
+    Authenticated by a stream token as ?token= (browsers) or a session JWT in
+    the Authorization header. Each stream holds a worker thread until it ends,
+    so only DASHBOARD_STREAM_MAX_CLIENTS are open per worker; past that the
+    client gets 503 and the dashboard falls back to polling.
+    """
+    if request.args.get('token'):
+        current_user, error = authenticate_token(request.args['token'], scope=STREAM_TOKEN_SCOPE)
+    else:
+        current_user, error = authenticate_token(request.headers.get('Authorization'))
+    if error:
+        return error
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Admin access required'}), 403
+    
+    if not dashboard_publisher.subscribe():
+        return jsonify({'message': 'Too many open dashboard streams'}), 503, {'Retry-After': '30'}
+    response = Response(
+        dashboard_publisher.stream(max_seconds=Config.DASHBOARD_STREAM_MAX_SECONDS),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, also for clients that went away
+    response.call_on_close(dashboard_publisher.unsubscribe)
+    return response
+
+ADMIN_USER_FIELDS = (
+    'id', 'username', 'email', 'age_group', 'gender', 'preferred_language',
+    'conversations_count', 'messages_count', 'created_at', 'last_login', 'role', 'is_active'
+)
+
+def parse_bool_arg(value):
+    """Parse a ?flag=true/false query argument; None when absent"""
+    if value is None:
+        return None
+    return value.lower() in ('1', 'true', 'yes')
+
 @app.route('/api/admin/users', methods=['GET'])
 @token_required
 @admin_required
+@read_replica
 def admin_users(current_user):
-    """Get all users for admin"""
+    """Get users for admin, one page at a time"""
     try:
-        users = User.query.order_by(desc(User.created_at)).all()
+        fields = request.args.get('fields')
+        fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else list(ADMIN_USER_FIELDS)
+        unknown = set(fields) - set(ADMIN_USER_FIELDS)
+        if unknown:
+            return jsonify({'message': f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+        
+        limit = page_size(request.args.get('limit', type=int), Config.ADMIN_PAGE_SIZE, Config.ADMIN_MAX_PAGE_SIZE)
+        
+        # One statement per page: counts come from correlated subqueries that only
+        # run for the rows on this page, and only when the fields are requested;
+        # archived conversations are counted from their index rows
+        columns = [User.id, User.created_at]
+        columns += [getattr(User, f) for f in fields if f not in ('id', 'created_at', 'conversations_count', 'messages_count')]
+        if 'conversations_count' in fields:
+            columns.append((select(func.count(Conversation.id))
+                            .where(Conversation.user_id == User.id)
+                            .scalar_subquery()
+                            + select(func.count(ArchivedConversation.id))
+                            .where(ArchivedConversation.user_id == User.id)
+                            .scalar_subquery()).label('conversations_count'))
+        if 'messages_count' in fields:
+            columns.append((select(func.count(Message.id))
+                            .join(Conversation, Message.conversation_id == Conversation.id)
+                            .where(Conversation.user_id == User.id)
+                            .scalar_subquery()
+                            + select(func.coalesce(func.sum(ArchivedConversation.message_count), 0))
+                            .where(ArchivedConversation.user_id == User.id)
+                            .scalar_subquery()).label('messages_count'))
+        
+        query = db.session.query(*columns)
+        
+        if request.args.get('role'):
+            query = query.filter(User.role == request.args['role'])
+        is_active = parse_bool_arg(request.args.get('is_active'))
+        if is_active is not None:
+            query = query.filter(User.is_active == is_active)
+        if request.args.get('language'):
+            query = query.filter(User.preferred_language == request.args['language'])
+        
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                created_at, user_id = decode_cursor(cursor, datetime.datetime, int)
+            except ValueError:
+                return jsonify({'message': 'Invalid cursor'}), 400
+            query = query.filter(tuple_(User.created_at, User.id) < tuple_(created_at, user_id))
+        
+        rows = query.order_by(desc(User.created_at), desc(User.id)).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         users_data = []
-        for user in users:
-            conv_count = Conversation.query.filter_by(user_id=user.id).count()
-            msg_count = Message.query.join(Conversation).filter(Conversation.user_id == user.id).count()
-            
-            users_data.append({
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'age_group': user.age_group,
-                'gender': user.gender,
-                'preferred_language': user.preferred_language,
-                'conversations_count': conv_count,
-                'messages_count': msg_count,
-                'created_at': user.created_at.isoformat(),
-                'last_login': user.last_login.isoformat() if user.last_login else None,
-                'role': user.role,
-                'is_active': user.is_active
-            })
+        for row in rows:
+            user = {}
+            for field in fields:
+                value = getattr(row, field)
+                user[field] = value.isoformat() if isinstance(value, datetime.datetime) else value
+            users_data.append(user)
         
-        return jsonify({'users': users_data}), 200
+        return jsonify({
+            'users': users_data,
+            'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+            'has_more': has_more
+        }), 200
         
     except Exception as e:
+        log.exception("❌ Admin users error")
         return jsonify({'message': 'Failed to fetch users'}), 500
 
+def parse_datetime_arg(value):
+    """Parse an ISO 8601 ?since=/?until= query argument; None when absent, ValueError when malformed"""
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value)
+
+def rated_intent(rated, archived):
+    """Intent of the rated message, from the hot row or, once archived, from its archived_rated_messages row"""
+    return func.coalesce(rated.intent, archived.intent)
+
+def filter_feedback(query, intent):
+    """Apply the ?rating=, ?intent=, ?since= (inclusive) and ?until= (exclusive) filters; ValueError on bad dates"""
+    if request.args.get('rating'):
+        query = query.filter(Feedback.rating == request.args['rating'])
+    if request.args.get('intent'):
+        query = query.filter(intent == request.args['intent'])
+    since = parse_datetime_arg(request.args.get('since'))
+    if since:
+        query = query.filter(Feedback.created_at >= since)
+    until = parse_datetime_arg(request.args.get('until'))
+    if until:
+        query = query.filter(Feedback.created_at < until)
+    return query
+
 @app.route('/api/admin/feedback', methods=['GET'])
 @token_required
 @admin_required
+@read_replica
 def admin_feedback(current_user):
-    """Get all feedback for admin"""
+    """Get feedback for admin, one page at a time, with the question and answer that were rated"""
     try:
-        feedbacks = Feedback.query.join(User).order_by(desc(Feedback.created_at)).all()
+        limit = page_size(request.args.get('limit', type=int), Config.ADMIN_PAGE_SIZE, Config.ADMIN_MAX_PAGE_SIZE)
+        
+        # Feedback is attached to the bot message; the question is the latest user
+        # message before it in the same conversation, by (timestamp, id) like the
+        # history (ids don't follow time for replayed transcripts), which walks
+        # ix_messages_conversation_timestamp backwards from the rated message
+        rated = aliased(Message)
+        question = aliased(Message)
+        question_text = (select(question.message)
+                         .where(question.conversation_id == rated.conversation_id,
+                                question.sender == 'user',
+                                question.timestamp <= rated.timestamp,
+                                tuple_(question.timestamp, question.id) < tuple_(rated.timestamp, rated.id))
+                         .order_by(desc(question.timestamp), desc(question.id))
+                         .limit(1)
+                         .scalar_subquery())
+        
+        archived = aliased(ArchivedRatedMessage)
+        intent = rated_intent(rated, archived)
+        
+        query = db.session.query(
+            Feedback.id, Feedback.message_id, Feedback.rating, Feedback.comment, Feedback.created_at,
+            User.email.label('user_email'),
+            rated.sender, rated.message, intent.label('intent'),
+            func.coalesce(rated.conversation_id, archived.conversation_id).label('conversation_id'),
+            archived.message_id.label('archived_message_id'),
+            question_text.label('question')
+        ).join(User, User.id == Feedback.user_id).outerjoin(rated, rated.id == Feedback.message_id)
+        query = query.outerjoin(archived, archived.message_id == Feedback.message_id)
+        
+        try:
+            query = filter_feedback(query, intent)
+        except ValueError:
+            return jsonify({'message': 'since/until must be ISO 8601 dates'}), 400
+        
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                created_at, feedback_id = decode_cursor(cursor, datetime.datetime, int)
+            except ValueError:
+                return jsonify({'message': 'Invalid cursor'}), 400
+            query = query.filter(tuple_(Feedback.created_at, Feedback.id) < tuple_(created_at, feedback_id))
+        
+        rows = query.order_by(desc(Feedback.created_at), desc(Feedback.id)).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        # Rated messages already archived: their text comes from the conversation records
+        archived_messages = conversation_archive.rated_messages_by_id(
+            db.session, [row.message_id for row in rows if row.sender is None and row.archived_message_id]
+        )
         
         feedback_data = []
-        for fb in feedbacks:
-            message = Message.query.get(fb.message_id)
+        for row in rows:
+            sender, message, question = row.sender, row.message, row.question
+            if row.message_id in archived_messages:
+                archived_message, archived_question = archived_messages[row.message_id]
+                sender, message = archived_message.sender, archived_message.message
+                question = archived_question.message if archived_question else None
+            # Older clients could rate a user message directly; then that message is the question
+            rated_user_message = sender == 'user'
             feedback_data.append({
-                'id': fb.id,
-                'user_email': fb.user.email,
-                'user_message': message.message if message and message.sender == 'user' else 'Bot response',
-                'rating': fb.rating,
-                'comment': fb.comment,
-                'created_at': fb.created_at.isoformat()
+                'id': row.id,
+                'message_id': row.message_id,
+                'conversation_id': row.conversation_id,
+                'user_email': row.user_email,
+                'user_message': message if rated_user_message else question,
+                'bot_response': None if rated_user_message else message,
+                'intent': row.intent,
+                'rating': row.rating,
+                'comment': row.comment,
+                'created_at': row.created_at.isoformat()
             })
         
-        return jsonify({'feedback': feedback_data}), 200
+        return jsonify({
+            'feedback': feedback_data,
+            'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+            'has_more': has_more
+        }), 200
         
     except Exception as e:
+        log.exception("❌ Admin feedback error")
         return jsonify({'message': 'Failed to fetch feedback'}), 500
 
+@app.route('/api/admin/feedback/by-intent', methods=['GET'])
+@token_required
+@admin_required
+@read_replica
+def admin_feedback_by_intent(current_user):
+    """Get feedback counts per intent of the rated answer, most negative first (for triage)"""
+    try:
+        rated = aliased(Message)
+        archived = aliased(ArchivedRatedMessage)
+        intent = rated_intent(rated, archived)
+        negative = func.sum(case((Feedback.rating == 'negative', 1), else_=0))
+        positive = func.sum(case((Feedback.rating == 'positive', 1), else_=0))
+        
+        query = db.session.query(
+            intent.label('intent'), negative.label('negative'), positive.label('positive'), func.count(Feedback.id).label('total')
+        ).outerjoin(rated, rated.id == Feedback.message_id).outerjoin(archived, archived.message_id == Feedback.message_id)
+        
+        try:
+            query = filter_feedback(query, intent)
+        except ValueError:
+            return jsonify({'message': 'since/until must be ISO 8601 dates'}), 400
+        
+        rows = query.group_by(intent).order_by(desc('negative'), desc('total')).all()
+        
+        return jsonify({'intents': [{
+            'intent': row.intent,
+            'negative': row.negative,
+            'positive': row.positive,
+            'total': row.total,
+            'negative_ratio': round(row.negative / row.total, 4) if row.total else 0.0
+        } for row in rows]}), 200
+        
+    except Exception as e:
+        log.exception("❌ Feedback by intent error")
+        return jsonify({'message': 'Failed to fetch feedback summary'}), 500
+
 @app.route('/api/admin/knowledge-base', methods=['GET', 'POST'])
 @token_required
 @admin_required
@@ -716,23 +1418,60 @@ def admin_knowledge_base(current_user):
     """Manage knowledge base"""
     try:
         if request.method == 'GET':
-            entries = HealthKnowledgeBase.query.order_by(desc(HealthKnowledgeBase.updated_at)).all()
+            # Content is the bulk of every row; it is only sent when asked for
+            include_content = parse_bool_arg(request.args.get('include_content'))
+            limit = page_size(request.args.get('limit', type=int), Config.ADMIN_PAGE_SIZE, Config.ADMIN_MAX_PAGE_SIZE)
+            
+            columns = [
+                HealthKnowledgeBase.id, HealthKnowledgeBase.category, HealthKnowledgeBase.title,
+                HealthKnowledgeBase.language, HealthKnowledgeBase.tags, HealthKnowledgeBase.is_active,
+                HealthKnowledgeBase.created_at, HealthKnowledgeBase.updated_at
+            ]
+            if include_content:
+                columns.append(HealthKnowledgeBase.content)
+            query = db.session.query(*columns)
+            
+            if request.args.get('category'):
+                query = query.filter(HealthKnowledgeBase.category == request.args['category'])
+            if request.args.get('language'):
+                query = query.filter(HealthKnowledgeBase.language == request.args['language'])
+            is_active = parse_bool_arg(request.args.get('is_active'))
+            if is_active is not None:
+                query = query.filter(HealthKnowledgeBase.is_active == is_active)
+            
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    updated_at, entry_id = decode_cursor(cursor, datetime.datetime, int)
+                except ValueError:
+                    return jsonify({'message': 'Invalid cursor'}), 400
+                query = query.filter(tuple_(HealthKnowledgeBase.updated_at, HealthKnowledgeBase.id) < tuple_(updated_at, entry_id))
+            
+            rows = query.order_by(desc(HealthKnowledgeBase.updated_at), desc(HealthKnowledgeBase.id)).limit(limit + 1).all()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             
             knowledge_data = []
-            for entry in entries:
-                knowledge_data.append({
-                    'id': entry.id,
-                    'category': entry.category,
-                    'title': entry.title,
-                    'content': entry.content,
-                    'language': entry.language,
-                    'tags': json.loads(entry.tags) if entry.tags else [],
-                    'is_active': entry.is_active,
-                    'created_at': entry.created_at.isoformat(),
-                    'updated_at': entry.updated_at.isoformat()
-                })
+            for row in rows:
+                entry = {
+                    'id': row.id,
+                    'category': row.category,
+                    'title': row.title,
+                    'language': row.language,
+                    'tags': json.loads(row.tags) if row.tags else [],
+                    'is_active': row.is_active,
+                    'created_at': row.created_at.isoformat(),
+                    'updated_at': row.updated_at.isoformat()
+                }
+                if include_content:
+                    entry['content'] = row.content
+                knowledge_data.append(entry)
             
-            return jsonify({'knowledge_base': knowledge_data}), 200
+            return jsonify({
+                'knowledge_base': knowledge_data,
+                'next_cursor': encode_cursor(rows[-1].updated_at, rows[-1].id) if has_more else None,
+                'has_more': has_more
+            }), 200
         
         elif request.method == 'POST':
             data = request.get_json()
@@ -748,20 +1487,262 @@ def admin_knowledge_base(current_user):
             db.session.add(new_entry)
             db.session.commit()
             
+            reload_response_index()
+            response_cache.invalidate()
+            retrieval_index.upsert(new_entry.id, new_entry.language, new_entry.category, new_entry.title,
+                                   new_entry.content, new_entry.tags, new_entry.updated_at)
+            retrieval_index.save()
+            
             return jsonify({'message': 'Knowledge base entry added successfully'}), 201
             
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Operation failed'}), 500
 
+@app.route('/api/admin/knowledge-base/<int:entry_id>', methods=['GET'])
+@token_required
+@admin_required
+def admin_knowledge_base_entry(current_user, entry_id):
+    """Get one knowledge base entry with its content (for the edit form)"""
+    entry = db.session.get(HealthKnowledgeBase, entry_id)
+    if not entry:
+        return jsonify({'message': 'Entry not found'}), 404
+    
+    return jsonify({
+        'id': entry.id,
+        'category': entry.category,
+        'title': entry.title,
+        'content': entry.content,
+        'language': entry.language,
+        'tags': json.loads(entry.tags) if entry.tags else [],
+        'is_active': entry.is_active,
+        'created_at': entry.created_at.isoformat(),
+        'updated_at': entry.updated_at.isoformat()
+    }), 200
+
+@app.route('/api/admin/knowledge-base/import', methods=['POST'])
+@token_required
+@admin_required
+def admin_knowledge_base_import(current_user):
+    """Bulk import knowledge base entries from NDJSON, CSV, YAML or a Rasa domain.yml
+    
+    The body is the file itself, or a multipart upload in `file`. Progress is
+    streamed back as NDJSON, one line per committed batch, then the final report.
+    """
+    upload = request.files.get('file')
+    input_format = request.args.get('format') or format_for(upload.filename if upload else None)
+    if input_format not in KB_IMPORT_FORMATS:
+        return jsonify({'message': f"format must be one of: {', '.join(KB_IMPORT_FORMATS)}"}), 400
+    
+    # Language of each domain.yml response variant, by position
+    languages = [l.strip() for l in request.args.get('languages', '').split(',') if l.strip()] or Config.SUPPORTED_LANGUAGES
+    unknown = set(languages) - set(Config.SUPPORTED_LANGUAGES)
+    if unknown:
+        return jsonify({'message': f"Unsupported languages: {', '.join(sorted(unknown))}"}), 400
+    
+    batch_size = page_size(request.args.get('batch_size', type=int), Config.KB_IMPORT_BATCH_SIZE, Config.KB_IMPORT_MAX_BATCH_SIZE)
+    if upload:
+        # Request teardown closes uploaded files before the streamed response is read; keep our own handle
+        source, upload.stream = upload.stream, io.BytesIO()
+    else:
+        source = request.stream
+    stream = codecs.getreader('utf-8-sig')(source)
+    importer = KnowledgeBaseImporter(db.engine, HealthKnowledgeBase.__table__, Config.SUPPORTED_LANGUAGES, batch_size)
+    
+    def generate():
+        try:
+            for report in importer.batches(read_knowledge_base(stream, input_format, languages)):
+                yield json.dumps({key: value for key, value in report.items() if key != 'errors'}) + '\n'
+        except Exception as e:
+            log.exception("❌ Knowledge base import error")
+            yield json.dumps({'error': str(e)}) + '\n'
+        finally:
+            if upload:
+                source.close()
+            # Batches committed before a failure are kept; serve them right away
+            if importer.report['inserted'] or importer.report['updated']:
+                refresh_knowledge_base()
+        log.info("📥 Knowledge base import", extra={k: v for k, v in importer.report.items() if k != 'errors'})
+        yield json.dumps(dict(importer.report, done=True)) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/admin/knowledge-base/export', methods=['GET'])
+@token_required
+@admin_required
+def admin_knowledge_base_export(current_user):
+    """Stream the knowledge base as NDJSON (default) or CSV"""
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+    
+    entries = export_rows(
+        db.engine, HealthKnowledgeBase.__table__,
+        language=request.args.get('language'),
+        category=request.args.get('category'),
+        batch_size=Config.KB_EXPORT_BATCH_SIZE
+    )
+    body, mimetype = (to_csv(entries), 'text/csv') if output_format == 'csv' else (to_ndjson(entries), 'application/x-ndjson')
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f"attachment; filename=knowledge_base.{output_format}"
+    })
+
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@token_required
+@admin_required
+def admin_cache_stats(current_user):
+    """Get hit/miss counters for in-process caches"""
+    return jsonify({
+        'response_index': response_index.stats(),
+        'retrieval_index': retrieval_index.stats(),
+        'dashboard_stream': dashboard_publisher.stats(),
+        'auth': auth_cache.stats(),
+        'last_login_writes': last_login_writer.stats(),
+        'rasa': rasa_gateway.stats(),
+        'responses': response_cache.stats()
+    }), 200
+
+@app.route('/api/admin/chat-store/stats', methods=['GET'])
+@token_required
+@admin_required
+def admin_chat_store_stats(current_user):
+    """Get chat persistence queue depth and flush latency"""
+    return jsonify(chat_store.stats()), 200
+
+@app.route('/api/admin/archive/stats', methods=['GET'])
+@token_required
+@admin_required
+def admin_archive_stats(current_user):
+    """Get archived conversation and segment counts"""
+    return jsonify(conversation_archive.stats(db.session)), 200
+
+# Read when /api/admin/metrics is scraped
+metrics.gauge('wellbot_chat_queue_depth', 'Chat turns waiting for the write-behind flush',
+              lambda: chat_store.stats()['queue_depth'])
+metrics.gauge('wellbot_response_cache_hit_ratio', 'Share of chat turns answered from the response cache',
+              lambda: response_cache.stats()['hit_ratio'])
+metrics.gauge('wellbot_rasa_circuit_open', '1 while the Rasa circuit breaker is open',
+              lambda: int(rasa_gateway.breaker.state == rasa_gateway.breaker.OPEN))
+metrics.gauge('wellbot_log_records_dropped', 'Log records dropped because the log buffer was full',
+              lambda: log_handler.dropped)
+metrics.gauge('wellbot_process_uptime_seconds', 'Seconds since this worker started recording',
+              lambda: round(time.time() - metrics.started_at, 3))
+
+@app.route('/api/admin/metrics', methods=['GET'])
+@token_required
+@admin_required
+def admin_metrics(current_user):
+    """Get latency histograms and counters of this worker in Prometheus text format"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/admin/profiles', methods=['GET', 'POST', 'DELETE'])
+@token_required
+@admin_required
+def admin_profiles(current_user):
+    """List stored profiles, start profiling the worker serving this request, or stop it early"""
+    if request.method == 'GET':
+        return jsonify({
+            'worker_pid': os.getpid(),
+            'active': profiler.status(),
+            'profiles': profiler.profiles()
+        }), 200
+    
+    if request.method == 'DELETE':
+        if not profiler.stop():
+            return jsonify({'message': 'No profile is running in this worker'}), 404
+        return jsonify({'message': 'Profile stopped', 'worker_pid': os.getpid()}), 200
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        session = profiler.start(
+            data.get('seconds', 30),
+            route=data.get('route'),
+            output_format=data.get('format', 'collapsed'),
+            interval_ms=data.get('interval_ms')
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'message': str(e)}), 409
+    
+    return jsonify(session), 202
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+@token_required
+@admin_required
+def admin_profile_download(current_user, name):
+    """Download one stored profile"""
+    path = profiler.path_of(name)
+    if not path:
+        return jsonify({'message': 'Profile not found'}), 404
+    return send_file(path, as_attachment=True, download_name=name)
+
+PREVIEW_TABLES = {'users': User, 'conversations': Conversation, 'messages': Message, 'feedback': Feedback}
+
+def table_totals(exact=False):
+    """Row count per previewed table
+    
+    By default the rollup counters (kept by every insert) answer this in one
+    small read, falling back to max(id) for a counter that doesn't exist yet;
+    both include archived rows. exact=True runs COUNT(*), which scans each
+    table, and adds the archived conversations and messages.
+    """
+    if exact:
+        totals = {name: db.session.execute(select(func.count()).select_from(model.__table__)).scalar()
+                  for name, model in PREVIEW_TABLES.items()}
+        archived = conversation_archive.stats(db.session)
+        totals['conversations'] += archived['conversations']
+        totals['messages'] += archived['messages']
+        return totals
+    counters = rollups.counter_values(db.session)
+    totals = {}
+    for name, model in PREVIEW_TABLES.items():
+        if name in counters:
+            totals[name] = counters[name]
+        else:
+            totals[name] = db.session.execute(select(func.max(model.id))).scalar() or 0
+    return totals
+
+def archived_preview_messages(limit):
+    """Newest archived messages, newest first, read from the newest archived conversations"""
+    entries, needed = [], limit
+    for entry in db.session.execute(
+        select(ArchivedConversation.id, ArchivedConversation.message_count)
+        .order_by(desc(ArchivedConversation.id)).limit(limit)
+    ):
+        if needed <= 0:
+            break
+        entries.append(entry.id)
+        needed -= entry.message_count
+    records = conversation_archive.records(db.session, entries)
+    rows = []
+    for conversation_id in entries:
+        rows.extend(reversed(records[conversation_id]['messages']))
+    return rows[:limit]
+
 @app.route('/api/admin/database-preview', methods=['GET'])
 @token_required
 @admin_required
+@read_replica
 def admin_database_preview(current_user):
-    """Get database preview with all tables data"""
+    """Get database preview with all tables data
+    
+    Column selects only (no ORM objects, no lazy loads), newest rows by
+    indexed order, message text cut in SQL. Totals come from the rollup
+    counters unless ?exact=true asks for COUNT(*) scans. Archived
+    conversations and messages fill the lists when the hot tables hold
+    fewer rows than a list shows.
+    """
     try:
+        preview = Config.DATABASE_PREVIEW_MESSAGE_CHARS
+        exact = bool(parse_bool_arg(request.args.get('exact')))
+        
         # Get users data
-        users = User.query.order_by(desc(User.created_at)).limit(50).all()
+        users = db.session.execute(
+            select(User.id, User.username, User.email, User.age_group, User.gender,
+                   User.preferred_language, User.role, User.created_at, User.last_login)
+            .order_by(desc(User.created_at)).limit(50)
+        ).all()
         users_data = []
         for user in users:
             users_data.append({
@@ -776,41 +1757,70 @@ def admin_database_preview(current_user):
                 'last_login': user.last_login.isoformat() if user.last_login else None
             })
 
-        # Get conversations data
-        conversations = Conversation.query.order_by(desc(Conversation.start_time)).limit(50).all()
+        # Get conversations data; ids grow with start_time, and the primary key needs no sort
+        message_count = (select(func.count(Message.id))
+                         .where(Message.conversation_id == Conversation.id)
+                         .scalar_subquery())
+        conversations = db.session.execute(
+            select(Conversation.id, Conversation.user_id, User.email, Conversation.start_time,
+                   Conversation.end_time, message_count.label('message_count'), literal(False).label('archived'))
+            .outerjoin(User, User.id == Conversation.user_id)
+            .order_by(desc(Conversation.id)).limit(50)
+        ).all()
+        if len(conversations) < 50:
+            conversations += db.session.execute(
+                select(ArchivedConversation.id, ArchivedConversation.user_id, User.email,
+                       ArchivedConversation.start_time, ArchivedConversation.end_time,
+                       ArchivedConversation.message_count, literal(True).label('archived'))
+                .outerjoin(User, User.id == ArchivedConversation.user_id)
+                .order_by(desc(ArchivedConversation.id)).limit(50 - len(conversations))
+            ).all()
         conversations_data = []
         for conv in conversations:
             conversations_data.append({
                 'id': conv.id,
                 'user_id': conv.user_id,
-                'user_email': conv.user.email if conv.user else 'Unknown',
+                'user_email': conv.email or 'Unknown',
                 'start_time': conv.start_time.isoformat(),
                 'end_time': conv.end_time.isoformat() if conv.end_time else None,
-                'message_count': len(conv.messages)
+                'message_count': conv.message_count,
+                'archived': bool(conv.archived)
             })
 
-        # Get messages data
-        messages = Message.query.order_by(desc(Message.timestamp)).limit(100).all()
+        # Get messages data: one extra character tells whether the text was cut
+        messages = db.session.execute(
+            select(Message.id, Message.conversation_id, Message.sender,
+                   func.substr(Message.message, 1, preview + 1).label('message'),
+                   Message.intent, Message.confidence, Message.timestamp)
+            .order_by(desc(Message.id)).limit(100)
+        ).all()
+        if len(messages) < 100:
+            messages += archived_preview_messages(100 - len(messages))
         messages_data = []
         for msg in messages:
             messages_data.append({
                 'id': msg.id,
                 'conversation_id': msg.conversation_id,
                 'sender': msg.sender,
-                'message': msg.message[:100] + '...' if len(msg.message) > 100 else msg.message,
+                'message': msg.message[:preview] + '...' if len(msg.message) > preview else msg.message,
                 'intent': msg.intent,
                 'confidence': msg.confidence,
                 'timestamp': msg.timestamp.isoformat()
             })
 
         # Get feedback data
-        feedbacks = Feedback.query.order_by(desc(Feedback.created_at)).limit(50).all()
+        feedbacks = db.session.execute(
+            select(Feedback.id, Feedback.user_id, User.email, Feedback.message_id,
+                   Feedback.rating, Feedback.comment, Feedback.created_at)
+            .outerjoin(User, User.id == Feedback.user_id)
+            .order_by(desc(Feedback.created_at)).limit(50)
+        ).all()
         feedback_data = []
         for fb in feedbacks:
             feedback_data.append({
                 'id': fb.id,
                 'user_id': fb.user_id,
-                'user_email': fb.user.email if fb.user else 'Unknown',
+                'user_email': fb.email or 'Unknown',
                 'message_id': fb.message_id,
                 'rating': fb.rating,
                 'comment': fb.comment,
@@ -822,16 +1832,12 @@ def admin_database_preview(current_user):
             'conversations': conversations_data,
             'messages': messages_data,
             'feedback': feedback_data,
-            'totals': {
-                'users': User.query.count(),
-                'conversations': Conversation.query.count(),
-                'messages': Message.query.count(),
-                'feedback': Feedback.query.count()
-            }
+            'totals': table_totals(exact=exact),
+            'totals_exact': exact
         }), 200
 
     except Exception as e:
-        print(f"❌ Database preview error: {str(e)}")
+        log.exception("❌ Database preview error")
         return jsonify({'message': 'Failed to fetch database preview'}), 500
 
 # ==================== ERROR HANDLERS ====================
@@ -845,6 +1851,94 @@ def internal_error(error):
     db.session.rollback()
     return jsonify({'message': 'Internal server error'}), 500
 
+# ==================== CLI COMMANDS ====================
+
+@app.cli.command('backfill-stats')
+def backfill_stats_command():
+    """Fold rows below the rollup high-water marks into the dashboard tables"""
+    with app.app_context():
+        print(f"📊 {rollups.backfill(db.session)} ids scanned")
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Create missing tables and indexes and apply pending schema migrations"""
+    with app.app_context():
+        applied = upgrade_schema(db.engine, db.metadata, SchemaMigration)
+    for name in applied:
+        print(f"🧱 Applied: {name}")
+    print(f"✅ Schema up to date ({len(applied)} migrations applied)")
+
+@app.cli.command('db-status')
+def db_status_command():
+    """List schema migrations and whether this database has them"""
+    with app.app_context():
+        print(f"🗄️ {db.engine.url.render_as_string(hide_password=True)}")
+        for version, name, applied_at in schema_status(db.engine, SchemaMigration):
+            print(f"   {version:>4} {'✅ ' + applied_at.isoformat() if applied_at else '⏳ pending'}  {name}")
+
+@app.cli.command('train-intents')
+def train_intents_command():
+    """Train the in-process intent classifier from nlu.yml (answers from domain.yml)"""
+    examples = load_nlu_examples(os.path.join(app.root_path, 'nlu.yml'))
+    responses = load_domain_responses(
+        os.path.join(app.root_path, 'domain.yml'),
+        os.path.join(app.root_path, 'rules.yml'),
+        os.path.join(app.root_path, 'stories.yml')
+    )
+    weights, metadata = train_model(examples, responses)
+    path = intent_model_path()
+    save_model(path, weights, metadata)
+    print(f"🧠 Trained on {metadata['examples']} examples / {len(metadata['labels'])} intents, "
+          f"cross-validated accuracy {metadata['cv_accuracy']:.0%} -> {path}.npy")
+
+@app.cli.command('import-kb')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'input_format', type=click.Choice(KB_IMPORT_FORMATS), help='Default: from the file name')
+@click.option('--languages', default=','.join(Config.SUPPORTED_LANGUAGES), show_default=True,
+              help='Language of each domain.yml response variant, in order')
+@click.option('--batch-size', default=Config.KB_IMPORT_BATCH_SIZE, show_default=True)
+def import_kb_command(path, input_format, languages, batch_size):
+    """Bulk import knowledge base entries (NDJSON, CSV, YAML or domain.yml)"""
+    input_format = input_format or format_for(path)
+    if not input_format:
+        raise click.UsageError('Cannot tell the format from the file name; pass --format')
+    init_db()
+    importer = KnowledgeBaseImporter(db.engine, HealthKnowledgeBase.__table__, Config.SUPPORTED_LANGUAGES, batch_size)
+    with app.app_context(), open(path, encoding='utf-8-sig', newline='') as fh:
+        records = read_knowledge_base(fh, input_format, [l.strip() for l in languages.split(',') if l.strip()])
+        for report in importer.batches(records):
+            print(f"📥 {report['read']} read, {report['inserted']} inserted, {report['updated']} updated, "
+                  f"{report['unchanged']} unchanged, {report['invalid']} invalid")
+        refresh_knowledge_base()
+    for error in importer.report['errors']:
+        print(f"⚠️ Record {error['record']}: {error['error']}")
+    print(f"✅ Imported in {importer.report['batches']} batches ({importer.report['duplicates']} duplicates merged)")
+
+@app.cli.command('export-kb')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'output_format', type=click.Choice(['ndjson', 'csv']), help='Default: from the file name')
+def export_kb_command(path, output_format):
+    """Export the knowledge base to NDJSON or CSV"""
+    output_format = output_format or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with app.app_context():
+        entries = export_rows(db.engine, HealthKnowledgeBase.__table__, batch_size=Config.KB_EXPORT_BATCH_SIZE)
+        with open(path, 'w', encoding='utf-8', newline='') as fh:
+            for chunk in (to_csv(entries) if output_format == 'csv' else to_ndjson(entries)):
+                fh.write(chunk)
+    print(f"📤 Knowledge base written to {path}")
+
+@app.cli.command('archive-conversations')
+@click.option('--limit', type=int, help='Archive at most this many conversations in this run')
+def archive_conversations_command(limit):
+    """Close idle conversations and move old closed ones to the archive (run from cron)"""
+    init_db()
+    with app.app_context():
+        report = conversation_archive.archive(limit=limit)
+    print(f"🗄️ {report['closed']} idle conversations closed, {report['conversations']} conversations / "
+          f"{report['messages']} messages archived ({report['bytes']} bytes) in {report['seconds']}s")
+    for segment in report['segments']:
+        print(f"   {os.path.join(conversation_archive.directory, segment)}")
+
 # ==================== MAIN ====================
 
 if __name__ == '__main__':
@@ -0,0 +1,284 @@
+import datetime
+import fcntl
+import gzip
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+from sqlalchemy import delete, func, select, update
+
+from cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+# Same attributes as a messages row, so history code can serialize either tier
+MessageRow = namedtuple('MessageRow', ['id', 'conversation_id', 'sender', 'message', 'intent', 'confidence', 'timestamp'])
+
+# ==================== CONVERSATION ARCHIVE ====================
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def _parse(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+class ConversationArchive:
+    """Cold tier for conversations: append-only, gzip-compressed monthly segment files
+
+    A conversation is closed once it has been idle for idle_timeout and moves
+    to the archive archive_after after it was closed. Each archived
+    conversation is one JSON line compressed as its own gzip member and
+    appended to conversations-YYYY-MM.jsonl.gz (month of its start), so a
+    segment is also a plain .jsonl.gz file. The index table maps the
+    conversation id to (segment, offset, length) and keeps what history
+    pages need without opening segments; messages that received feedback
+    are also indexed by message id so the feedback listing can find them.
+
+    Segment bytes are fsynced before the index rows are committed and the
+    hot rows deleted in the same transaction; a run that dies in between
+    leaves unreferenced bytes behind and the next run archives the
+    conversation again.
+    """
+
+    def __init__(self, db, conversation_model, message_model, feedback_model, index_model, rated_message_model,
+                 directory, idle_timeout, archive_after, batch_size=500, cache_size=256):
+        self.db = db
+        self.conversations = conversation_model.__table__
+        self.messages = message_model.__table__
+        self.feedback = feedback_model.__table__
+        self.index = index_model.__table__
+        self.rated_messages = rated_message_model.__table__
+        self.directory = directory
+        self.idle_timeout = idle_timeout
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+        self.cache = TTLCache(maxsize=cache_size, ttl=3600)
+
+    # ---------- lifecycle ----------
+
+    def last_activity(self):
+        """Time of a conversation's latest message (its start when empty), correlated to conversations"""
+        last_message = (select(func.max(self.messages.c.timestamp))
+                        .where(self.messages.c.conversation_id == self.conversations.c.id)
+                        .scalar_subquery())
+        return func.coalesce(last_message, self.conversations.c.start_time)
+
+    def close_idle(self, executor, now=None):
+        """End every open conversation idle for longer than idle_timeout; returns how many"""
+        cutoff = (now or datetime.datetime.utcnow()) - self.idle_timeout
+        last_activity = self.last_activity()
+        return executor.execute(
+            update(self.conversations)
+            .where(self.conversations.c.end_time.is_(None), last_activity < cutoff)
+            .values(end_time=last_activity)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    # ---------- archiving ----------
+
+    def archive(self, now=None, limit=None):
+        """Close idle conversations, then move those closed before archive_after into segments
+
+        Returns a report; only one archiver runs at a time (lock file in the archive directory).
+        """
+        started = time.perf_counter()
+        now = now or datetime.datetime.utcnow()
+        report = {'closed': 0, 'conversations': 0, 'messages': 0, 'bytes': 0, 'segments': []}
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            session = self.db.session
+            report['closed'] = self.close_idle(session, now)
+            session.commit()
+
+            segments = set()
+            while limit is None or report['conversations'] < limit:
+                batch = self._due(session, now - self.archive_after,
+                                  self.batch_size if limit is None else min(self.batch_size, limit - report['conversations']))
+                if not batch:
+                    break
+                messages, size, written = self._archive_batch(session, batch)
+                report['conversations'] += len(batch)
+                report['messages'] += messages
+                report['bytes'] += size
+                segments.update(written)
+
+        report['segments'] = sorted(segments)
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        log.info("🗄️ Conversations archived", extra={k: v for k, v in report.items() if k != 'segments'})
+        return report
+
+    def _due(self, session, cutoff, size):
+        """Closed conversations due for archiving, oldest first
+
+        The newest conversation and the one holding the newest message stay:
+        SQLite hands out max(id) + 1 for a new row, so deleting the row with
+        the highest id would let its id be reused by a hot row.
+        """
+        conversations, messages = self.conversations, self.messages
+        newest_message_conversation = (select(messages.c.conversation_id)
+                                       .where(messages.c.id == select(func.max(messages.c.id)).scalar_subquery())
+                                       .scalar_subquery())
+        return session.execute(
+            select(conversations.c.id, conversations.c.user_id, conversations.c.start_time, conversations.c.end_time)
+            .where(conversations.c.end_time.isnot(None),
+                   conversations.c.end_time < cutoff,
+                   conversations.c.id < select(func.max(conversations.c.id)).scalar_subquery(),
+                   conversations.c.id != func.coalesce(newest_message_conversation, 0))
+            .order_by(conversations.c.id)
+            .limit(size)
+        ).all()
+
+    def _archive_batch(self, session, batch):
+        conversations, messages, feedback = self.conversations, self.messages, self.feedback
+        ids = [conv.id for conv in batch]
+
+        grouped = {}
+        for row in session.execute(
+            select(messages.c.id, messages.c.conversation_id, messages.c.sender, messages.c.message,
+                   messages.c.intent, messages.c.confidence, messages.c.timestamp)
+            .where(messages.c.conversation_id.in_(ids))
+            .order_by(messages.c.conversation_id, messages.c.timestamp, messages.c.id)
+        ):
+            grouped.setdefault(row.conversation_id, []).append(row)
+
+        rated = session.execute(
+            select(messages.c.id, messages.c.conversation_id, messages.c.intent)
+            .join(feedback, feedback.c.message_id == messages.c.id)
+            .where(messages.c.conversation_id.in_(ids))
+            .distinct()
+        ).all()
+
+        # Append every record, grouped by segment, and make the bytes durable first
+        index_rows, size, written = [], 0, set()
+        by_segment = {}
+        for conv in batch:
+            by_segment.setdefault(f"conversations-{conv.start_time:%Y-%m}.jsonl.gz", []).append(conv)
+        for segment, convs in by_segment.items():
+            with open(os.path.join(self.directory, segment), 'ab') as fh:
+                offset = fh.tell()
+                for conv in convs:
+                    rows = grouped.get(conv.id, [])
+                    data = gzip.compress((json.dumps({
+                        'id': conv.id,
+                        'user_id': conv.user_id,
+                        'start_time': _iso(conv.start_time),
+                        'end_time': _iso(conv.end_time),
+                        'messages': [{
+                            'id': row.id,
+                            'sender': row.sender,
+                            'message': row.message,
+                            'intent': row.intent,
+                            'confidence': row.confidence,
+                            'timestamp': _iso(row.timestamp)
+                        } for row in rows]
+                    }, ensure_ascii=False) + '\n').encode('utf-8'))
+                    fh.write(data)
+                    index_rows.append({
+                        'id': conv.id,
+                        'user_id': conv.user_id,
+                        'start_time': conv.start_time,
+                        'end_time': conv.end_time,
+                        'message_count': len(rows),
+                        'segment': segment,
+                        'offset': offset,
+                        'length': len(data)
+                    })
+                    offset += len(data)
+                    size += len(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            written.add(segment)
+
+        # Then swap tiers in one transaction
+        session.execute(delete(self.index).where(self.index.c.id.in_(ids)))
+        session.execute(self.index.insert(), index_rows)
+        if rated:
+            session.execute(delete(self.rated_messages).where(self.rated_messages.c.message_id.in_([r.id for r in rated])))
+            session.execute(self.rated_messages.insert(), [
+                {'message_id': r.id, 'conversation_id': r.conversation_id, 'intent': r.intent} for r in rated
+            ])
+        session.execute(delete(messages).where(messages.c.conversation_id.in_(ids)))
+        session.execute(delete(conversations).where(conversations.c.id.in_(ids)))
+        session.commit()
+        return sum(len(rows) for rows in grouped.values()), size, written
+
+    # ---------- reading ----------
+
+    def read(self, segment, offset, length):
+        """One archived conversation record: {'id', 'user_id', 'start_time', 'end_time', 'messages': [MessageRow]}"""
+        key = (segment, offset)
+        record = self.cache.get(key)
+        if record is None:
+            with open(os.path.join(self.directory, segment), 'rb') as fh:
+                fh.seek(offset)
+                data = json.loads(gzip.decompress(fh.read(length)))
+            record = {
+                'id': data['id'],
+                'user_id': data['user_id'],
+                'start_time': _parse(data['start_time']),
+                'end_time': _parse(data['end_time']),
+                'messages': [MessageRow(
+                    m['id'], data['id'], m['sender'], m['message'], m['intent'], m['confidence'], _parse(m['timestamp'])
+                ) for m in data['messages']]
+            }
+            self.cache.set(key, record)
+        return record
+
+    def record(self, session, conversation_id, user_id=None):
+        """Archived conversation record by id (optionally only if it belongs to user_id), or None"""
+        query = select(self.index.c.segment, self.index.c.offset, self.index.c.length).where(self.index.c.id == conversation_id)
+        if user_id is not None:
+            query = query.where(self.index.c.user_id == user_id)
+        entry = session.execute(query).first()
+        return self.read(entry.segment, entry.offset, entry.length) if entry else None
+
+    def records(self, session, conversation_ids):
+        """{conversation id: record} for the archived ones among conversation_ids"""
+        if not conversation_ids:
+            return {}
+        entries = session.execute(
+            select(self.index.c.id, self.index.c.segment, self.index.c.offset, self.index.c.length)
+            .where(self.index.c.id.in_(conversation_ids))
+        ).all()
+        return {entry.id: self.read(entry.segment, entry.offset, entry.length) for entry in entries}
+
+    def rated_messages_by_id(self, session, message_ids):
+        """{message id: (MessageRow, question MessageRow or None)} for archived messages that got feedback"""
+        if not message_ids:
+            return {}
+        located = session.execute(
+            select(self.rated_messages.c.message_id, self.rated_messages.c.conversation_id)
+            .where(self.rated_messages.c.message_id.in_(message_ids))
+        ).all()
+        records = self.records(session, {row.conversation_id for row in located})
+        found = {}
+        for row in located:
+            record = records.get(row.conversation_id)
+            if not record:
+                continue
+            question = None
+            for message in record['messages']:
+                if message.id == row.message_id:
+                    found[row.message_id] = (message, question)
+                    break
+                if message.sender == 'user':
+                    question = message
+        return found
+
+    def stats(self, session):
+        conversations, messages = session.execute(
+            select(func.count(self.index.c.id), func.coalesce(func.sum(self.index.c.message_count), 0))
+        ).one()
+        segments = [name for name in os.listdir(self.directory) if name.endswith('.jsonl.gz')] if os.path.isdir(self.directory) else []
+        return {
+            'conversations': conversations,
+            'messages': messages,
+            'segments': len(segments),
+            'bytes': sum(os.path.getsize(os.path.join(self.directory, name)) for name in segments),
+            'record_cache': self.cache.stats()
+        }
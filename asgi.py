@@ -0,0 +1,277 @@
+"""Async serving mode: `python -m wellbot serve --asgi` (or `uvicorn asgi:app`)
+
+/api/chat, /api/conversation/history and /api/feedback run on the event loop:
+Rasa is awaited over aiohttp and blocking database work goes to a bounded
+thread pool, so a request waiting on either holds no thread. Everything else
+is the unchanged Flask app, mounted underneath.
+"""
+import datetime
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import FastAPI, Request
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+import app as backend
+from config import Config
+from pagination import encode_cursor
+
+log = logging.getLogger(__name__)
+
+# Same JSON contracts as the Flask routes of the same paths
+ASYNC_ROUTES = {'/api/chat', '/api/conversation/history', '/api/feedback'}
+
+# ==================== BACKPRESSURE ====================
+
+class Admission:
+    """Caps requests in flight per worker; past the cap callers get 429 + Retry-After at once
+
+    Only touched from the event loop thread, so plain counters are enough.
+    """
+
+    def __init__(self, limit, retry_after):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_enter(self):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak = max(self.peak, self.in_flight)
+        return True
+
+    def leave(self):
+        self.in_flight -= 1
+
+    def busy_response(self):
+        return JSONResponse(
+            {'message': 'Server is busy, please retry shortly'},
+            status_code=429,
+            headers={'Retry-After': str(self.retry_after)}
+        )
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'in_flight': self.in_flight,
+            'peak': self.peak,
+            'admitted': self.admitted,
+            'rejected': self.rejected
+        }
+
+admission = Admission(Config.ASYNC_MAX_IN_FLIGHT, Config.ASYNC_RETRY_AFTER_SECONDS)
+
+# ==================== DATABASE THREADS ====================
+
+db_threads = None  # anyio.CapacityLimiter, created on the event loop at startup
+
+def _in_app_context(fn, args):
+    with backend.app.app_context():
+        try:
+            return fn(*args)
+        except Exception:
+            backend.db.session.rollback()
+            raise
+
+async def run_db(fn, *args):
+    """Run blocking database work on the bounded pool, inside a Flask app context"""
+    return await anyio.to_thread.run_sync(_in_app_context, fn, args, limiter=db_threads)
+
+def _authenticate(token):
+    user, error = backend.authenticate_token(token)
+    if error:
+        body, status = error
+        return None, JSONResponse(body.get_json(), status_code=status)
+    return user, None
+
+async def authenticate(request):
+    """(user, None) or (None, 401 response), like token_required"""
+    return await run_db(_authenticate, request.headers.get('Authorization'))
+
+async def json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def int_arg(value):
+    """Like Flask's request.args.get(..., type=int): None when missing or not a number"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# ==================== APPLICATION ====================
+
+@asynccontextmanager
+async def lifespan(api):
+    global db_threads
+    db_threads = anyio.CapacityLimiter(Config.ASYNC_DB_THREADS)
+    yield
+    await backend.rasa_gateway.close_async()
+    await anyio.to_thread.run_sync(backend.chat_store.stop)
+
+app = FastAPI(title='WellBot', lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+@app.middleware('http')
+async def backpressure(request, call_next):
+    if request.url.path not in ASYNC_ROUTES:
+        return await call_next(request)
+    if not admission.try_enter():
+        return admission.busy_response()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        admission.leave()
+        # Same series the Flask routes record, so both serving modes show up on /api/admin/metrics
+        backend.metrics.observe('wellbot_request_seconds', (
+            ('route', request.url.path), ('method', request.method), ('status', str(status))
+        ), time.perf_counter() - started)
+
+@app.post('/api/chat')
+async def chat(request: Request):
+    """Handle chat messages"""
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    try:
+        data = await json_body(request)
+
+        if not isinstance(data, dict) or not data.get('message'):
+            return JSONResponse({'message': 'Message is required'}, status_code=400)
+
+        user_message = data['message'].strip()
+
+        if not user_message or len(user_message) > 1000:
+            return JSONResponse({'message': 'Invalid message length'}, status_code=400)
+
+        received_at = datetime.datetime.utcnow()
+        started = time.perf_counter()
+        plan = await run_db(backend.start_chat_turn, user, user_message)
+
+        rasa_response = None
+        if plan.cached_response is None and backend.USE_RASA:
+            with backend.metrics.span('rasa'):
+                rasa_response = await backend.rasa_gateway.respond_async(user_message, f"user_{user.id}", plan.intent)
+
+        body = await run_db(backend.finish_chat_turn, user, user_message, plan, rasa_response, received_at, started)
+        return JSONResponse(body)
+
+    except Exception as e:
+        log.exception("❌ Chat error")
+        return JSONResponse({'message': 'Failed to process message'}, status_code=500)
+
+def history_page(user_id, before, limit, per_conversation):
+    """(history JSON for one page, cursor of the next page or None)"""
+    conversations, has_more = backend.conversation_page(user_id, before, limit)
+    history = list(backend.serialize_history_page(conversations, per_conversation))
+    return history, (conversations[-1].start_time, conversations[-1].id) if has_more else None
+
+async def stream_history(user_id, before, limit, per_conversation):
+    # One page per database round trip; the loop is free while the client reads
+    while True:
+        history, before = await run_db(history_page, user_id, before, limit, per_conversation)
+        for item in history:
+            yield json.dumps(item) + '\n'
+        if before is None:
+            break
+    yield json.dumps({'next_cursor': None, 'has_more': False}) + '\n'
+
+@app.get('/api/conversation/history')
+async def get_history(request: Request):
+    """Get conversation history, one page of conversations at a time (?format=ndjson streams it all)"""
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    try:
+        per_conversation = Config.MAX_CONVERSATION_HISTORY
+        try:
+            limit, before = backend.history_page_params(
+                int_arg(request.query_params.get('limit')), request.query_params.get('cursor')
+            )
+        except ValueError:
+            return JSONResponse({'message': 'Invalid cursor'}, status_code=400)
+
+        if request.query_params.get('format') == 'ndjson':
+            return StreamingResponse(
+                stream_history(user.id, before, limit, per_conversation),
+                media_type='application/x-ndjson'
+            )
+
+        history, next_before = await run_db(history_page, user.id, before, limit, per_conversation)
+
+        return JSONResponse({
+            'history': history,
+            'next_cursor': encode_cursor(*next_before) if next_before else None,
+            'has_more': next_before is not None
+        })
+
+    except Exception as e:
+        log.exception("❌ History error")
+        return JSONResponse({'message': 'Failed to fetch history'}, status_code=500)
+
+@app.post('/api/feedback')
+async def submit_feedback(request: Request):
+    """Submit feedback for bot responses"""
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    try:
+        data = await json_body(request)
+
+        if not isinstance(data, dict) or not data.get('message_id'):
+            return JSONResponse({'message': 'Message ID is required'}, status_code=400)
+
+        # The rated message may still be waiting in a write-behind queue
+        problem = await run_db(backend.rated_message_problem, data['message_id'])
+        if problem:
+            status, message = problem
+            return JSONResponse({'message': message}, status_code=status,
+                                headers={'Retry-After': '1'} if status == 503 else None)
+
+        await run_db(backend.store_feedback, user.id, data['message_id'], data.get('rating'), data.get('comment'))
+
+        return JSONResponse({'message': 'Feedback submitted successfully!'}, status_code=201)
+
+    except Exception as e:
+        log.exception("❌ Feedback error")
+        return JSONResponse({'message': 'Failed to submit feedback'}, status_code=500)
+
+@app.get('/api/admin/async-stats')
+async def async_stats(request: Request):
+    """Admission and database thread pool counters for this worker"""
+    user, error = await authenticate(request)
+    if error:
+        return error
+    if user.role != 'admin':
+        return JSONResponse({'message': 'Admin access required'}, status_code=403)
+
+    return JSONResponse({
+        'admission': admission.stats(),
+        'db_threads': {
+            'limit': db_threads.total_tokens,
+            'busy': db_threads.borrowed_tokens,
+            'waiting': db_threads.statistics().tasks_waiting
+        },
+        'rasa': backend.rasa_gateway.stats()
+    })
+
+# Every other route (auth, profile, admin, static pages) is served by Flask
+app.mount('/', WSGIMiddleware(backend.app))
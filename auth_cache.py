@@ -0,0 +1,55 @@
+import hashlib
+import time
+
+import jwt
+
+from cache import TTLCache
+
+# ==================== AUTHENTICATION CACHE ====================
+
+class AuthCache:
+    """Caches verified JWT claims for token_required; users come from the profile cache
+
+    Tokens are keyed by their SHA-256 digest and never outlive their own exp
+    claim. See ProfileCache for how long a changed user can be served stale.
+    """
+
+    def __init__(self, secret_key, profiles, algorithms=('HS256',), token_maxsize=10000, token_ttl=300):
+        self.secret_key = secret_key
+        self.profiles = profiles  # ProfileCache
+        self.algorithms = list(algorithms)
+        self.tokens = TTLCache(token_maxsize, token_ttl)
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def claims(self, token):
+        """Decoded claims for a token; raises the usual jwt errors when it is invalid"""
+        key = self._digest(token)
+        cached = self.tokens.get(key)
+        if cached is not None:
+            exp = cached.get('exp')
+            if exp is None or exp > time.time():
+                return cached
+            self.tokens.pop(key)
+
+        data = jwt.decode(token, self.secret_key, algorithms=self.algorithms)
+        ttl = self.tokens.ttl
+        if data.get('exp') is not None:
+            ttl = min(ttl, data['exp'] - time.time())
+        self.tokens.set(key, data, ttl)
+        return data
+
+    def user(self, user_id):
+        """UserProfile for an id, or None if the user doesn't exist"""
+        return self.profiles.get(user_id)
+
+    def invalidate_user(self, user_id):
+        self.profiles.invalidate(user_id)
+
+    def invalidate_token(self, token):
+        self.tokens.pop(self._digest(token))
+
+    def stats(self):
+        return {'tokens': self.tokens.stats(), 'users': self.profiles.stats()}
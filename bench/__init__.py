@@ -0,0 +1,10 @@
+"""WellBot benchmarks: synthetic data, micro-benchmarks of the hot path and HTTP load
+
+    python -m bench seed --database sqlite:////tmp/bench.db --users 2000
+    python -m bench micro --database sqlite:////tmp/bench.db --output micro.json
+    python -m bench load --url http://localhost:5000 --duration 60 --baseline load-baseline.json
+
+The seeded database is selected through DATABASE_URL, so start the server
+under test with the same DATABASE_URL (and DB_TIMING_HEADERS=true to get
+database time per endpoint in the load report).
+"""
@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+
+from bench import report
+
+# ==================== COMMANDS ====================
+
+def seed_command(args):
+    from bench.seed import seed
+    counts = seed(
+        users=args.users,
+        conversations_per_user=args.conversations,
+        turns_per_conversation=args.turns,
+        feedback_rate=args.feedback_rate,
+        kb_entries=args.kb_entries,
+        days=args.days,
+        seed_value=args.seed
+    )
+    print(f"🌱 {counts}")
+
+def micro_command(args):
+    from bench.micro import run
+    return finish(run(min_seconds=args.seconds, only=args.only), 'benchmarks', {
+        'p50_us': -1,
+        'p95_us': -1,
+        'ops_per_sec': 1
+    }, args)
+
+def load_command(args):
+    from bench.load import run
+    return finish(run(
+        args.url,
+        users=args.users,
+        admins=args.admins,
+        duration=args.duration,
+        ramp_seconds=args.ramp,
+        seeded_users=args.seeded_users,
+        think_seconds=args.think,
+        feedback_rate=args.feedback_rate,
+        history_rate=args.history_rate,
+        admin_poll_seconds=args.admin_poll,
+        seed_value=args.seed
+    ), 'endpoints', {
+        'p50_ms': -1,
+        'p95_ms': -1,
+        'p99_ms': -1,
+        'rps': 1
+    }, args)
+
+def finish(result, section, metrics, args):
+    """Write the JSON report, compare against a baseline; exit status 1 on a regression"""
+    if args.output:
+        report.save(result, args.output)
+        print(f"💾 Report written to {args.output}")
+    if args.save_baseline:
+        report.save(result, args.save_baseline)
+        print(f"💾 Baseline written to {args.save_baseline}")
+    if args.baseline:
+        rows, regressions = report.compare(result, report.load(args.baseline), section, metrics, args.tolerance)
+        report.print_comparison(rows, regressions, args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+# ==================== MAIN ====================
+
+def add_report_arguments(parser):
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--baseline', help='Compare against this stored report; exit 1 on regression')
+    parser.add_argument('--save-baseline', help='Store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed slowdown before failing (0.10 = 10%%)')
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m bench', description='WellBot benchmarks')
+    parser.add_argument('--database', help='SQLAlchemy URL of the benchmark database (sets DATABASE_URL)')
+    parser.add_argument('--seed', type=int, default=13, help='Random seed, for repeatable data and load')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='Fill an empty database with synthetic data')
+    seed_parser.add_argument('--users', type=int, default=1000)
+    seed_parser.add_argument('--conversations', type=int, default=5, help='Average conversations per user')
+    seed_parser.add_argument('--turns', type=int, default=6, help='Average chat turns per conversation')
+    seed_parser.add_argument('--feedback-rate', type=float, default=0.1, help='Share of bot answers rated')
+    seed_parser.add_argument('--kb-entries', type=int, default=200)
+    seed_parser.add_argument('--days', type=int, default=30, help='History spread over this many days')
+    seed_parser.set_defaults(handler=seed_command)
+
+    micro_parser = commands.add_parser('micro', help='Micro-benchmarks of the hot functions, in-process')
+    micro_parser.add_argument('--seconds', type=float, default=1.0, help='Minimum time per benchmark')
+    micro_parser.add_argument('--only', nargs='*', help='Run benchmarks whose name contains any of these')
+    add_report_arguments(micro_parser)
+    micro_parser.set_defaults(handler=micro_command)
+
+    load_parser = commands.add_parser('load', help='Mixed HTTP load against a running server')
+    load_parser.add_argument('--url', default='http://localhost:5000')
+    load_parser.add_argument('--users', type=int, default=20, help='Concurrent chat users')
+    load_parser.add_argument('--admins', type=int, default=1, help='Admins polling the dashboard')
+    load_parser.add_argument('--duration', type=float, default=30.0, help='Seconds')
+    load_parser.add_argument('--ramp', type=float, default=5.0, help='Seconds to start all virtual users')
+    load_parser.add_argument('--seeded-users', type=int, default=1000, help='Users created by `seed` to sign in as')
+    load_parser.add_argument('--think', type=float, default=0.5, help='Mean pause between chat messages (s)')
+    load_parser.add_argument('--feedback-rate', type=float, default=0.1)
+    load_parser.add_argument('--history-rate', type=float, default=0.05)
+    load_parser.add_argument('--admin-poll', type=float, default=5.0, help='Dashboard poll interval (s)')
+    add_report_arguments(load_parser)
+    load_parser.set_defaults(handler=load_command)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.database:
+        # Must be set before app.py is imported: the engine is created at import time
+        os.environ['DATABASE_URL'] = args.database
+    return args.handler(args) or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import datetime
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from bench.report import summarize
+from bench.seed import BENCH_PASSWORD, bench_email, corpus
+
+# ==================== LOAD GENERATOR ====================
+
+class Recorder:
+    """Latency, status and server-reported database time per endpoint"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, status, db_ms, db_queries)]
+        self.failures = defaultdict(int)  # endpoint -> connection errors/timeouts
+        self._lock = threading.Lock()
+
+    def request(self, session, method, url, endpoint, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=30, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.failures[endpoint] += 1
+            return None
+        elapsed = time.perf_counter() - started
+        db_ms = response.headers.get('X-DB-Time-Ms')
+        db_queries = response.headers.get('X-DB-Queries')
+        with self._lock:
+            self.samples[endpoint].append((
+                elapsed,
+                response.status_code,
+                float(db_ms) if db_ms is not None else None,
+                int(db_queries) if db_queries is not None else None
+            ))
+        return response
+
+    def report(self, duration):
+        endpoints = {}
+        for endpoint in sorted(set(self.samples) | set(self.failures)):
+            rows = self.samples.get(endpoint, [])
+            stats = summarize([row[0] for row in rows])
+            stats['rps'] = round(len(rows) / duration, 2)
+            stats['errors'] = sum(1 for row in rows if row[1] >= 400) + self.failures.get(endpoint, 0)
+            stats['status'] = dict(sorted(_count(str(row[1]) for row in rows).items()))
+            db_times = [row[2] for row in rows if row[2] is not None]
+            if db_times:
+                stats['db_mean_ms'] = round(sum(db_times) / len(db_times), 3)
+                stats['db_p95_ms'] = summarize([value / 1000 for value in db_times])['p95_ms']
+                stats['db_queries_mean'] = round(sum(row[3] for row in rows if row[3] is not None) / len(db_times), 2)
+            endpoints[endpoint] = stats
+        return endpoints
+
+def _count(values):
+    counts = defaultdict(int)
+    for value in values:
+        counts[value] += 1
+    return counts
+
+def _sign_in(recorder, session, base_url, email, password):
+    response = recorder.request(session, 'POST', f"{base_url}/api/signin", 'POST /api/signin',
+                                json={'email': email, 'password': password})
+    if response is None or response.status_code != 200:
+        return False
+    session.headers['Authorization'] = f"Bearer {response.json()['token']}"
+    return True
+
+def chat_user(recorder, base_url, user_index, messages, stop, rng, think_seconds, feedback_rate, history_rate):
+    """signin -> chat loop, rating some answers and now and then reloading history"""
+    session = requests.Session()
+    if not _sign_in(recorder, session, base_url, bench_email(user_index), BENCH_PASSWORD):
+        return
+    while not stop.is_set():
+        response = recorder.request(session, 'POST', f"{base_url}/api/chat", 'POST /api/chat',
+                                    json={'message': rng.choice(messages)})
+        if response is not None and response.status_code == 200 and rng.random() < feedback_rate:
+            recorder.request(session, 'POST', f"{base_url}/api/feedback", 'POST /api/feedback', json={
+                'message_id': response.json()['message_id'],
+                'rating': 'positive' if rng.random() < 0.7 else 'negative'
+            })
+        if rng.random() < history_rate:
+            recorder.request(session, 'GET', f"{base_url}/api/conversation/history", 'GET /api/conversation/history')
+        stop.wait(rng.expovariate(1 / think_seconds) if think_seconds else 0)
+
+def admin_poller(recorder, base_url, admin_email, admin_password, stop, poll_seconds):
+    """An open admin dashboard: stats every poll_seconds, user and feedback lists less often"""
+    session = requests.Session()
+    if not _sign_in(recorder, session, base_url, admin_email, admin_password):
+        return
+    polls = 0
+    while not stop.is_set():
+        recorder.request(session, 'GET', f"{base_url}/api/admin/dashboard/stats", 'GET /api/admin/dashboard/stats')
+        if polls % 5 == 0:
+            recorder.request(session, 'GET', f"{base_url}/api/admin/users", 'GET /api/admin/users')
+            recorder.request(session, 'GET', f"{base_url}/api/admin/feedback", 'GET /api/admin/feedback')
+        polls += 1
+        stop.wait(poll_seconds)
+
+def run(base_url, users=20, admins=1, duration=30.0, ramp_seconds=5.0, seeded_users=1000,
+        think_seconds=0.5, feedback_rate=0.1, history_rate=0.05, admin_poll_seconds=5.0,
+        admin_email='admin@wellbot.com', admin_password='admin123', seed_value=13):
+    """Mixed load against a running server; returns the per-endpoint report"""
+    base_url = base_url.rstrip('/')
+    messages = [text for text, _ in corpus()]
+    recorder = Recorder()
+    stop = threading.Event()
+    rng = random.Random(seed_value)
+
+    threads = []
+    for i in range(users):
+        args = (recorder, base_url, rng.randint(1, seeded_users), messages, stop, random.Random(rng.random()),
+                think_seconds, feedback_rate, history_rate)
+        threads.append(threading.Thread(target=chat_user, args=args, daemon=True))
+    for _ in range(admins):
+        args = (recorder, base_url, admin_email, admin_password, stop, admin_poll_seconds)
+        threads.append(threading.Thread(target=admin_poller, args=args, daemon=True))
+
+    print(f"🚦 {users} chat users + {admins} admins against {base_url} for {duration:.0f}s")
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        time.sleep(ramp_seconds / max(1, len(threads)))
+    stop.wait(max(0.0, duration - (time.perf_counter() - started)))
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=35)
+    elapsed = time.perf_counter() - started
+
+    endpoints = recorder.report(elapsed)
+    total = sum(stats['count'] for stats in endpoints.values())
+    for endpoint, stats in endpoints.items():
+        if stats['count']:
+            print(f"📈 {endpoint:<36} {stats['rps']:>8.1f} req/s  p50 {stats['p50_ms']:>8.1f}  "
+                  f"p95 {stats['p95_ms']:>8.1f}  p99 {stats['p99_ms']:>8.1f} ms  errors {stats['errors']}")
+    return {
+        'kind': 'load',
+        'created_at': datetime.datetime.utcnow().isoformat(),
+        'url': base_url,
+        'profile': {
+            'users': users,
+            'admins': admins,
+            'duration_seconds': round(elapsed, 2),
+            'think_seconds': think_seconds,
+            'feedback_rate': feedback_rate,
+            'history_rate': history_rate,
+            'admin_poll_seconds': admin_poll_seconds
+        },
+        'total': {'requests': total, 'rps': round(total / elapsed, 2)},
+        'endpoints': endpoints
+    }
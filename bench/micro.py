@@ -0,0 +1,108 @@
+import datetime
+import itertools
+import time
+
+import jwt
+
+from bench.report import summarize
+from bench.seed import corpus
+
+# ==================== TIMING ====================
+
+def measure(fn, inputs, min_seconds=1.0, min_calls=10, warmup=3):
+    """Per-call durations of fn over inputs (cycled) for at least min_seconds and min_calls"""
+    cycle = itertools.cycle(inputs)
+    for _ in range(warmup):
+        fn(next(cycle))
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while len(samples) < min_calls or time.perf_counter() < deadline:
+        value = next(cycle)
+        started = time.perf_counter()
+        fn(value)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def _stats(samples):
+    stats = summarize(samples, scale=1e6, unit='us')
+    stats['ops_per_sec'] = round(len(samples) / sum(samples), 1) if samples else 0.0
+    return stats
+
+# ==================== BENCHMARKS ====================
+
+def run(min_seconds=1.0, only=None):
+    """Time the chat hot path, authentication and the admin aggregates in-process
+
+    Uses whatever database DATABASE_URL points at; seed it first for realistic numbers.
+    """
+    import app as backend
+
+    backend.init_db()
+    app = backend.app
+    examples = corpus()
+    messages = [text for text, _ in examples]
+    pairs = [(intent, language) for _, intent in examples for language in ('en', 'hi')]
+
+    with app.app_context():
+        user = backend.User.query.filter(backend.User.role == 'user').first()
+        admin = backend.User.query.filter(backend.User.role == 'admin').first()
+    if user is None:
+        raise SystemExit("❌ No users in the database; run `python -m bench seed` first")
+
+    def token_for(user_id):
+        return jwt.encode({
+            'user_id': user_id,
+            'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1)
+        }, app.config['SECRET_KEY'], algorithm='HS256')
+
+    user_token = token_for(user.id)
+    admin_headers = {'Authorization': f"Bearer {token_for(admin.id)}"}
+    user_headers = {'Authorization': f"Bearer {user_token}"}
+    client = app.test_client()
+
+    def cold_authenticate(token):
+        backend.auth_cache.invalidate_token(token)
+        backend.auth_cache.invalidate_user(user.id)
+        backend.authenticate_token(token)
+
+    def get(path, headers):
+        def call(_):
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, (path, response.status_code)
+        return call
+
+    benchmarks = {
+        # Chat hot path, in the order a turn runs it
+        'intent_matcher.detect': (backend.intent_matcher.detect, messages),
+        'classify_message': (backend.classify_message, messages),
+        'response_cache.key': (lambda message: backend.response_cache.key(message, 'en'), messages),
+        'get_response_from_knowledge_base': (lambda pair: backend.get_response_from_knowledge_base(*pair), pairs),
+        'search_knowledge_base': (lambda message: backend.search_knowledge_base(message, 'en', k=1), messages),
+        # token_required
+        'authenticate_token (cached)': (backend.authenticate_token, [user_token]),
+        'authenticate_token (cold)': (cold_authenticate, [user_token]),
+        # Admin aggregates and history, through the full Flask stack
+        'dashboard_stats': (lambda _: backend.dashboard_stats(), [None]),
+        'GET /api/admin/dashboard/stats': (get('/api/admin/dashboard/stats', admin_headers), [None]),
+        'GET /api/admin/users': (get('/api/admin/users', admin_headers), [None]),
+        'GET /api/admin/feedback': (get('/api/admin/feedback', admin_headers), [None]),
+        'GET /api/admin/database-preview': (get('/api/admin/database-preview', admin_headers), [None]),
+        'GET /api/conversation/history': (get('/api/conversation/history', user_headers), [None])
+    }
+
+    results = {}
+    with app.app_context():
+        for name, (fn, inputs) in benchmarks.items():
+            if only and not any(part in name for part in only):
+                continue
+            results[name] = _stats(measure(fn, inputs, min_seconds=min_seconds))
+            print(f"⏱️ {name:<40} {results[name]['p50_us']:>10.1f} µs p50 {results[name]['ops_per_sec']:>12.1f} ops/s")
+            # Keep one benchmark's session state from leaking into the next
+            backend.db.session.remove()
+
+    return {
+        'kind': 'micro',
+        'created_at': datetime.datetime.utcnow().isoformat(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'],
+        'benchmarks': results
+    }
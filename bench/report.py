@@ -0,0 +1,64 @@
+import json
+import math
+
+# ==================== SUMMARIES ====================
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(samples, scale=1000.0, unit='ms'):
+    """count/mean/p50/p95/p99/max of durations in seconds, converted to unit"""
+    values = sorted(sample * scale for sample in samples)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        f'mean_{unit}': round(sum(values) / len(values), 3),
+        f'p50_{unit}': round(percentile(values, 0.50), 3),
+        f'p95_{unit}': round(percentile(values, 0.95), 3),
+        f'p99_{unit}': round(percentile(values, 0.99), 3),
+        f'max_{unit}': round(values[-1], 3)
+    }
+
+# ==================== BASELINES ====================
+
+def save(report, path):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+
+def load(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+def compare(current, baseline, section, metrics, tolerance=0.10):
+    """Rows of (name, metric, baseline, current, change) plus the names that got worse than tolerance
+
+    metrics maps a metric name to +1 when higher is better (throughput) or -1
+    when lower is better (latency).
+    """
+    rows, regressions = [], []
+    for name, stats in sorted(current.get(section, {}).items()):
+        before = baseline.get(section, {}).get(name)
+        if not before:
+            continue
+        for metric, direction in metrics.items():
+            if not before.get(metric) or metric not in stats:
+                continue
+            change = (stats[metric] - before[metric]) / before[metric]
+            rows.append((name, metric, before[metric], stats[metric], change))
+            if change * direction < -tolerance:
+                regressions.append(f"{name} {metric}")
+    return rows, regressions
+
+def print_comparison(rows, regressions, tolerance):
+    print(f"\n{'benchmark':<40} {'metric':<14} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, metric, before, after, change in rows:
+        print(f"{name:<40} {metric:<14} {before:>12.3f} {after:>12.3f} {change:>+8.1%}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {tolerance:.0%}: {', '.join(regressions)}")
+    else:
+        print(f"\n✅ No regressions beyond {tolerance:.0%}")
@@ -0,0 +1,122 @@
+import datetime
+import json
+import os
+import random
+import time
+
+from intent_classifier import app_intent, load_nlu_examples
+
+BENCH_PASSWORD = 'bench123'
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def bench_email(i):
+    return f"bench{i}@wellbot.test"
+
+def corpus(root=REPO_ROOT):
+    """(text, app intent) pairs from nlu.yml, used for seeded and load-test user messages"""
+    return [(text, app_intent(intent)) for text, intent in load_nlu_examples(os.path.join(root, 'nlu.yml'))]
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def seed(users=1000, conversations_per_user=5, turns_per_conversation=6, feedback_rate=0.1,
+         kb_entries=200, days=30, seed_value=13, chunk_size=10000):
+    """Fill an empty database with synthetic users, chats, feedback and knowledge base entries
+
+    Must run before init_db() has ever touched the database: the dashboard
+    rollups then pick the rows up through their normal backfill.
+    """
+    from werkzeug.security import generate_password_hash
+    from app import app, db, init_db, User, Conversation, Message, Feedback, HealthKnowledgeBase, StatsWatermark
+
+    rng = random.Random(seed_value)
+    now = datetime.datetime.utcnow()
+    examples = corpus()
+    intents = sorted({intent for _, intent in examples})
+    started = time.perf_counter()
+
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).first() or db.session.query(StatsWatermark.source).first():
+            raise SystemExit("❌ Database is not empty; seed a fresh file (see --database)")
+
+        # One hash for everyone: hashing per user would dominate seeding time
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        user_rows, conversation_rows, message_rows, feedback_rows = [], [], [], []
+        message_id = 0
+
+        for user_id in range(1, users + 1):
+            created_at = now - datetime.timedelta(days=rng.uniform(0, days))
+            user_rows.append({
+                'id': user_id,
+                'username': f"bench{user_id}",
+                'email': bench_email(user_id),
+                'password_hash': password_hash,
+                'preferred_language': 'hi' if rng.random() < 0.2 else 'en',
+                'created_at': created_at,
+                'last_login': created_at + (now - created_at) * rng.random(),
+                'role': 'user',
+                'is_active': True
+            })
+
+            for _ in range(max(1, int(rng.expovariate(1 / conversations_per_user)))):
+                conversation_id = len(conversation_rows) + 1
+                start_time = created_at + (now - created_at) * rng.random()
+                timestamp = start_time
+                for _ in range(max(1, int(rng.expovariate(1 / turns_per_conversation)))):
+                    text, intent = rng.choice(examples)
+                    confidence = round(rng.uniform(0.3, 0.99), 2)
+                    timestamp += datetime.timedelta(seconds=rng.uniform(5, 120))
+                    message_rows.append({'id': message_id + 1, 'conversation_id': conversation_id, 'sender': 'user',
+                                         'message': text, 'timestamp': timestamp, 'intent': intent,
+                                         'confidence': confidence})
+                    message_rows.append({'id': message_id + 2, 'conversation_id': conversation_id, 'sender': 'bot',
+                                         'message': f"Synthetic answer about {intent}.", 'timestamp': timestamp,
+                                         'intent': intent, 'confidence': confidence})
+                    message_id += 2
+                    if rng.random() < feedback_rate:
+                        feedback_rows.append({
+                            'message_id': message_id,
+                            'user_id': user_id,
+                            'rating': 'positive' if rng.random() < 0.7 else 'negative',
+                            'comment': None,
+                            'created_at': timestamp + datetime.timedelta(seconds=rng.uniform(1, 60))
+                        })
+                conversation_rows.append({'id': conversation_id, 'user_id': user_id,
+                                          'start_time': start_time, 'end_time': timestamp})
+
+        kb_rows = []
+        for i in range(kb_entries):
+            intent = intents[i % len(intents)]
+            words = ' '.join(rng.choice(examples)[0] for _ in range(8))
+            created_at = now - datetime.timedelta(days=rng.uniform(0, days))
+            kb_rows.append({
+                'category': intent,
+                'title': f"{intent.replace('_', ' ').title()} guide {i + 1}",
+                'content': f"Advice about {intent}: {words}",
+                'language': 'hi' if i % 5 == 4 else 'en',
+                'tags': json.dumps([intent, 'bench']),
+                'is_active': True,
+                'created_at': created_at,
+                'updated_at': created_at
+            })
+
+        for model, rows in ((User, user_rows), (Conversation, conversation_rows), (Message, message_rows),
+                            (Feedback, feedback_rows), (HealthKnowledgeBase, kb_rows)):
+            for chunk in _chunks(rows, chunk_size):
+                db.session.execute(model.__table__.insert(), chunk)
+            db.session.commit()
+            print(f"🌱 {model.__tablename__}: {len(rows)} rows")
+
+    # Admin user, indexes, rollup backfill and lookup tables, exactly as in production
+    init_db()
+    counts = {
+        'users': len(user_rows),
+        'conversations': len(conversation_rows),
+        'messages': len(message_rows),
+        'feedback': len(feedback_rows),
+        'knowledge_base': len(kb_rows)
+    }
+    print(f"✅ Seeded in {time.perf_counter() - started:.1f}s")
+    return counts
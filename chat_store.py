@@ -0,0 +1,493 @@
+import atexit
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import case, func, select
+from sqlalchemy.exc import DBAPIError, DataError, IntegrityError, InterfaceError, StatementError
+
+log = logging.getLogger(__name__)
+
+ChatTurn = namedtuple('ChatTurn', ['conversation_id', 'user_message_id', 'bot_message_id'])
+
+def is_row_error(error):
+    """True if the database rejected the rows themselves, so writing them again as they are can't succeed
+
+    Constraint and data errors, and values a bind processor refused before the
+    driver saw them. Anything else (database locked or unreachable, dropped
+    connection) is worth retrying.
+    """
+    if isinstance(error, (IntegrityError, DataError, InterfaceError)):
+        return not error.connection_invalidated
+    return isinstance(error, StatementError) and not isinstance(error, DBAPIError)
+
+# ==================== CHAT STORE ====================
+
+class ChatStore:
+    """Persists a chat turn (conversation + user message + bot message) in one transaction
+
+    With write_behind enabled, message pairs are queued and group-committed by a
+    background flusher. Message ids are handed out up front from blocks reserved
+    in the id_allocations table, so callers get a stable message_id immediately.
+    Write-behind must be enabled on every worker or none: autoincrement inserts
+    from a synchronous worker could otherwise land inside a reserved block.
+
+    A batch the database rejects is split until the offending rows are alone;
+    those are logged in full and quarantined (dropped) so they can't hold up
+    the rows behind them. A batch that failed for any other reason (database
+    locked or down) is retried on its own, never topped up with new rows.
+    """
+
+    def __init__(self, db, conversation_model, message_model, allocation_model, rollups=None,
+                 write_behind=False, queue_size=10000, flush_interval_ms=50, flush_max_rows=500,
+                 id_block_size=1000, idle_timeout=None):
+        self.db = db
+        self.Conversation = conversation_model
+        self.Message = message_model
+        self.messages_table = message_model.__table__
+        self.allocations_table = allocation_model.__table__
+        self.rollups = rollups
+
+        self.write_behind = write_behind
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_max_rows = flush_max_rows
+        self.id_block_size = id_block_size
+        self.idle_timeout = idle_timeout
+
+        self._engine = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._written = threading.Condition(self._pending_lock)
+        self._flush_lock = threading.Lock()
+        self._id_lock = threading.Lock()
+        self._next_id = 0
+        self._block_end = 0
+        self._retry = []  # rows left over from a failed flush; only touched under _flush_lock
+        self._quarantined = set()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+        self.metrics = {
+            'turns': 0,
+            'flushes': 0,
+            'rows_flushed': 0,
+            'flush_errors': 0,
+            'rows_quarantined': 0,
+            'sync_fallbacks': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+
+        if write_behind:
+            atexit.register(self.stop)
+
+    # ---------- conversation ----------
+
+    def open_conversations(self, user_ids):
+        """{user_id: open conversation id}; open conversations idle past idle_timeout are closed on the way
+
+        A closed conversation ends at its last message, so a user coming back
+        after a break starts a new conversation instead of extending the old one.
+        """
+        Conversation, Message = self.Conversation, self.Message
+        last_activity = func.coalesce(
+            select(func.max(Message.timestamp)).where(Message.conversation_id == Conversation.id).scalar_subquery(),
+            Conversation.start_time
+        )
+        cutoff = datetime.datetime.utcnow() - self.idle_timeout if self.idle_timeout else None
+        found = {}
+        for conversation_id, user_id, last in self.db.session.query(
+            Conversation.id, Conversation.user_id, last_activity
+        ).filter(
+            Conversation.user_id.in_(user_ids),
+            Conversation.end_time.is_(None)
+        ).order_by(Conversation.id):
+            if cutoff and last < cutoff:
+                self.db.session.query(Conversation).filter(Conversation.id == conversation_id).update(
+                    {'end_time': last}, synchronize_session=False
+                )
+            else:
+                found.setdefault(user_id, conversation_id)
+        return found
+
+    def active_conversation_id(self, user_id):
+        """Id of the user's open conversation, creating it (uncommitted) if needed"""
+        conversation_id = self.open_conversations([user_id]).get(user_id)
+        if conversation_id:
+            return conversation_id, False
+
+        conversation = self.Conversation(user_id=user_id)
+        self.db.session.add(conversation)
+        self.db.session.flush()
+        return conversation.id, True
+
+    def active_conversation_ids(self, user_ids):
+        """({user_id: open conversation id}, number created) for many users in one query"""
+        user_ids = set(user_ids)
+        found = self.open_conversations(user_ids)
+
+        created = [self.Conversation(user_id=user_id) for user_id in user_ids - set(found)]
+        if created:
+            self.db.session.add_all(created)
+            self.db.session.flush()
+            found.update((conversation.user_id, conversation.id) for conversation in created)
+        return found, len(created)
+
+    # ---------- public API ----------
+
+    def record_turn(self, user_id, user_text, bot_text, intent, confidence, received_at=None):
+        """Persist one exchange and return a ChatTurn with stable ids"""
+        received_at = received_at or datetime.datetime.utcnow()
+        responded_at = datetime.datetime.utcnow()
+        self.metrics['turns'] += 1
+
+        if not self.write_behind:
+            conversation_id, created = self.active_conversation_id(user_id)
+            user_msg = self.Message(conversation_id=conversation_id, sender='user',
+                                    message=user_text, timestamp=received_at)
+            bot_msg = self.Message(conversation_id=conversation_id, sender='bot', message=bot_text,
+                                   intent=intent, confidence=confidence, timestamp=responded_at)
+            self.db.session.add_all([user_msg, bot_msg])
+            if self.rollups:
+                self.rollups.record_messages(
+                    self.db.session,
+                    [(received_at, 'user', None), (responded_at, 'bot', intent)],
+                    new_conversations=int(created)
+                )
+            self.db.session.commit()
+            return ChatTurn(conversation_id, user_msg.id, bot_msg.id)
+
+        conversation_id, created = self.active_conversation_id(user_id)
+        if created:
+            # New conversations are rare; commit them right away so later turns find them
+            if self.rollups:
+                self.rollups.record_messages(self.db.session, [], new_conversations=1)
+            self.db.session.commit()
+
+        self._engine = self._engine or self.db.engine
+        user_msg_id, bot_msg_id = self._allocate_ids(2)
+        rows = [
+            {'id': user_msg_id, 'conversation_id': conversation_id, 'sender': 'user', 'message': user_text,
+             'timestamp': received_at, 'intent': None, 'confidence': 0.0},
+            {'id': bot_msg_id, 'conversation_id': conversation_id, 'sender': 'bot', 'message': bot_text,
+             'timestamp': responded_at, 'intent': intent, 'confidence': confidence}
+        ]
+        self.enqueue(rows)
+        return ChatTurn(conversation_id, user_msg_id, bot_msg_id)
+
+    def record_turns(self, turns):
+        """Persist many exchanges in one transaction; returns ChatTurns in the same order
+
+        turns: iterable of (user_id, user_text, bot_text, intent, confidence, received_at).
+        A received_at in the past (transcript replay) is used for both messages.
+        """
+        turns = list(turns)
+        if not turns:
+            return []
+        responded_at = datetime.datetime.utcnow()
+        self.metrics['turns'] += len(turns)
+        conversation_ids, created = self.active_conversation_ids(turn[0] for turn in turns)
+
+        rows = []
+        for user_id, user_text, bot_text, intent, confidence, received_at in turns:
+            conversation_id = conversation_ids[user_id]
+            rows.append({'conversation_id': conversation_id, 'sender': 'user', 'message': user_text,
+                         'timestamp': received_at or responded_at, 'intent': None, 'confidence': 0.0})
+            rows.append({'conversation_id': conversation_id, 'sender': 'bot', 'message': bot_text,
+                         'timestamp': received_at or responded_at, 'intent': intent, 'confidence': confidence})
+
+        if not self.write_behind:
+            # Row-at-a-time inside one transaction: portable, and every row gets its id back
+            conn = self.db.session.connection()
+            for row in rows:
+                row['id'] = conn.execute(self.messages_table.insert(), row).inserted_primary_key[0]
+            if self.rollups:
+                self.rollups.record_messages(
+                    self.db.session,
+                    [(row['timestamp'], row['sender'], row['intent']) for row in rows],
+                    new_conversations=created
+                )
+            self.db.session.commit()
+        else:
+            if created:
+                if self.rollups:
+                    self.rollups.record_messages(self.db.session, [], new_conversations=created)
+                self.db.session.commit()
+            # Ids come from the reserved block, so the flusher writes the batch with one executemany
+            self._engine = self._engine or self.db.engine
+            for row, message_id in zip(rows, self._allocate_ids(len(rows))):
+                row['id'] = message_id
+            self.enqueue(rows)
+
+        return [
+            ChatTurn(rows[i]['conversation_id'], rows[i]['id'], rows[i + 1]['id'])
+            for i in range(0, len(rows), 2)
+        ]
+
+    def enqueue(self, rows):
+        """Queue message rows (with ids already assigned) for the flusher"""
+        self._ensure_flusher()
+        with self._pending_lock:
+            self._pending.update(row['id'] for row in rows)
+        try:
+            self._queue.put(rows, timeout=self.flush_interval)
+        except queue.Full:
+            # Flusher can't keep up: write this request's rows inline rather than drop them
+            self.metrics['sync_fallbacks'] += 1
+            try:
+                with self._flush_lock:
+                    self._write_rows(rows)
+            except Exception:
+                pass  # Logged by the flush; the unwritten rows are the retry batch the flusher writes next
+
+    def is_pending(self, message_id):
+        """True if the message id was handed out but is not committed yet"""
+        return message_id in self._pending
+
+    def is_quarantined(self, message_id):
+        """True if the message was handed out but the database refused its row"""
+        return message_id in self._quarantined
+
+    def wait_for(self, message_id, timeout=5.0):
+        """Block until a handed-out message id is committed
+
+        Returns False on timeout or if the message was quarantined. Ids this
+        process never handed out count as committed.
+        """
+        if message_id not in self._pending:
+            return message_id not in self._quarantined
+        try:
+            self.flush()
+        except Exception:
+            pass  # Logged by the flush; the rows stay queued and the wait below times out
+        with self._written:
+            # The flusher may still be writing a batch it dequeued before our flush
+            committed = self._written.wait_for(lambda: message_id not in self._pending, timeout)
+            return committed and message_id not in self._quarantined
+
+    def flush(self):
+        """Commit everything queued so far on the calling thread
+
+        Raises if the database is unavailable; the rows stay queued for retry.
+        """
+        with self._flush_lock:
+            if self._retry:
+                batch, self._retry = self._retry, []
+                self._write_rows(batch)
+            batch = []
+            while True:
+                try:
+                    batch.extend(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_rows(batch)
+
+    def after_fork(self):
+        """Drop the id block and queued rows inherited from the parent process
+
+        Two workers continuing the same reserved block would hand out the same ids.
+        """
+        with self._id_lock:
+            self._next_id = 0
+            self._block_end = 0
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        # A lock held by a parent thread at fork time would stay held here forever
+        self._flush_lock = threading.Lock()
+        self._retry = []
+        with self._pending_lock:
+            self._pending.clear()
+        self._thread = None
+        self._stopping.clear()
+
+    def stop(self):
+        """Stop the flusher and drain the queue; safe to call more than once"""
+        self._stopping.set()
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=10)
+        if self._engine is not None:
+            try:
+                self.flush()
+            except Exception:
+                return  # Logged by the flush; nothing more can be written now
+            with self._written:
+                self._written.wait_for(lambda: not self._pending, 10)
+
+    def stats(self):
+        """Queue depth and flush latency counters"""
+        flushes = self.metrics['flushes']
+        return dict(
+            self.metrics,
+            total_flush_ms=round(self.metrics['total_flush_ms'], 3),
+            write_behind=self.write_behind,
+            queue_depth=self._queue.qsize(),
+            pending_messages=len(self._pending),
+            quarantined_messages=len(self._quarantined),
+            avg_flush_ms=round(self.metrics['total_flush_ms'] / flushes, 3) if flushes else 0.0
+        )
+
+    # ---------- internals ----------
+
+    def _allocate_ids(self, count):
+        """Hand out consecutive message ids from the locally reserved block"""
+        with self._id_lock:
+            if self._next_id + count > self._block_end:
+                self._next_id, self._block_end = self._reserve_block(max(count, self.id_block_size))
+            first = self._next_id
+            self._next_id += count
+        return range(first, first + count)
+
+    def _reserve_block(self, size):
+        """Atomically bump the shared message id counter and return [start, end)"""
+        allocations = self.allocations_table
+        messages = self.messages_table
+        next_free_query = select(func.coalesce(func.max(messages.c.id), 0) + 1)
+        next_free = next_free_query.scalar_subquery()
+
+        for attempt in range(2):
+            try:
+                with self._engine.begin() as conn:
+                    # Never hand out ids at or below existing rows, even if the counter fell behind
+                    updated = conn.execute(
+                        allocations.update()
+                        .where(allocations.c.name == 'messages')
+                        .values(next_id=case((allocations.c.next_id > next_free, allocations.c.next_id),
+                                             else_=next_free) + size)
+                    ).rowcount
+                    if not updated:
+                        start = conn.execute(next_free_query).scalar()
+                        conn.execute(allocations.insert().values(name='messages', next_id=start + size))
+                        return start, start + size
+
+                    end = conn.execute(select(allocations.c.next_id).where(allocations.c.name == 'messages')).scalar()
+                return end - size, end
+            except IntegrityError:
+                # Another worker created the counter row first; the update path will work now
+                if attempt:
+                    raise
+
+    def _ensure_flusher(self):
+        # Threads don't survive fork, so each worker process starts its own flusher
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._flush_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='chat-store-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            with self._flush_lock:
+                batch, self._retry = self._retry, []
+
+            # A batch that failed goes again as it is; new rows never join it
+            if not batch:
+                try:
+                    batch = list(self._queue.get(timeout=0.5))
+                except queue.Empty:
+                    continue
+
+                # Group commit: keep collecting until the row cap or the flush interval
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.flush_max_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.extend(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+            try:
+                with self._flush_lock:
+                    self._write_rows(batch)
+            except Exception:
+                time.sleep(min(1.0, self.flush_interval * 10))
+
+    def _write_rows(self, rows):
+        """Write rows, quarantining the ones the database rejects (call with _flush_lock held)
+
+        On any other error the rows not written yet become the retry batch and
+        the error is raised.
+        """
+        chunks = [rows]
+        while chunks:
+            chunk = chunks.pop()
+            try:
+                self._write(chunk)
+            except Exception as e:
+                if not is_row_error(e):
+                    self.metrics['flush_errors'] += 1
+                    self._retry.extend(chunk + [row for rest in chunks for row in rest])
+                    log.exception("❌ Chat flush error, rows kept for retry", extra={'rows': len(self._retry)})
+                    raise
+                if len(chunk) == 1:
+                    self._quarantine(chunk[0], e)
+                else:
+                    # Halve until the bad rows are alone; the first half is written first
+                    middle = len(chunk) // 2
+                    chunks.extend([chunk[middle:], chunk[:middle]])
+
+    def _quarantine(self, row, error):
+        """Give up on a row the database refuses, logging it in full so it can be replayed"""
+        already_written = isinstance(error, IntegrityError) and self._is_stored(row)
+        if not already_written:
+            self.metrics['rows_quarantined'] += 1
+            log.error("❌ Chat message rejected by the database, quarantined",
+                      extra={'row': row, 'error': str(getattr(error, 'orig', None) or error)})
+        with self._written:
+            self._pending.discard(row['id'])
+            if not already_written:
+                self._quarantined.add(row['id'])
+            self._written.notify_all()
+
+    def _is_stored(self, row):
+        """True if this very row is there: an earlier attempt committed but lost its connection before the reply
+
+        The id alone is not enough: a worker running without write-behind may
+        have taken it for a different message.
+        """
+        messages = self.messages_table
+        try:
+            with self._engine.connect() as conn:
+                stored = conn.execute(
+                    select(messages.c.conversation_id, messages.c.sender, messages.c.message, messages.c.timestamp)
+                    .where(messages.c.id == row['id'])
+                ).first()
+        except Exception:
+            return False
+        if stored is None:
+            return False
+        if tuple(stored) != (row['conversation_id'], row['sender'], row['message'], row['timestamp']):
+            log.error("❌ Chat message id already taken by a different message",
+                      extra={'message_id': row['id'], 'stored': dict(stored._mapping)})
+            return False
+        return True
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        with self._engine.begin() as conn:
+            conn.execute(self.messages_table.insert(), rows)
+            if self.rollups:
+                self.rollups.record_messages(conn, [(row['timestamp'], row['sender'], row['intent']) for row in rows])
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._written:
+            self._pending.difference_update(row['id'] for row in rows)
+            self._written.notify_all()
+        self.metrics['flushes'] += 1
+        self.metrics['rows_flushed'] += len(rows)
+        self.metrics['last_flush_ms'] = round(elapsed_ms, 3)
+        self.metrics['max_flush_ms'] = max(self.metrics['max_flush_ms'], round(elapsed_ms, 3))
+        self.metrics['total_flush_ms'] += elapsed_ms
@@ -9,14 +9,39 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///wellbot.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')  # Read replica for the admin analytics routes
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))  # Connections kept per worker process (and per bind)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))  # Extra connections under bursts, closed when returned
+    DB_POOL_TIMEOUT_SECONDS = 30  # Wait for a free connection before failing the request
+    DB_POOL_RECYCLE_SECONDS = 1800  # Reconnect server databases older than this (proxy/LB idle timeouts)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # PostgreSQL only; 0 = no limit
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024  # bytes
+    SQLITE_CACHE_SIZE_KB = 64 * 1024
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    DB_TIMING_HEADERS = os.environ.get('DB_TIMING_HEADERS', 'false').lower() == 'true'  # Per-request database time headers (used by bench)
     
     # JWT
     JWT_EXPIRATION_DAYS = 365
+    AUTH_TOKEN_CACHE_SIZE = 10000  # Verified tokens kept per process
+    AUTH_TOKEN_CACHE_TTL_SECONDS = 300  # Never longer than the token's own exp
+    PROFILE_CACHE_SIZE = 10000  # User profiles kept per process
+    PROFILE_CACHE_TTL_SECONDS = 30  # Bounds staleness of role/status/profile changes made on other hosts
+    PROFILE_CACHE_REVALIDATE_SECONDS = 1.0  # With the disk tier: changes from other workers on this host show up within this
+    PROFILE_CACHE_DISK_PATH = os.environ.get('PROFILE_CACHE_DISK_PATH')  # SQLite file shared by workers; unset = memory only
+    LAST_LOGIN_FLUSH_SECONDS = 5.0  # Sign-ins are written to users.last_login in batches this often
     
     # Server
     HOST = '0.0.0.0'
     PORT = 5000
     DEBUG = True
+    SERVER_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 0))  # `python -m wellbot serve`; 0 = one per CPU core
+    SERVER_THREADS = 4  # Request threads per worker
+    SERVER_TIMEOUT_SECONDS = 30  # A worker silent for this long is killed and replaced
+    SERVER_GRACEFUL_TIMEOUT_SECONDS = 30  # Drain time for in-flight requests on SIGTERM/SIGHUP
+    SERVER_MAX_REQUESTS = 0  # Recycle a worker after this many requests (0 = never)
+    ASYNC_MAX_IN_FLIGHT = 2000  # `serve --asgi`: chat/history/feedback requests per worker before 429
+    ASYNC_DB_THREADS = 32  # Threads running blocking database work for the async routes
+    ASYNC_RETRY_AFTER_SECONDS = 1
     
     # CORS
     CORS_ORIGINS = ['http://localhost:5000', 'http://127.0.0.1:5000']
@@ -24,10 +49,79 @@ class Config:
     # NLP Settings
     DEFAULT_LANGUAGE = 'en'
     SUPPORTED_LANGUAGES = ['en', 'hi']
+    INTENT_MODEL_PATH = os.environ.get('INTENT_MODEL_PATH')  # Defaults to instance/wellbot_intents(.npy/.json)
+    INTENT_CONFIDENCE_THRESHOLD = 0.3  # Below this the keyword matcher decides (same as Rasa's FallbackClassifier)
+    
+    # Rasa gateway
+    RASA_CONNECT_TIMEOUT = 0.5  # seconds
+    RASA_READ_TIMEOUT = 2.0
+    RASA_POOL_SIZE = 20  # Keep-alive connections per worker
+    RASA_MAX_CONCURRENT = 16  # Further chat requests skip Rasa instead of queueing
+    RASA_FAILURE_THRESHOLD = 5  # Consecutive failures before the circuit opens
+    RASA_PROBE_INTERVAL_SECONDS = 10
+    RASA_CACHE_SIZE = 5000
+    RASA_CACHE_TTL_SECONDS = 600
+    # Rule-based answers that don't depend on conversation state (see rules.yml)
+    RASA_CACHEABLE_INTENTS = ['headache', 'fever', 'cold_flu', 'cut_wound', 'diet']
     
     # Health Knowledge Base
     MIN_MATCH_SCORE = 1  # Minimum score for knowledge base match
+    RESPONSE_INDEX_REFRESH_SECONDS = 30  # How often workers check for knowledge base edits
+    KNOWLEDGE_INDEX_PATH = os.environ.get('KNOWLEDGE_INDEX_PATH')  # Defaults to wellbot_kb.index next to the database
+    KB_IMPORT_BATCH_SIZE = 1000  # Entries per upsert transaction
+    KB_IMPORT_MAX_BATCH_SIZE = 10000
+    KB_EXPORT_BATCH_SIZE = 1000
+    
+    # Chat response memoization
+    RESPONSE_CACHE_SIZE = 10000
+    RESPONSE_CACHE_TTL_SECONDS = 3600
+    RESPONSE_CACHE_DISK_PATH = os.environ.get('RESPONSE_CACHE_DISK_PATH')  # SQLite file shared by workers; unset = memory only
     
     # Chat Settings
     MAX_MESSAGE_LENGTH = 1000
-    MAX_CONVERSATION_HISTORY = 50
\ No newline at end of file
+    CHAT_BATCH_MAX_MESSAGES = 1000  # Per /api/chat/batch call
+    MAX_CONVERSATION_HISTORY = 50  # Messages per conversation returned by the history APIs
+    HISTORY_PAGE_SIZE = 10  # Conversations per history page
+    HISTORY_MAX_PAGE_SIZE = 50
+    
+    # Admin listings (keyset pagination)
+    ADMIN_PAGE_SIZE = 50
+    ADMIN_MAX_PAGE_SIZE = 200
+    DATABASE_PREVIEW_MESSAGE_CHARS = 100  # Message text in the database preview is cut to this
+    
+    # Chat persistence: write-behind queues message pairs and group-commits them
+    CHAT_WRITE_BEHIND = os.environ.get('CHAT_WRITE_BEHIND', 'false').lower() == 'true'
+    CHAT_QUEUE_SIZE = 10000
+    CHAT_FLUSH_INTERVAL_MS = 50
+    CHAT_FLUSH_MAX_ROWS = 500
+    MESSAGE_ID_BLOCK_SIZE = 1000
+    
+    # Admin dashboard stream (Server-Sent Events)
+    DASHBOARD_STREAM_POLL_SECONDS = 1  # How often the shared publisher checks for changes
+    DASHBOARD_STREAM_MIN_INTERVAL_SECONDS = 2  # Bursts of writes are coalesced into one event per interval
+    DASHBOARD_STREAM_HEARTBEAT_SECONDS = 15
+    DASHBOARD_STREAM_MAX_SECONDS = 300  # Clients reconnect (and re-authenticate) after this
+    DASHBOARD_STREAM_TOKEN_SECONDS = 60  # Lifetime of the token that opens a stream
+    # Open streams per worker: each holds one of its SERVER_THREADS request threads until it ends
+    # (a sync worker, --threads 1, is blocked entirely), so leave threads for everything else
+    DASHBOARD_STREAM_MAX_CLIENTS = max(1, SERVER_THREADS // 2)
+    
+    # Observability
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()  # DEBUG adds one line per request with stage timings
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()  # 'text' or 'json'
+    LOG_QUEUE_SIZE = 10000  # Buffered records per process; further records are dropped, not waited on
+    METRICS_N_PLUS_ONE_THRESHOLD = 10  # Same statement run more often than this in one request is flagged
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')  # Defaults to instance/profiles; shared by all workers
+    PROFILE_MAX_FILES = 20  # Oldest profiles are deleted beyond this
+    PROFILE_INTERVAL_MS = 5
+    PROFILE_MAX_SECONDS = 300
+    # Profile every worker from its first request, e.g. PROFILE_ON_START_SECONDS=60 PROFILE_ON_START_ROUTE=/api/chat
+    PROFILE_ON_START_SECONDS = float(os.environ.get('PROFILE_ON_START_SECONDS', 0))
+    PROFILE_ON_START_ROUTE = os.environ.get('PROFILE_ON_START_ROUTE')
+
+    # Conversation lifecycle and archive (hot rows -> compressed monthly segment files)
+    CONVERSATION_IDLE_MINUTES = int(os.environ.get('CONVERSATION_IDLE_MINUTES', 30))  # Open conversations idle this long are closed
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))  # Closed conversations move to the archive after this
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')  # Defaults to instance/archive; shared by all workers
+    ARCHIVE_BATCH_SIZE = 500  # Conversations per archive transaction
+    ARCHIVE_RECORD_CACHE_SIZE = 256  # Decompressed archived conversations kept per worker
\ No newline at end of file
@@ -0,0 +1,162 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# ==================== DASHBOARD EVENT STREAM ====================
+
+class DashboardPublisher:
+    """Shared poller that pushes dashboard changes to every open admin stream
+
+    One background thread per process checks a cheap version token and only
+    recomputes the dashboard when it changed, so N open admin tabs cost one
+    computation per change instead of N requests per polling interval.
+    Subscribers that fell more than one change behind get a full snapshot.
+
+    Each open stream holds a server thread for its whole lifetime, so at most
+    max_subscribers are admitted per process (0 for no limit).
+    """
+
+    def __init__(self, version_fn, snapshot_fn, context_fn=None, poll_seconds=1.0,
+                 min_interval_seconds=2.0, heartbeat_seconds=15.0, idle_seconds=60.0, retry_ms=5000,
+                 max_subscribers=0):
+        self.version_fn = version_fn
+        self.snapshot_fn = snapshot_fn
+        self.context_fn = context_fn or contextlib.nullcontext
+        self.poll_seconds = poll_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.idle_seconds = idle_seconds
+        self.retry_ms = retry_ms
+        self.max_subscribers = max_subscribers
+
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._snapshot = None
+        self._delta = None
+        self._delta_base = 0
+        self._version = None
+        self._subscribers = 0
+        self._thread = None
+        self._pid = None
+
+        self.metrics = {
+            'computations': 0,
+            'version_checks': 0,
+            'events': 0,
+            'errors': 0,
+            'rejected': 0
+        }
+
+    # ---------- publisher ----------
+
+    def refresh(self):
+        """Recompute and publish if the version changed; returns True if an event went out"""
+        with self.context_fn():
+            self.metrics['version_checks'] += 1
+            version = self.version_fn()
+            if self._snapshot is not None and version == self._version:
+                return False
+            snapshot = self.snapshot_fn()
+            self.metrics['computations'] += 1
+
+        with self._cond:
+            previous = self._snapshot
+            self._version = version
+            delta = None if previous is None else {
+                key: value for key, value in snapshot.items() if previous.get(key) != value
+            }
+            if delta == {}:
+                # Something moved that the dashboard doesn't show (e.g. bot message counts)
+                return False
+            self._delta_base = self._seq
+            self._seq += 1
+            self._snapshot = snapshot
+            self._delta = delta
+            self.metrics['events'] += 1
+            self._cond.notify_all()
+        return True
+
+    def _ensure_thread(self):
+        # Called with self._cond held. Threads don't survive fork, so each worker starts its own.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='dashboard-publisher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        idle_since = None
+        while True:
+            with self._cond:
+                if self._subscribers:
+                    idle_since = None
+                else:
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since > self.idle_seconds:
+                        self._thread = None
+                        return
+
+            published = False
+            if self._subscribers:
+                try:
+                    published = self.refresh()
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    log.exception("❌ Dashboard stream error")
+
+            # Coalesce bursts: after an event, hold off for min_interval before the next one
+            time.sleep(self.min_interval_seconds if published else self.poll_seconds)
+
+    # ---------- subscribers ----------
+
+    def _event(self, name, data, seq):
+        return f"id: {seq}\nevent: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    def subscribe(self):
+        """Take a stream slot; False when max_subscribers streams are already open"""
+        with self._cond:
+            if self.max_subscribers and self._subscribers >= self.max_subscribers:
+                self.metrics['rejected'] += 1
+                return False
+            self._subscribers += 1
+            self._ensure_thread()
+        return True
+
+    def unsubscribe(self):
+        """Give back a slot taken by subscribe(), once the response is closed"""
+        with self._cond:
+            self._subscribers -= 1
+
+    def stream(self, max_seconds=300):
+        """Generator of SSE frames for one subscribed client; ends after max_seconds so the client reconnects"""
+        yield f"retry: {int(self.retry_ms)}\n\n"
+        seen = 0
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq > seen, timeout=self.heartbeat_seconds)
+                seq, snapshot, delta, delta_base = self._seq, self._snapshot, self._delta, self._delta_base
+
+            if seq == seen:
+                # Comment line: keeps proxies from timing out and detects closed clients
+                yield ": heartbeat\n\n"
+            elif delta is not None and delta_base == seen:
+                yield self._event('delta', delta, seq)
+            else:
+                yield self._event('snapshot', snapshot, seq)
+            seen = seq
+
+    def stats(self):
+        """Subscriber count and how often the dashboard was actually recomputed"""
+        return dict(
+            self.metrics,
+            subscribers=self._subscribers,
+            max_subscribers=self.max_subscribers,
+            sequence=self._seq,
+            running=bool(self._thread and self._thread.is_alive())
+        )
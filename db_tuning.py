@@ -0,0 +1,130 @@
+import logging
+import sqlite3
+import time
+
+from flask import g, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+# ==================== SQLITE PRAGMAS ====================
+
+def sqlite_pragmas(mmap_size, cache_size_kb, busy_timeout_ms):
+    """Production pragma set, applied to every new SQLite connection"""
+    return [
+        # Readers no longer block the writer (and vice versa); persists in the db file
+        ('journal_mode', 'WAL'),
+        # Safe with WAL: only the last commits can be lost on power failure, never corruption
+        ('synchronous', 'NORMAL'),
+        ('mmap_size', int(mmap_size)),
+        # Negative value = size in KiB rather than pages
+        ('cache_size', -int(cache_size_kb)),
+        # Wait for a competing writer instead of failing with "database is locked"
+        ('busy_timeout', int(busy_timeout_ms)),
+        ('temp_store', 'MEMORY'),
+    ]
+
+_installed_pragmas = []
+
+def install_sqlite_pragmas(pragmas):
+    """Apply the pragmas on connect for every SQLite engine in the process"""
+    _installed_pragmas[:] = pragmas
+    if not event.contains(Engine, 'connect', _apply_pragmas):
+        event.listen(Engine, 'connect', _apply_pragmas)
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in _installed_pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def current_pragmas(engine):
+    """Effective pragma values on a pooled connection (for diagnostics)"""
+    if engine.url.get_backend_name() != 'sqlite':
+        return {}
+    with engine.connect() as conn:
+        return {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name, _ in _installed_pragmas
+        }
+
+# ==================== QUERY TIMING ====================
+
+# Everything that wants per-statement timings (the DB timing headers, the
+# request metrics) registers here; one pair of engine listeners times each
+# statement once for all of them
+_statement_observers = []
+
+def observe_statements(observer):
+    """Call observer(statement, seconds) after every SQL statement any engine in the process runs"""
+    if observer not in _statement_observers:
+        _statement_observers.append(observer)
+    if not event.contains(Engine, 'before_cursor_execute', _statement_started):
+        event.listen(Engine, 'before_cursor_execute', _statement_started)
+        event.listen(Engine, 'after_cursor_execute', _statement_finished)
+        event.listen(Engine, 'handle_error', _statement_failed)
+
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append((cursor, time.perf_counter()))
+
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['statement_started'].pop()[1]
+    for observer in _statement_observers:
+        observer(statement, elapsed)
+
+def _statement_failed(exception_context):
+    # A failed statement never reaches after_cursor_execute: drop its start time, or it
+    # would stay on the pooled connection for good. Errors raised before the cursor
+    # ran (bad bind values) never pushed one.
+    conn = exception_context.connection
+    context = exception_context.execution_context
+    cursor = exception_context.cursor or getattr(context, 'cursor', None)
+    if conn is None or cursor is None:
+        return
+    started = conn.info.get('statement_started')
+    if started and started[-1][0] is cursor:
+        started.pop()
+
+def install_query_timing(app):
+    """Report the database time each request spent in X-DB-Time-Ms / X-DB-Queries headers"""
+    observe_statements(_count_request_query)
+
+    @app.after_request
+    def add_query_timing_headers(response):
+        response.headers['X-DB-Time-Ms'] = f"{g.get('db_ms', 0.0):.3f}"
+        response.headers['X-DB-Queries'] = str(g.get('db_queries', 0))
+        return response
+
+def _count_request_query(statement, seconds):
+    if has_app_context():
+        g.db_ms = g.get('db_ms', 0.0) + seconds * 1000
+        g.db_queries = g.get('db_queries', 0) + 1
+
+# ==================== INDEXES ====================
+
+def missing_indexes(engine, metadata):
+    """Indexes declared on the models that do not exist in the database yet"""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                missing.append(index)
+    return missing
+
+def ensure_indexes(engine, metadata):
+    """Report and create declared indexes missing from an existing database"""
+    missing = missing_indexes(engine, metadata)
+    for index in missing:
+        log.warning("⚠️ Missing index, creating it", extra={'index': index.name, 'table': index.table.name})
+        index.create(bind=engine, checkfirst=True)
+    return [index.name for index in missing]
@@ -0,0 +1,368 @@
+import atexit
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db_tuning import observe_statements
+
+# ==================== METRICS REGISTRY ====================
+
+# Upper bounds, Prometheus style; an implicit +Inf bucket follows
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+def _label_text(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _new_shard():
+    return {'histograms': {}, 'counters': defaultdict(float)}
+
+def _merge_shard(into, shard):
+    for key, (counts, total) in list(shard['histograms'].items()):
+        merged = into['histograms'].setdefault(key, [[0] * len(counts), 0.0])
+        for i, count in enumerate(counts):
+            merged[0][i] += count
+        merged[1] += total
+    for key, value in list(shard['counters'].items()):
+        into['counters'][key] += value
+
+class _ShardOwner:
+    """Held only by its thread's local storage, so it is collected when the thread ends"""
+    __slots__ = ('__weakref__',)
+
+class Registry:
+    """Per-worker histograms and counters in Prometheus text format
+
+    Every thread records into its own shard, so the hot path takes no lock;
+    shards are summed when the metrics endpoint is scraped. When a thread ends
+    (the threaded server starts one per request) its shard is folded into a
+    retired total, so the number of shards follows the live threads. Each
+    worker process keeps its own numbers (a fork starts from zero).
+    """
+
+    def __init__(self):
+        self._meta = {}  # name -> (type, help, buckets or callback)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _new_shard()
+        # Reentrant: a shard can be retired by a collection that runs while render() holds it
+        self._shards_lock = threading.RLock()
+        self._pid = os.getpid()
+        self.started_at = time.time()
+        self.histogram('wellbot_stage_seconds', 'Time spent in each stage of request handling')
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+
+    def gauge(self, name, help_text, callback):
+        """callback() returns a number, or {labels tuple: number}; evaluated at scrape time"""
+        self._meta[name] = ('gauge', help_text, callback)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is not None and self._local.pid == os.getpid():
+            return shard
+        pid = os.getpid()
+        with self._shards_lock:
+            if self._pid != pid:
+                # Forked: the parent's numbers aren't ours
+                self._shards = []
+                self._retired = _new_shard()
+                self._pid = pid
+                self.started_at = time.time()
+            shard = _new_shard()
+            self._shards.append(shard)
+        owner = _ShardOwner()
+        weakref.finalize(owner, self._retire, shard, pid)
+        self._local.owner = owner
+        self._local.shard = shard
+        self._local.pid = pid
+        return shard
+
+    def _retire(self, shard, pid):
+        """Fold the shard of a thread that ended into the retired total"""
+        with self._shards_lock:
+            if pid != self._pid:
+                return
+            for i, live in enumerate(self._shards):
+                if live is shard:
+                    del self._shards[i]
+                    _merge_shard(self._retired, shard)
+                    break
+
+    def observe(self, name, labels, value):
+        histograms = self._shard()['histograms']
+        entry = histograms.get((name, labels))
+        if entry is None:
+            buckets = self._meta[name][2]
+            entry = histograms[(name, labels)] = [[0] * (len(buckets) + 1), 0.0]
+        entry[0][bisect_left(self._meta[name][2], value)] += 1
+        entry[1] += value
+
+    def inc(self, name, labels=(), value=1):
+        self._shard()['counters'][(name, labels)] += value
+
+    @contextmanager
+    def span(self, stage):
+        """Time a block as one stage; totals per stage also land on the current request"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe('wellbot_stage_seconds', (('stage', stage),), elapsed)
+            if has_app_context() and 'stages' in g:
+                g.stages[stage] = g.stages.get(stage, 0.0) + elapsed
+
+    def timed(self, stage):
+        """Decorator form of span()"""
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return f(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)"""
+        totals = _new_shard()
+        with self._shards_lock:
+            for shard in [self._retired] + self._shards:
+                _merge_shard(totals, shard)
+        histograms, counters = totals['histograms'], totals['counters']
+
+        lines = []
+        for name, (kind, help_text, extra) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'histogram':
+                for (series, labels), (counts, total) in sorted(histograms.items()):
+                    if series != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(extra + (float('inf'),), counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_label_text(labels, le=_number(bound))} {cumulative}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {_number(total)}")
+                    lines.append(f"{name}_count{_label_text(labels)} {cumulative}")
+            elif kind == 'counter':
+                for (series, labels), value in sorted(counters.items()):
+                    if series == name:
+                        lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+            else:
+                try:
+                    values = extra()
+                except Exception:
+                    continue
+                if not isinstance(values, dict):
+                    values = {(): values}
+                for labels, value in values.items():
+                    lines.append(f"{name}{_label_text(labels)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+# ==================== REQUEST INSTRUMENTATION ====================
+
+def instrument_app(app, registry, logger, n_plus_one_threshold=10):
+    """Route latency, SQL statements per request and N+1 detection for a Flask app"""
+    registry.histogram('wellbot_request_seconds', 'Request latency by route, method and status')
+    registry.histogram('wellbot_request_sql_statements', 'SQL statements executed per request', COUNT_BUCKETS)
+    registry.histogram('wellbot_request_sql_seconds', 'Database time per request')
+    registry.histogram('wellbot_sql_seconds', 'Latency of single SQL statements by verb')
+    registry.counter('wellbot_n_plus_one_total',
+                     f'Requests that ran one statement more than {n_plus_one_threshold} times')
+
+    def sql_finished(statement, elapsed):
+        verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else 'unknown'
+        registry.observe('wellbot_sql_seconds', (('verb', verb),), elapsed)
+        # Statements of every engine in the process land here; only count this app's requests
+        if has_app_context() and current_app._get_current_object() is app and 'sql_statements' in g:
+            g.sql_statements[statement] += 1
+            g.sql_seconds += elapsed
+
+    observe_statements(sql_finished)
+
+    @event.listens_for(Session, 'before_commit')
+    def commit_started(session):
+        session.info['commit_started'] = time.perf_counter()
+
+    @event.listens_for(Session, 'after_commit')
+    def commit_finished(session):
+        started = session.info.pop('commit_started', None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            registry.observe('wellbot_stage_seconds', (('stage', 'commit'),), elapsed)
+            if has_app_context() and 'stages' in g:
+                g.stages['commit'] = g.stages.get('commit', 0.0) + elapsed
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.sql_statements = Counter()
+        g.sql_seconds = 0.0
+        g.stages = {}
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        registry.observe('wellbot_request_seconds', (
+            ('route', route), ('method', request.method), ('status', str(response.status_code))
+        ), elapsed)
+
+        statements = g.sql_statements
+        registry.observe('wellbot_request_sql_statements', (('route', route),), sum(statements.values()))
+        registry.observe('wellbot_request_sql_seconds', (('route', route),), g.sql_seconds)
+        if statements:
+            statement, repeats = statements.most_common(1)[0]
+            if repeats > n_plus_one_threshold:
+                registry.inc('wellbot_n_plus_one_total', (('route', route),))
+                logger.warning("⚠️ Possible N+1 query", extra={
+                    'route': route, 'repeats': repeats, 'statement': ' '.join(statement.split())[:200]
+                })
+
+        logger.debug("🌐 Request", extra={
+            'route': route,
+            'method': request.method,
+            'status': response.status_code,
+            'ms': round(elapsed * 1000, 3),
+            'sql': sum(statements.values()),
+            'sql_ms': round(g.sql_seconds * 1000, 3),
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in g.stages.items()}
+        })
+        return response
+
+# ==================== LOGGING ====================
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class StructuredFormatter(logging.Formatter):
+    """One line per record: text with key=value fields, or a JSON object"""
+
+    def __init__(self, json_output=False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record):
+        fields = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+        exc_text = record.exc_text or (self.formatException(record.exc_info) if record.exc_info else None)
+        if self.json_output:
+            entry = {
+                'ts': datetime.datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+                'pid': record.process
+            }
+            entry.update(fields)
+            if exc_text:
+                entry['exception'] = exc_text
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.getMessage()}"
+        if fields:
+            line += ' | ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if exc_text:
+            line += '\n' + exc_text
+        return line
+
+class BufferedLogHandler(QueueHandler):
+    """Hands records to a writer thread so logging never waits on stdout
+
+    The writer thread is started lazily in whichever process logs (threads
+    don't survive fork). When the buffer is full, records are dropped and
+    counted rather than blocking the request.
+    """
+
+    def __init__(self, target, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.close_listener)
+
+    def close_listener(self):
+        """Write out everything still buffered"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def prepare(self, record):
+        # Only resolve %-args and tracebacks here; formatting happens on the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self):
+        return {'buffered': self.queue.qsize(), 'dropped': self.dropped}
+
+def setup_logging(level='INFO', json_output=False, queue_size=10000):
+    """Route all logging through one buffered handler on the root logger (idempotent)"""
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, BufferedLogHandler):
+            return handler
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(StructuredFormatter(json_output))
+    handler = BufferedLogHandler(target, maxsize=queue_size)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
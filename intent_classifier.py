@@ -0,0 +1,265 @@
+import datetime
+import json
+import os
+import re
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import yaml
+
+# ==================== TRAINING DATA ====================
+
+# Rasa intent -> intent name used by the rest of the app (knowledge base categories, responses)
+INTENT_ALIASES = {
+    'ask_first_aid_cuts': 'cut_wound'
+}
+
+def app_intent(rasa_intent):
+    """'ask_fever' -> 'fever'; aliases keep the names the keyword matcher already uses"""
+    if rasa_intent in INTENT_ALIASES:
+        return INTENT_ALIASES[rasa_intent]
+    return rasa_intent[4:] if rasa_intent.startswith('ask_') else rasa_intent
+
+# [annotated text](entity) / [text]{"entity": ...} -> text
+ENTITY_PATTERN = re.compile(r'\[([^\]]+)\](\([^)]*\)|\{[^}]*\})')
+
+def load_nlu_examples(path):
+    """(text, rasa intent) pairs from a Rasa 3 nlu.yml"""
+    with open(path, encoding='utf-8') as fh:
+        data = yaml.safe_load(fh)
+    examples = []
+    for block in data.get('nlu', []):
+        if 'intent' not in block:
+            continue
+        for line in (block.get('examples') or '').splitlines():
+            line = line.strip()
+            if line.startswith('- '):
+                examples.append((ENTITY_PATTERN.sub(r'\1', line[2:].strip()), block['intent']))
+    return examples
+
+def load_domain_responses(domain_path, *dialogue_paths):
+    """{app intent: {'en': text, 'hi': text}} from the utterances rules/stories run for each intent
+
+    Response variants are listed English first, Hindi second in domain.yml.
+    """
+    with open(domain_path, encoding='utf-8') as fh:
+        utterances = yaml.safe_load(fh).get('responses', {})
+
+    actions = {}
+    for path in dialogue_paths:
+        with open(path, encoding='utf-8') as fh:
+            data = yaml.safe_load(fh) or {}
+        for flow in data.get('rules', []) + data.get('stories', []):
+            steps = flow.get('steps', [])
+            for i, step in enumerate(steps):
+                if 'intent' not in step or step['intent'] in actions:
+                    continue
+                following = []
+                for next_step in steps[i + 1:]:
+                    if 'action' not in next_step:
+                        break
+                    if next_step['action'] in utterances:
+                        following.append(next_step['action'])
+                if following:
+                    actions[step['intent']] = following
+
+    responses = {}
+    for rasa_intent, names in actions.items():
+        texts = {}
+        for language, position in (('en', 0), ('hi', 1)):
+            parts = [utterances[name][position]['text'] for name in names if len(utterances[name]) > position]
+            if parts:
+                texts[language] = '\n\n'.join(parts)
+        responses[app_intent(rasa_intent)] = texts
+    return responses
+
+# ==================== FEATURES ====================
+
+WORD_PATTERN = re.compile(r"[0-9a-z\u0900-\u097F']+")
+
+@lru_cache(maxsize=50000)
+def _word_buckets(word, mask, low, high):
+    """Hash buckets of a word and its char n-grams; words repeat a lot, so this is cached"""
+    # crc32 is stable across processes, unlike the salted built-in hash()
+    buckets = [zlib.crc32(('w:' + word).encode('utf-8')) & mask]
+    padded = f' {word} '
+    for n in range(low, high + 1):
+        for start in range(len(padded) - n + 1):
+            buckets.append(zlib.crc32(padded[start:start + n].encode('utf-8')) & mask)
+    return tuple(buckets)
+
+def featurize(text, n_features, ngram_range=(2, 4)):
+    """Hashed word + char n-gram features: (bucket indices, sublinear tf weights, L2-normalized)
+
+    n_features must be a power of two.
+    """
+    mask = n_features - 1
+    low, high = ngram_range
+    counts = Counter()
+    for word in WORD_PATTERN.findall(text.lower()):
+        counts.update(_word_buckets(word, mask, low, high))
+
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return indices, (values / np.sqrt(np.dot(values, values))).astype(np.float32)
+
+def _design_matrix(texts, n_features, ngram_range):
+    X = np.zeros((len(texts), n_features), dtype=np.float32)
+    for row, text in enumerate(texts):
+        indices, values = featurize(text, n_features, ngram_range)
+        X[row, indices] = values
+    return X
+
+def _softmax(logits):
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    np.exp(shifted, out=shifted)
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+# ==================== TRAINING ====================
+
+def _fit(X, y, n_classes, epochs=300, learning_rate=0.05, l2=1e-4):
+    """Multinomial logistic regression, full-batch Adam"""
+    W = np.zeros((X.shape[1], n_classes), dtype=np.float32)
+    b = np.zeros(n_classes, dtype=np.float32)
+    targets = np.eye(n_classes, dtype=np.float32)[y]
+    moments = [np.zeros_like(W), np.zeros_like(W), np.zeros_like(b), np.zeros_like(b)]
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    for step in range(1, epochs + 1):
+        error = (_softmax(X @ W + b) - targets) / len(X)
+        grads = (X.T @ error + l2 * W, error.sum(axis=0))
+        for i, (param, grad) in enumerate(zip((W, b), grads)):
+            m, v = moments[2 * i], moments[2 * i + 1]
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+    return W, b
+
+def _fit_temperature(logits, y):
+    """Temperature that minimizes the negative log-likelihood of held-out predictions"""
+    best_t, best_nll = 1.0, float('inf')
+    for t in np.geomspace(0.05, 10.0, 80):
+        probs = _softmax(logits / t)
+        nll = -np.mean(np.log(probs[np.arange(len(y)), y] + 1e-12))
+        if nll < best_nll:
+            best_t, best_nll = float(t), nll
+    return best_t
+
+def train_model(examples, responses=None, n_features=2 ** 14, ngram_range=(2, 4), folds=5, seed=13, **fit_args):
+    """Train on (text, rasa intent) pairs; returns (weights, metadata) ready for save_model()
+
+    responses ({app intent: {language: text}}) is stored alongside so a worker
+    can answer every intent the model knows without Rasa.
+    """
+    rasa_labels = sorted({intent for _, intent in examples})
+    label_ids = {label: i for i, label in enumerate(rasa_labels)}
+    texts = [text for text, _ in examples]
+    y = np.array([label_ids[intent] for _, intent in examples])
+    X = _design_matrix(texts, n_features, ngram_range)
+    # Only a few thousand hash buckets are ever hit; train on those columns alone
+    active = np.flatnonzero(X.any(axis=0))
+    X = X[:, active]
+
+    # Out-of-fold logits calibrate the temperature and estimate accuracy
+    order = np.random.RandomState(seed).permutation(len(y))
+    fold_of = np.empty(len(y), dtype=int)
+    fold_of[order] = np.arange(len(y)) % folds
+    held_out = np.zeros((len(y), len(rasa_labels)), dtype=np.float32)
+    for fold in range(folds):
+        train_rows, test_rows = fold_of != fold, fold_of == fold
+        W, b = _fit(X[train_rows], y[train_rows], len(rasa_labels), **fit_args)
+        held_out[test_rows] = X[test_rows] @ W + b
+
+    temperature = _fit_temperature(held_out, y)
+    cv_accuracy = float(np.mean(held_out.argmax(axis=1) == y))
+
+    W_active, b = _fit(X, y, len(rasa_labels), **fit_args)
+    W = np.zeros((n_features, len(rasa_labels)), dtype=np.float32)
+    W[active] = W_active
+    metadata = {
+        'format': 1,
+        'labels': [app_intent(label) for label in rasa_labels],
+        'rasa_labels': rasa_labels,
+        'n_features': n_features,
+        'ngram_range': list(ngram_range),
+        'temperature': temperature,
+        'bias': b.tolist(),
+        'examples': len(examples),
+        'cv_accuracy': round(cv_accuracy, 4),
+        'trained_at': datetime.datetime.utcnow().isoformat(),
+        'responses': responses or {}
+    }
+    return W, metadata
+
+def save_model(path, weights, metadata):
+    """Write <path>.npy (weights, memory-mappable) and <path>.json (labels, bias, calibration)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + '.npy.tmp', 'wb') as fh:
+        np.save(fh, np.ascontiguousarray(weights, dtype=np.float32), allow_pickle=False)
+    os.replace(path + '.npy.tmp', path + '.npy')
+    with open(path + '.json.tmp', 'w', encoding='utf-8') as fh:
+        json.dump(metadata, fh, ensure_ascii=False, indent=1)
+    os.replace(path + '.json.tmp', path + '.json')
+
+# ==================== INFERENCE ====================
+
+class IntentClassifier:
+    """Hashed char n-gram softmax classifier; weights are memory-mapped so workers share pages"""
+
+    def __init__(self, weights, metadata):
+        self.weights = weights  # (n_features, n_classes): one contiguous row per hashed feature
+        self.metadata = metadata
+        self.labels = metadata['labels']
+        self.label_ids = {label: i for i, label in enumerate(self.labels)}
+        self.n_features = metadata['n_features']
+        self.ngram_range = tuple(metadata['ngram_range'])
+        self.temperature = metadata['temperature']
+        self.bias = np.asarray(metadata['bias'], dtype=np.float32)
+        self.responses = metadata.get('responses', {})
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved model, or None if it hasn't been trained yet"""
+        if not (os.path.exists(path + '.npy') and os.path.exists(path + '.json')):
+            return None
+        with open(path + '.json', encoding='utf-8') as fh:
+            metadata = json.load(fh)
+        return cls(np.load(path + '.npy', mmap_mode='r'), metadata)
+
+    def predict_proba(self, text):
+        """Calibrated probability per label (same order as self.labels)"""
+        indices, values = featurize(text, self.n_features, self.ngram_range)
+        logits = values @ self.weights[indices] + self.bias if len(indices) else self.bias.copy()
+        return _softmax(logits / self.temperature)
+
+    def predict_proba_many(self, texts):
+        """Batch version of predict_proba: one gather and one reduce for all texts (no rows for no texts)"""
+        if not texts:
+            return np.empty((0, len(self.labels)), dtype=np.float32)
+        features = [featurize(text, self.n_features, self.ngram_range) for text in texts]
+        # A zero-weight feature per text keeps every segment non-empty for reduceat
+        indices = np.concatenate([np.append(idx, 0) for idx, _ in features])
+        values = np.concatenate([np.append(val, 0.0) for _, val in features]).astype(np.float32)
+        offsets = np.cumsum([0] + [len(idx) + 1 for idx, _ in features[:-1]])
+        logits = np.add.reduceat(self.weights[indices] * values[:, None], offsets, axis=0) + self.bias
+        return _softmax(logits / self.temperature)
+
+    def best(self, probs):
+        """(label, probability) of the most likely intent"""
+        top = int(np.argmax(probs))
+        return self.labels[top], float(probs[top])
+
+    def probability(self, probs, label):
+        """Probability of a specific label, 0.0 if the model doesn't know it"""
+        position = self.label_ids.get(label)
+        return float(probs[position]) if position is not None else 0.0
+
+    def predict(self, text):
+        return self.best(self.predict_proba(text))
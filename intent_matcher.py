@@ -0,0 +1,143 @@
+from collections import deque
+
+# ==================== INTENT REGISTRY ====================
+
+# Single source of truth for keyword-based intent detection. Order matters:
+# on equal match counts the intent listed first wins.
+INTENT_KEYWORDS = {
+    'headache': ['headache', 'head pain', 'migraine', 'sir dard', 'सिरदर्द'],
+    'fever': ['fever', 'temperature', 'bukhar', 'बुखार', 'tap'],
+    'cold_flu': ['cold', 'flu', 'cough', 'sardi', 'jukam', 'सर्दी', 'जुकाम'],
+    'cut_wound': ['cut', 'wound', 'bleeding', 'injury', 'chot', 'ghav', 'घाव'],
+    'exercise': ['exercise', 'workout', 'fitness', 'vyayam', 'व्यायाम'],
+    'diet': ['diet', 'food', 'nutrition', 'bhojan', 'भोजन', 'khana'],
+}
+
+DEFAULT_INTENT = 'general'
+
+DEVANAGARI_FIRST = '\u0900'
+DEVANAGARI_LAST = '\u097F'
+
+# ==================== MATCHER ====================
+
+class IntentMatcher:
+    """Aho-Corasick automaton over the intent keyword registry"""
+
+    def __init__(self, registry, default_intent=DEFAULT_INTENT):
+        self.intents = tuple(registry)
+        self.default_intent = default_intent
+
+        # Trie: one transition dict per state, state 0 is the root
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [()]
+
+        keyword_id = 0
+        for intent_index, intent in enumerate(self.intents):
+            for keyword in registry[intent]:
+                state = 0
+                for char in keyword.lower():
+                    next_state = self._goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][char] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._outputs.append(())
+                    state = next_state
+                # Every keyword gets its own id so the same string listed
+                # under two intents still counts once for each of them
+                self._outputs[state] += ((keyword_id, intent_index),)
+                keyword_id += 1
+
+        self.keyword_count = keyword_id
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        """Breadth-first pass that links each state to its longest proper suffix"""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+
+                # Suffix outputs are merged here so scanning never walks fail links for output
+                self._outputs[next_state] += self._outputs[self._fail[next_state]]
+
+        # Fold the failure links into a full transition table over the keyword
+        # alphabet. Characters outside it always lead back to the root, so the
+        # scan is a single dict lookup per character.
+        alphabet = set()
+        for transitions in self._goto:
+            alphabet.update(transitions)
+
+        self._delta = []
+        for state in range(len(self._goto)):
+            row = {}
+            for char in alphabet:
+                target = state
+                while target and char not in self._goto[target]:
+                    target = self._fail[target]
+                next_state = self._goto[target].get(char, 0)
+                if next_state:
+                    row[char] = next_state
+            self._delta.append(row)
+
+    def scan(self, message):
+        """Single pass over the message returning (per-intent match counts, has_devanagari)"""
+        delta = self._delta
+        outputs = self._outputs
+
+        counts = [0] * len(self.intents)
+        seen = set()
+        has_devanagari = False
+        state = 0
+
+        for char in message.lower():
+            if not has_devanagari and DEVANAGARI_FIRST <= char <= DEVANAGARI_LAST:
+                has_devanagari = True
+
+            state = delta[state].get(char, 0)
+
+            if outputs[state]:
+                for keyword_id, intent_index in outputs[state]:
+                    if keyword_id not in seen:
+                        seen.add(keyword_id)
+                        counts[intent_index] += 1
+
+        return counts, has_devanagari
+
+    def _pick_intent(self, counts):
+        """Same tie-break as the original scan: first intent with the strictly highest count"""
+        detected_intent = self.default_intent
+        max_matches = 0
+        for intent_index, matches in enumerate(counts):
+            if matches > max_matches:
+                max_matches = matches
+                detected_intent = self.intents[intent_index]
+        return detected_intent
+
+    def match(self, message):
+        """Return (intent, language, {intent: match_count}) for a message"""
+        counts, has_devanagari = self.scan(message)
+        detected_lang = 'hi' if has_devanagari else 'en'
+        return self._pick_intent(counts), detected_lang, dict(zip(self.intents, counts))
+
+    def detect(self, message):
+        """Return (intent, language) for a message"""
+        counts, has_devanagari = self.scan(message)
+        return self._pick_intent(counts), 'hi' if has_devanagari else 'en'
+
+    def detect_many(self, messages):
+        """Return a list of (intent, language) tuples, one per message, in order"""
+        return [self.detect(message) for message in messages]
+
+
+# Compiled once at import so every worker shares the same automaton
+intent_matcher = IntentMatcher(INTENT_KEYWORDS)
@@ -0,0 +1,314 @@
+import csv
+import datetime
+import io
+import json
+import os
+
+import yaml
+from sqlalchemy import bindparam, select, tuple_
+
+from intent_classifier import app_intent
+
+# ==================== READERS ====================
+
+# Each reader yields (position, record) lazily; a record that can't be parsed is
+# yielded as the ValueError instead, so one bad line doesn't stop the import.
+
+FORMATS = ('ndjson', 'csv', 'yaml', 'domain')
+
+def format_for(filename):
+    """Import format implied by a file name, or None"""
+    name = os.path.basename(filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.yml', '.yaml')):
+        return 'domain' if name.startswith('domain') else 'yaml'
+    return None
+
+def read_ndjson(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"invalid JSON: {e}")
+
+def read_csv(stream):
+    # Header row names the columns; position is the line number of the record
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record
+
+def read_yaml(stream, languages=('en', 'hi')):
+    """Entries from one or more '---'-separated documents, each an entry or a list of entries
+
+    A document with a `responses:` section is read as a Rasa domain file.
+    """
+    position = 0
+    for document in yaml.safe_load_all(stream):
+        if isinstance(document, dict) and 'responses' in document:
+            entries = (entry for _, entry in domain_entries(document, languages))
+        elif isinstance(document, list):
+            entries = document
+        elif document is None:
+            continue
+        else:
+            entries = [document]
+        for entry in entries:
+            position += 1
+            yield position, entry
+
+def read_domain(stream, languages=('en', 'hi')):
+    return domain_entries(yaml.safe_load(stream) or {}, languages)
+
+def domain_entries(domain, languages=('en', 'hi')):
+    """One entry per utterance variant of a domain.yml `responses:` section
+
+    Variants are matched to languages by position (English first, Hindi
+    second, as in this repo's domain.yml); `utter_ask_fever` becomes the
+    `fever` category, the name the chat route looks answers up by.
+    """
+    position = 0
+    for name, variants in (domain.get('responses') or {}).items():
+        intent = name[len('utter_'):] if name.startswith('utter_') else name
+        for language, variant in zip(languages, variants or []):
+            position += 1
+            if not isinstance(variant, dict) or not variant.get('text'):
+                yield position, ValueError(f"{name}: variant without text")
+                continue
+            yield position, {
+                'category': app_intent(intent),
+                'title': name,
+                'content': variant['text'].strip(),
+                'language': language,
+                'tags': ['domain']
+            }
+
+def read(stream, input_format, languages=('en', 'hi')):
+    """(position, record) pairs from a text stream in one of FORMATS"""
+    if input_format == 'ndjson':
+        return read_ndjson(stream)
+    if input_format == 'csv':
+        return read_csv(stream)
+    if input_format == 'yaml':
+        return read_yaml(stream, languages)
+    if input_format == 'domain':
+        return read_domain(stream, languages)
+    raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+
+# ==================== VALIDATION ====================
+
+def parse_tags(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('['):
+            value = json.loads(value)
+        else:
+            value = value.split(',')
+    if not isinstance(value, list):
+        raise ValueError("tags must be a list or a comma-separated string")
+    return [str(tag).strip() for tag in value if str(tag).strip()]
+
+def parse_active(value):
+    if value is None or value == '':
+        return True
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('true', '1', 'yes'):
+        return True
+    if text in ('false', '0', 'no'):
+        return False
+    raise ValueError(f"is_active must be true or false, not {value!r}")
+
+def clean_entry(record, languages):
+    """Validated row values for one record; raises ValueError with the reason"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("entry must be an object")
+
+    entry = {}
+    for field, limit in (('category', 100), ('title', 255), ('content', None)):
+        value = record.get(field)
+        value = value.strip() if isinstance(value, str) else value
+        if not value or not isinstance(value, str):
+            raise ValueError(f"{field} is required")
+        if limit and len(value) > limit:
+            raise ValueError(f"{field} is longer than {limit} characters")
+        entry[field] = value
+
+    language = record.get('language') or 'en'
+    if not isinstance(language, str) or language.strip() not in languages:
+        raise ValueError(f"language must be one of: {', '.join(languages)}")
+    entry['language'] = language.strip()
+    try:
+        entry['tags'] = json.dumps(parse_tags(record.get('tags')))
+    except ValueError:
+        raise ValueError("tags must be a list or a comma-separated string")
+    entry['is_active'] = parse_active(record.get('is_active'))
+    return entry
+
+# ==================== IMPORT ====================
+
+class KnowledgeBaseImporter:
+    """Validate, deduplicate and upsert knowledge base entries in batched transactions
+
+    Entries are keyed by (category, title, language): a key that already
+    exists is updated in place (only if something changed), a new key is
+    inserted, and when the input repeats a key the last occurrence wins.
+    Each batch is one transaction, so an interrupted import keeps the
+    batches that finished and can simply be re-run.
+    """
+
+    MAX_ERRORS = 100  # Invalid records reported individually; the rest are only counted
+    LOOKUP_CHUNK = 500  # Keys per existence query (three bound parameters each)
+
+    def __init__(self, engine, table, languages, batch_size=1000):
+        self.engine = engine
+        self.table = table
+        self.languages = languages
+        self.batch_size = batch_size
+        self.report = {
+            'read': 0,
+            'inserted': 0,
+            'updated': 0,
+            'unchanged': 0,
+            'duplicates': 0,
+            'invalid': 0,
+            'batches': 0,
+            'errors': []
+        }
+
+    def run(self, records):
+        """Import (position, record) pairs; returns the report"""
+        for _ in self.batches(records):
+            pass
+        return self.report
+
+    def batches(self, records):
+        """Like run(), but yields the running report after every committed batch"""
+        report = self.report
+        seen = set()
+        batch = {}
+        for position, record in records:
+            report['read'] += 1
+            try:
+                entry = clean_entry(record, self.languages)
+            except ValueError as e:
+                report['invalid'] += 1
+                if len(report['errors']) < self.MAX_ERRORS:
+                    report['errors'].append({'record': position, 'error': str(e)})
+                continue
+
+            key = (entry['category'], entry['title'], entry['language'])
+            if key in seen:
+                report['duplicates'] += 1
+            seen.add(key)
+            batch[key] = entry
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = {}
+                yield report
+
+        if batch:
+            self._flush(batch)
+            yield report
+
+    def _flush(self, batch):
+        table = self.table
+        report = self.report
+        now = datetime.datetime.utcnow()
+        keys = list(batch)
+        key_columns = tuple_(table.c.category, table.c.title, table.c.language)
+
+        with self.engine.begin() as conn:
+            existing = {}
+            for start in range(0, len(keys), self.LOOKUP_CHUNK):
+                rows = conn.execute(
+                    select(table.c.id, table.c.category, table.c.title, table.c.language,
+                           table.c.content, table.c.tags, table.c.is_active)
+                    .where(key_columns.in_(keys[start:start + self.LOOKUP_CHUNK]))
+                    .order_by(table.c.id)
+                )
+                for row in rows:
+                    # Rows duplicated before this pipeline existed: the oldest one is kept current
+                    existing.setdefault((row.category, row.title, row.language), row)
+
+            inserts, updates = [], []
+            for key, entry in batch.items():
+                row = existing.get(key)
+                if row is None:
+                    inserts.append(dict(entry, created_at=now, updated_at=now))
+                elif (row.content, row.tags, row.is_active) == (entry['content'], entry['tags'], entry['is_active']):
+                    report['unchanged'] += 1
+                else:
+                    updates.append({
+                        'entry_id': row.id,
+                        'new_content': entry['content'],
+                        'new_tags': entry['tags'],
+                        'new_is_active': entry['is_active'],
+                        'new_updated_at': now
+                    })
+
+            if inserts:
+                conn.execute(table.insert(), inserts)
+            if updates:
+                conn.execute(
+                    table.update()
+                    .where(table.c.id == bindparam('entry_id'))
+                    .values(content=bindparam('new_content'), tags=bindparam('new_tags'),
+                            is_active=bindparam('new_is_active'), updated_at=bindparam('new_updated_at')),
+                    updates
+                )
+
+        report['inserted'] += len(inserts)
+        report['updated'] += len(updates)
+        report['batches'] += 1
+
+# ==================== EXPORT ====================
+
+EXPORT_FIELDS = ('id', 'category', 'title', 'content', 'language', 'tags', 'is_active', 'created_at', 'updated_at')
+
+def export_rows(engine, table, language=None, category=None, batch_size=1000):
+    """Knowledge base rows as dicts in id order, fetched one keyset batch at a time"""
+    last_id = 0
+    while True:
+        query = select(*[table.c[field] for field in EXPORT_FIELDS]).where(table.c.id > last_id)
+        if language:
+            query = query.where(table.c.language == language)
+        if category:
+            query = query.where(table.c.category == category)
+        # A short connection per batch: no transaction stays open while the client reads
+        with engine.connect() as conn:
+            rows = conn.execute(query.order_by(table.c.id).limit(batch_size)).all()
+        for row in rows:
+            entry = dict(row._mapping)
+            entry['tags'] = json.loads(entry['tags']) if entry['tags'] else []
+            for field in ('created_at', 'updated_at'):
+                entry[field] = entry[field].isoformat() if entry[field] else None
+            yield entry
+        if len(rows) < batch_size:
+            break
+        last_id = rows[-1].id
+
+def to_ndjson(entries):
+    for entry in entries:
+        yield json.dumps(entry, ensure_ascii=False) + '\n'
+
+def to_csv(entries):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for entry in entries:
+        writer.writerow(dict(entry, tags=','.join(entry['tags'])))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,67 @@
+import datetime
+import logging
+
+from sqlalchemy import inspect, select, text
+
+from db_tuning import ensure_indexes
+
+log = logging.getLogger(__name__)
+
+# ==================== SCHEMA MIGRATIONS ====================
+
+# Additive changes (new tables, new indexes) need no migration: upgrade() creates
+# whatever the models declare and the database lacks. Everything else (dropping
+# or changing constraints and columns, data fixes) is a numbered step below.
+# Steps must also be safe on a database created from the current models.
+
+def drop_feedback_message_fk(conn):
+    """Feedback outlives archived messages; SQLite never enforced this key, server databases drop it"""
+    if conn.dialect.name == 'sqlite':
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    for fk in inspect(conn).get_foreign_keys('feedback'):
+        if fk['referred_table'] != 'messages' or not fk['name']:
+            continue
+        drop = 'DROP FOREIGN KEY' if conn.dialect.name == 'mysql' else 'DROP CONSTRAINT'
+        conn.execute(text(f"ALTER TABLE feedback {drop} {quote(fk['name'])}"))
+
+MIGRATIONS = [
+    (1, 'drop feedback.message_id foreign key', drop_feedback_message_fk),
+]
+
+# Any constant works; it only has to be the same on every node
+ADVISORY_LOCK_KEY = 7_261_390_024
+
+def upgrade(engine, metadata, migration_model):
+    """Create missing tables and indexes, then apply pending migrations; returns the names applied
+
+    Runs in one transaction. On PostgreSQL an advisory lock makes nodes that
+    start together wait for the first one instead of racing it.
+    """
+    versions = migration_model.__table__
+    applied = []
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': ADVISORY_LOCK_KEY})
+        metadata.create_all(conn)
+        # create_all() skips indexes on tables that already exist
+        ensure_indexes(conn, metadata)
+        done = set(conn.execute(select(versions.c.version)).scalars())
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            migrate(conn)
+            conn.execute(versions.insert().values(version=version, name=name, applied_at=datetime.datetime.utcnow()))
+            log.info("🧱 Migration applied", extra={'version': version, 'migration': name})
+            applied.append(name)
+    return applied
+
+def status(engine, migration_model):
+    """[(version, name, applied_at or None)] for every known migration"""
+    versions = migration_model.__table__
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(versions.name):
+            done = {}
+        else:
+            done = dict(conn.execute(select(versions.c.version, versions.c.applied_at)).all())
+    return [(version, name, done.get(version)) for version, name, _ in MIGRATIONS]
@@ -1,8 +1,13 @@
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
 
-db = SQLAlchemy()
+from flask_sqlalchemy import SQLAlchemy
+
+from storage import RoutingSession
+
+# Bound to the app (and its engine options and binds) by db.init_app() in app.py
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# ==================== DATABASE MODELS ====================
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -12,16 +17,20 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     preferred_language = db.Column(db.String(50), default='en')
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    last_login = db.Column(db.DateTime)
     age_group = db.Column(db.String(50))
     gender = db.Column(db.String(50))
     exercise_hours = db.Column(db.String(50))
     health_conditions = db.Column(db.Text)
     role = db.Column(db.String(20), default='user')
+    last_login = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True)
-    
     conversations = db.relationship('Conversation', backref='user', lazy=True, cascade='all, delete-orphan')
     feedbacks = db.relationship('Feedback', backref='user', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_users_created_at', 'created_at'),
+        db.Index('ix_users_last_login', 'last_login'),
+    )
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'
@@ -30,30 +39,78 @@ class Conversation(db.Model):
     start_time = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     end_time = db.Column(db.DateTime)
     messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # Active conversation lookup on every chat turn
+        db.Index('ix_conversations_user_end', 'user_id', 'end_time'),
+        # Conversation history pages, newest first
+        db.Index('ix_conversations_user_start', 'user_id', 'start_time'),
+    )
 
 class Message(db.Model):
     __tablename__ = 'messages'
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
-    sender = db.Column(db.String(50), nullable=False)
+    sender = db.Column(db.String(50), nullable=False)  # 'user' or 'bot'
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     intent = db.Column(db.String(100))
     confidence = db.Column(db.Float, default=0.0)
+    
+    __table_args__ = (
+        # Dashboard aggregates: daily user queries and top intents
+        db.Index('ix_messages_sender_timestamp', 'sender', 'timestamp'),
+        db.Index('ix_messages_intent', 'intent'),
+        # Conversation history and per-conversation message counts
+        db.Index('ix_messages_conversation_timestamp', 'conversation_id', 'timestamp'),
+    )
+
+class ArchivedConversation(db.Model):
+    """Index of a conversation moved to the archive: where its record is and what history pages need"""
+    __tablename__ = 'archived_conversations'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # The conversation's id, kept
+    user_id = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    segment = db.Column(db.String(100), nullable=False)
+    offset = db.Column(db.BigInteger, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        # History pages, newest first, across both tiers
+        db.Index('ix_archived_conversations_user_start', 'user_id', 'start_time'),
+    )
+
+class ArchivedRatedMessage(db.Model):
+    """Archived message that has feedback, so the feedback listing can still find and filter it"""
+    __tablename__ = 'archived_rated_messages'
+    message_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    conversation_id = db.Column(db.Integer, nullable=False)
+    intent = db.Column(db.String(100))
 
 class Feedback(db.Model):
     __tablename__ = 'feedback'
     id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: the rated message may have moved to the conversation archive
+    message_id = db.Column(db.Integer)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    message_id = db.Column(db.Integer, db.ForeignKey('messages.id'), nullable=False)
-    rating = db.Column(db.String(20), nullable=False)
+    rating = db.Column(db.String(20))  # 'positive' or 'negative'
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     
-    message = db.relationship('Message', backref='feedback')
+    __table_args__ = (
+        db.Index('ix_feedback_created_at', 'created_at'),
+    )
 
 class HealthKnowledgeBase(db.Model):
     __tablename__ = 'health_knowledge_base'
+    __table_args__ = (
+        # Bulk import upserts by this key
+        db.Index('ix_kb_category_title_language', 'category', 'title', 'language'),
+        # Admin listing, newest edits first
+        db.Index('ix_kb_updated_at', 'updated_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     category = db.Column(db.String(100), nullable=False)
     title = db.Column(db.String(255), nullable=False)
@@ -64,13 +121,46 @@ class HealthKnowledgeBase(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
+class IdAllocation(db.Model):
+    __tablename__ = 'id_allocations'
+    name = db.Column(db.String(50), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+class StatsDaily(db.Model):
+    __tablename__ = 'stats_daily'
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(50), primary_key=True)  # 'queries', 'intent' or 'feedback'
+    key = db.Column(db.String(100), primary_key=True, default='')  # intent name / rating
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class StatsCounter(db.Model):
+    __tablename__ = 'stats_counters'
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyActiveUser(db.Model):
+    __tablename__ = 'daily_active_users'
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+
+class StatsWatermark(db.Model):
+    __tablename__ = 'stats_watermarks'
+    source = db.Column(db.String(50), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    boundary_id = db.Column(db.Integer, nullable=False, default=0)
+
 class AdminActivity(db.Model):
     __tablename__ = 'admin_activities'
     id = db.Column(db.Integer, primary_key=True)
-    admin_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    admin_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     action = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     ip_address = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
-    
-    admin = db.relationship('User', backref='activities')
\ No newline at end of file
+
+class SchemaMigration(db.Model):
+    """Numbered schema migrations already applied to this database (see migrations.py)"""
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
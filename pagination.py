@@ -0,0 +1,42 @@
+import base64
+import datetime
+import json
+
+# ==================== KEYSET CURSORS ====================
+
+def encode_cursor(*values):
+    """Opaque, URL-safe cursor for the sort key of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, *types):
+    """Decode a cursor back into typed values; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for value, value_type in zip(values, types):
+        if value is None:
+            decoded.append(None)
+            continue
+        try:
+            if value_type is datetime.datetime:
+                decoded.append(datetime.datetime.fromisoformat(value))
+            else:
+                decoded.append(value_type(value))
+        except (TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+    return decoded
+
+def page_size(requested, default, maximum):
+    """Clamp a ?limit= value into [1, maximum]"""
+    if requested is None:
+        return default
+    return max(1, min(int(requested), maximum))
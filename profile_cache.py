@@ -0,0 +1,303 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import bindparam, or_
+
+from cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+# What token_required, the chat path and GET /api/profile read about a user
+UserProfile = namedtuple('UserProfile', [
+    'id', 'role', 'is_active', 'preferred_language',
+    'username', 'email', 'age_group', 'gender', 'exercise_hours', 'health_conditions'
+])
+PROFILE_COLUMNS = UserProfile._fields
+
+# Memory entry: the shared version it was checked against, when the shared entry
+# expires (wall clock, valid across processes) and when it was last checked
+CachedProfile = namedtuple('CachedProfile', ['version', 'expires_at', 'checked_at', 'profile'])
+
+def parse_health_conditions(value, user_id=None):
+    """health_conditions as stored (a JSON list, or NULL) to a tuple
+
+    Anything else (malformed JSON, or JSON that isn't a list) is served as no
+    conditions, with a warning so the row can be fixed.
+    """
+    if not value:
+        return ()
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        parsed = None
+    if not isinstance(parsed, list):
+        log.warning("⚠️ Unreadable health_conditions, served as none", extra={'user_id': user_id, 'value': value[:200]})
+        return ()
+    return tuple(parsed)
+
+def make_profile(row):
+    """UserProfile from a row (or object) with the PROFILE_COLUMNS, health_conditions still as stored"""
+    values = {column: getattr(row, column) for column in PROFILE_COLUMNS}
+    values['health_conditions'] = parse_health_conditions(values['health_conditions'], values['id'])
+    return UserProfile(**values)
+
+# ==================== PROFILE CACHE ====================
+
+class ProfileCache:
+    """Read-through cache of user profiles, with health_conditions already parsed
+
+    Memory entries are per worker and live at most ttl. With a disk_path the
+    profiles also go to a SQLite file every worker on the host shares, each
+    tagged with a version; a worker rechecks its memory entry against the
+    shared version every `revalidate` seconds, so an invalidation from any
+    worker on the host is seen within that time, and a profile one worker
+    loaded is a disk hit for the others. Shared entries expire after ttl too,
+    which bounds how long other hosts can serve a changed profile.
+    """
+
+    def __init__(self, load, maxsize=10000, ttl=30, revalidate=1.0, disk_path=None):
+        self.load = load  # user_id -> row with PROFILE_COLUMNS, or None
+        self.memory = TTLCache(maxsize, ttl)
+        self.ttl = ttl
+        self.revalidate = revalidate
+        self.disk_path = disk_path
+        self._local = threading.local()
+        self._disk_ready = False
+        self._writes = 0
+
+        self.metrics = {
+            'memory_hits': 0,
+            'revalidated': 0,
+            'disk_hits': 0,
+            'loads': 0,
+            'invalidations': 0,
+            'disk_errors': 0
+        }
+
+    # ---------- disk tier ----------
+
+    def _disk(self):
+        """One connection per thread (and per process, connections don't survive fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.disk_path, timeout=1.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if not self._disk_ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS user_profiles ('
+                'user_id INTEGER PRIMARY KEY, version TEXT NOT NULL, profile TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._disk_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _disk_get(self, user_id):
+        """(version, expires_at, profile JSON) of a live shared entry, else None"""
+        row = self._disk().execute(
+            'SELECT version, expires_at, profile FROM user_profiles WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row
+
+    def _disk_set(self, user_id, version, expires_at, profile):
+        conn = self._disk()
+        conn.execute(
+            'INSERT OR REPLACE INTO user_profiles (user_id, version, profile, expires_at) VALUES (?, ?, ?, ?)',
+            (user_id, version, json.dumps(profile._asdict()), expires_at)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            conn.execute('DELETE FROM user_profiles WHERE expires_at <= ?', (time.time(),))
+
+    def _disk_error(self, e):
+        self.metrics['disk_errors'] += 1
+        log.warning("⚠️ Profile cache disk error: %s", e)
+
+    # ---------- public API ----------
+
+    def _remember(self, user_id, version, expires_at, profile):
+        self.memory.set(user_id, CachedProfile(version, expires_at, time.monotonic(), profile),
+                        ttl=min(self.ttl, expires_at - time.time()))
+
+    def get(self, user_id):
+        """UserProfile for an id, or None if the user doesn't exist"""
+        entry = self.memory.get(user_id)
+        if entry is not None and (not self.disk_path or time.monotonic() - entry.checked_at < self.revalidate):
+            self.metrics['memory_hits'] += 1
+            return entry.profile
+
+        if self.disk_path:
+            try:
+                shared = self._disk_get(user_id)
+            except sqlite3.Error as e:
+                self._disk_error(e)
+                shared = None
+                if entry is not None:
+                    return entry.profile
+            if shared is not None:
+                version, expires_at, data = shared
+                if entry is not None and entry.version == version:
+                    self.metrics['revalidated'] += 1
+                    profile = entry.profile
+                else:
+                    self.metrics['disk_hits'] += 1
+                    data = json.loads(data)
+                    profile = UserProfile(**dict(data, health_conditions=tuple(data['health_conditions'])))
+                self._remember(user_id, version, expires_at, profile)
+                return profile
+
+        row = self.load(user_id)
+        if row is None:
+            return None
+        self.metrics['loads'] += 1
+        return self.put(make_profile(row))
+
+    def put(self, profile):
+        """Cache a freshly read profile under a new version; returns it"""
+        version = f"{os.getpid()}-{time.time_ns()}"
+        expires_at = time.time() + self.ttl
+        if self.disk_path:
+            try:
+                self._disk_set(profile.id, version, expires_at, profile)
+            except sqlite3.Error as e:
+                self._disk_error(e)
+        self._remember(profile.id, version, expires_at, profile)
+        return profile
+
+    def invalidate(self, user_id):
+        """Drop a user's profile here and, with a disk tier, for every worker on the host"""
+        self.metrics['invalidations'] += 1
+        self.memory.pop(user_id)
+        if self.disk_path:
+            try:
+                self._disk().execute('DELETE FROM user_profiles WHERE user_id = ?', (user_id,))
+            except sqlite3.Error as e:
+                self._disk_error(e)
+
+    def stats(self):
+        return dict(self.metrics, memory=self.memory.stats(), disk_path=self.disk_path)
+
+# ==================== SIGN-IN WRITES ====================
+
+class LastLoginWriter:
+    """Coalesces sign-in bookkeeping into periodic batched writes
+
+    record() only notes the latest sign-in time per user in memory; a
+    background thread writes what accumulated every interval seconds as one
+    transaction: users.last_login (never moved backwards, so workers may
+    flush in any order) and the daily active users rollup. A crash loses at
+    most one interval of last_login values.
+    """
+
+    def __init__(self, db, user_model, rollups=None, interval=5.0):
+        self.db = db
+        self.users_table = user_model.__table__
+        self.rollups = rollups
+        self.interval = interval
+
+        self._engine = None
+        self._pending = {}  # user_id -> latest sign-in time
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+        self.metrics = {
+            'recorded': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'flush_errors': 0,
+            'last_flush_ms': 0.0
+        }
+
+        atexit.register(self.stop)
+
+    def record(self, user_id, when):
+        """Note a sign-in; written by the next flush"""
+        self._engine = self._engine or self.db.engine
+        with self._lock:
+            if user_id not in self._pending or self._pending[user_id] < when:
+                self._pending[user_id] = when
+        self.metrics['recorded'] += 1
+        self._ensure_flusher()
+
+    def flush(self):
+        """Write everything recorded so far; returns the number of users written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending or self._engine is None:
+                return 0
+            started = time.perf_counter()
+            users = self.users_table
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(
+                        users.update()
+                        .where(users.c.id == bindparam('user_id'),
+                               or_(users.c.last_login.is_(None), users.c.last_login < bindparam('login_at')))
+                        .values(last_login=bindparam('login_at')),
+                        [{'user_id': user_id, 'login_at': when} for user_id, when in pending.items()]
+                    )
+                    if self.rollups:
+                        self.rollups.record_sign_ins(conn, pending.items())
+            except Exception:
+                self.metrics['flush_errors'] += 1
+                log.exception("❌ Last login flush error, kept for the next flush", extra={'users': len(pending)})
+                with self._lock:
+                    for user_id, when in pending.items():
+                        if user_id not in self._pending or self._pending[user_id] < when:
+                            self._pending[user_id] = when
+                return 0
+            self.metrics['flushes'] += 1
+            self.metrics['rows_written'] += len(pending)
+            self.metrics['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            return len(pending)
+
+    def _ensure_flusher(self):
+        # Threads don't survive fork, so each worker process starts its own flusher
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._flush_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='last-login-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.flush()
+
+    def after_fork(self):
+        """Sign-ins recorded by the parent are its own to write"""
+        # A lock held by a parent thread at fork time would stay held here forever
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+        self._stopping.clear()
+
+    def stop(self):
+        """Stop the flusher and write what is pending; safe to call more than once"""
+        self._stopping.set()
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return dict(self.metrics, pending=pending, interval_seconds=self.interval)
@@ -0,0 +1,234 @@
+import datetime
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+log = logging.getLogger(__name__)
+
+# ==================== SAMPLING PROFILER ====================
+
+FORMATS = {
+    'collapsed': '.folded',  # Brendan Gregg's folded stacks, for flamegraph.pl / speedscope / inferno
+    'speedscope': '.speedscope.json'
+}
+PROFILE_NAME = re.compile(r'^profile-[0-9T-]+-\d+(\.folded|\.speedscope\.json)$')
+
+
+class ProfileSession:
+    """One profiling run: what to sample, until when, and the stacks seen so far"""
+
+    def __init__(self, seconds, route, output_format, interval):
+        self.seconds = seconds
+        self.route = route
+        self.output_format = output_format
+        self.interval = interval
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + seconds
+        self.stopped = threading.Event()
+        self.stacks = Counter()
+        self.samples = 0
+
+    def status(self):
+        return {
+            'pid': os.getpid(),
+            'route': self.route,
+            'format': self.output_format,
+            'interval_ms': round(self.interval * 1000, 3),
+            'seconds': self.seconds,
+            'started_at': datetime.datetime.utcfromtimestamp(self.started_at).isoformat(),
+            'samples': self.samples
+        }
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler that can be switched on for one worker at runtime
+
+    While a session runs, a background thread reads every thread's stack
+    (sys._current_frames) each interval and counts identical stacks. With a
+    route filter only threads currently serving that route are sampled. When
+    the session ends the stacks are written to the profile directory, which
+    keeps the newest max_files profiles. When no session runs nothing is
+    sampled; the request hooks only check one attribute.
+    """
+
+    def __init__(self, directory, max_files=20, interval_ms=5, max_seconds=300):
+        self.directory = directory
+        self.max_files = max_files
+        self.interval_ms = interval_ms
+        self.max_seconds = max_seconds
+        self.session = None
+        self._serving = {}  # thread id -> route, only filled while a route-filtered session runs
+        self._labels = {}  # code object -> frame label
+        self._lock = threading.Lock()
+
+    # ---------- control ----------
+
+    def start(self, seconds, route=None, output_format='collapsed', interval_ms=None):
+        """Profile this process for `seconds`; raises ValueError on bad arguments, RuntimeError if one is running"""
+        seconds = float(seconds)
+        interval = float(interval_ms if interval_ms is not None else self.interval_ms) / 1000
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"seconds must be between 0 and {self.max_seconds}")
+        if not 0.001 <= interval <= 1:
+            raise ValueError("interval_ms must be between 1 and 1000")
+        if output_format not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+
+        with self._lock:
+            if self.session is not None:
+                raise RuntimeError("A profile is already running in this worker")
+            session = self.session = ProfileSession(seconds, route or None, output_format, interval)
+        threading.Thread(target=self._run, args=(session,), name='wellbot-profiler', daemon=True).start()
+        log.info("🔬 Profiling started", extra=session.status())
+        return session.status()
+
+    def stop(self):
+        """End the running session early; its profile is still written. False if none was running"""
+        session = self.session
+        if session is None:
+            return False
+        session.stopped.set()
+        return True
+
+    def status(self):
+        session = self.session
+        return session.status() if session else None
+
+    # ---------- request hooks ----------
+
+    def enter(self, route):
+        session = self.session
+        if session is not None and session.route:
+            self._serving[threading.get_ident()] = route
+
+    def leave(self):
+        if self._serving:
+            self._serving.pop(threading.get_ident(), None)
+
+    # ---------- sampling ----------
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = (
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+            )
+        return label
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    def _sample(self, session):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            if session.route and self._serving.get(thread_id) != session.route:
+                continue
+            session.stacks[self._stack(frame)] += 1
+        session.samples += 1
+
+    def _run(self, session):
+        try:
+            while not session.stopped.is_set() and time.monotonic() < session.deadline:
+                self._sample(session)
+                session.stopped.wait(session.interval)
+            path = self._write(session)
+            log.info("🔬 Profile written", extra={'path': path, 'samples': session.samples})
+        except Exception:
+            log.exception("❌ Profiler error")
+        finally:
+            with self._lock:
+                self.session = None
+                self._serving.clear()
+                self._labels.clear()
+
+    # ---------- output ----------
+
+    def _write(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.utcfromtimestamp(session.started_at).strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(self.directory, f"profile-{stamp}-{os.getpid()}{FORMATS[session.output_format]}")
+        if session.output_format == 'speedscope':
+            body = json.dumps(speedscope(session))
+        else:
+            body = ''.join(f"{';'.join(stack)} {count}\n" for stack, count in session.stacks.most_common())
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(body)
+        self._prune()
+        return path
+
+    def _prune(self):
+        for name in [entry['name'] for entry in self.profiles()][self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def profiles(self):
+        """Stored profiles of all workers, newest first"""
+        try:
+            names = [name for name in os.listdir(self.directory) if PROFILE_NAME.match(name)]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append({
+                'name': name,
+                'size': stat.st_size,
+                'created_at': datetime.datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+            })
+        return sorted(entries, key=lambda entry: entry['name'], reverse=True)
+
+    def path_of(self, name):
+        """Absolute path of a stored profile, or None for anything that isn't one"""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+def speedscope(session):
+    """Session stacks in speedscope's file format (one sampled profile)"""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in session.stacks.most_common():
+        sample = []
+        for label in stack:
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({'name': label})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(round(count * session.interval, 6))
+    name = f"wellbot pid {os.getpid()}" + (f" {session.route}" if session.route else '')
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 6),
+            'samples': samples,
+            'weights': weights
+        }],
+        'name': name,
+        'activeProfileIndex': 0,
+        'exporter': 'wellbot'
+    }
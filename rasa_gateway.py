@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+# ==================== CIRCUIT BREAKER ====================
+
+class CircuitBreaker:
+    """Closed until failure_threshold consecutive failures, then open until a probe succeeds"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, failure_threshold=5):
+        self.failure_threshold = failure_threshold
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                self.opened_at = None
+                log.info("✅ Rasa is reachable again, circuit closed")
+
+    def record_failure(self):
+        """Count a failure; returns True if this one opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.times_opened += 1
+                log.warning("⚠️ Rasa circuit opened", extra={'consecutive_failures': self.failures})
+                return True
+            return False
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'opened_at': self.opened_at,
+            'times_opened': self.times_opened
+        }
+
+# ==================== RASA GATEWAY ====================
+
+def normalize_message(text):
+    """Cache/coalescing key: case, whitespace and trailing punctuation don't change the answer"""
+    return re.sub(r'\s+', ' ', text.strip().lower()).rstrip(' ?!.।')
+
+
+class _Call:
+    """One in-flight Rasa request that identical requests can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class RasaGateway:
+    """Keep-alive, bounded and fail-fast access to the Rasa REST webhook
+
+    - one pooled requests.Session per process, with separate connect/read timeouts
+    - at most max_concurrent calls in flight; extra callers skip Rasa instead of queueing
+    - a circuit breaker that stops calling Rasa after repeated failures while a
+      background probe checks when it is back
+    - an LRU+TTL cache for stateless intents and single-flight coalescing of
+      identical in-flight requests
+
+    respond() returns None whenever Rasa is skipped or fails, so the caller
+    falls back to the knowledge base without waiting. respond_async() is the
+    same for the asyncio server, over aiohttp.
+    """
+
+    def __init__(self, url, probe_url=None, connect_timeout=0.5, read_timeout=2.0, pool_size=20,
+                 max_concurrent=16, failure_threshold=5, probe_interval=10.0,
+                 cache_size=5000, cache_ttl=600, cacheable_intents=()):
+        self.url = url
+        if probe_url is None:
+            parts = urlsplit(url)
+            probe_url = f"{parts.scheme}://{parts.netloc}/"
+        self.probe_url = probe_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.max_concurrent = max_concurrent
+        self.probe_interval = probe_interval
+        self.cacheable_intents = set(cacheable_intents)
+
+        self.breaker = CircuitBreaker(failure_threshold)
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._async_session = None
+        self._async_inflight = {}
+        self._probe_thread = None
+        self._probe_lock = threading.Lock()
+
+        self.metrics = {
+            'requests': 0,
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'short_circuited': 0,
+            'rejected_busy': 0,
+            'coalesced': 0,
+            'probes': 0,
+            'total_call_ms': 0.0,
+            'max_call_ms': 0.0
+        }
+
+    # ---------- transport ----------
+
+    def _get_session(self):
+        # Pooled sockets must not be shared across a fork
+        if self._session is None or self._pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+            self._pid = os.getpid()
+        return self._session
+
+    def _call(self, message, sender_id):
+        """POST to the webhook; returns the combined text or None"""
+        self.metrics['calls'] += 1
+        started = time.perf_counter()
+        try:
+            response = self._get_session().post(
+                self.url, json={"sender": sender_id, "message": message}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            rasa_responses = response.json()
+        except requests.Timeout:
+            self.metrics['timeouts'] += 1
+            self._failed()
+            return None
+        except Exception as e:
+            log.error("❌ Rasa error: %s", e)
+            self._failed()
+            return None
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.metrics['total_call_ms'] += elapsed_ms
+            self.metrics['max_call_ms'] = max(self.metrics['max_call_ms'], round(elapsed_ms, 3))
+
+        self.metrics['successes'] += 1
+        self.breaker.record_success()
+        return self._combine(rasa_responses)
+
+    @staticmethod
+    def _combine(rasa_responses):
+        if rasa_responses:
+            return "\n\n".join([r.get('text', '') for r in rasa_responses if 'text' in r]) or None
+        return None
+
+    def _get_async_session(self):
+        import aiohttp
+        # A ClientSession belongs to the event loop it was created on
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            )
+        return self._async_session
+
+    async def _call_async(self, message, sender_id):
+        """_call() without holding a thread while Rasa works"""
+        self.metrics['calls'] += 1
+        started = time.perf_counter()
+        try:
+            async with self._get_async_session().post(
+                self.url, json={"sender": sender_id, "message": message}
+            ) as response:
+                response.raise_for_status()
+                rasa_responses = await response.json()
+        except asyncio.TimeoutError:
+            self.metrics['timeouts'] += 1
+            self._failed()
+            return None
+        except Exception as e:
+            log.error("❌ Rasa error: %s", e)
+            self._failed()
+            return None
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.metrics['total_call_ms'] += elapsed_ms
+            self.metrics['max_call_ms'] = max(self.metrics['max_call_ms'], round(elapsed_ms, 3))
+
+        self.metrics['successes'] += 1
+        self.breaker.record_success()
+        return self._combine(rasa_responses)
+
+    async def close_async(self):
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+
+    def _failed(self):
+        self.metrics['failures'] += 1
+        if self.breaker.record_failure():
+            self._start_probe()
+
+    # ---------- background probe ----------
+
+    def _start_probe(self):
+        with self._probe_lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive():
+                return
+            self._probe_thread = threading.Thread(target=self._probe_loop, name='rasa-probe', daemon=True)
+            self._probe_thread.start()
+
+    def _probe_loop(self):
+        while not self.breaker.allow():
+            time.sleep(self.probe_interval)
+            self.metrics['probes'] += 1
+            try:
+                response = self._get_session().get(self.probe_url, timeout=self.timeout)
+                if response.status_code < 500:
+                    self.breaker.record_success()
+            except Exception:
+                pass
+
+    # ---------- public API ----------
+
+    def respond(self, message, sender_id, intent=None):
+        """Rasa's reply to a message, or None if Rasa is skipped, busy or failing"""
+        self.metrics['requests'] += 1
+        cacheable = intent in self.cacheable_intents
+        normalized = normalize_message(message)
+
+        if cacheable:
+            cached = self.cache.get(normalized)
+            if cached is not None:
+                return cached
+
+        if not self.breaker.allow():
+            self.metrics['short_circuited'] += 1
+            if self._probe_thread is None or not self._probe_thread.is_alive():
+                self._start_probe()
+            return None
+
+        # Stateless answers are shared by everyone; otherwise only the same sender's duplicates
+        key = normalized if cacheable else (sender_id, normalized)
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            self.metrics['coalesced'] += 1
+            call.done.wait(sum(self.timeout))
+            return call.result
+
+        try:
+            if not self._slots.acquire(blocking=False):
+                self.metrics['rejected_busy'] += 1
+                return None
+            try:
+                call.result = self._call(message, sender_id)
+            finally:
+                self._slots.release()
+            if cacheable and call.result is not None:
+                self.cache.set(normalized, call.result)
+            return call.result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    async def respond_async(self, message, sender_id, intent=None):
+        """respond() for coroutines: same cache, breaker, concurrency cap and coalescing"""
+        self.metrics['requests'] += 1
+        cacheable = intent in self.cacheable_intents
+        normalized = normalize_message(message)
+
+        if cacheable:
+            cached = self.cache.get(normalized)
+            if cached is not None:
+                return cached
+
+        if not self.breaker.allow():
+            self.metrics['short_circuited'] += 1
+            if self._probe_thread is None or not self._probe_thread.is_alive():
+                self._start_probe()
+            return None
+
+        key = normalized if cacheable else (sender_id, normalized)
+        call = self._async_inflight.get(key)
+        if call is not None:
+            self.metrics['coalesced'] += 1
+            return await asyncio.shield(call)
+
+        if not self._slots.acquire(blocking=False):
+            self.metrics['rejected_busy'] += 1
+            return None
+        call = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            result = await self._call_async(message, sender_id)
+            if cacheable and result is not None:
+                self.cache.set(normalized, result)
+            return result
+        finally:
+            self._slots.release()
+            self._async_inflight.pop(key, None)
+            call.set_result(result)
+
+    def stats(self):
+        calls = self.metrics['calls']
+        return dict(
+            self.metrics,
+            total_call_ms=round(self.metrics['total_call_ms'], 3),
+            avg_call_ms=round(self.metrics['total_call_ms'] / calls, 3) if calls else 0.0,
+            breaker=self.breaker.stats(),
+            cache=self.cache.stats()
+        )
@@ -0,0 +1,216 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+
+from cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+CachedResponse = namedtuple('CachedResponse', ['response', 'intent', 'confidence'])
+
+# ==================== NORMALIZATION ====================
+
+# Devanagari vowel signs aren't \w, so the block is kept explicitly (minus the danda)
+PUNCTUATION = re.compile(r'[^\w\s\u0900-\u097F]|[_\u0964\u0965]')
+
+# Romanized Hindi is spelled many ways ("theek"/"thik", "bukhaar"/"bukhar",
+# "zukam"/"jukam"); these folds bring the variants onto one spelling
+HINGLISH_FOLDS = [
+    (re.compile(r'ee'), 'i'),
+    (re.compile(r'oo'), 'u'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'z'), 'j'),
+    (re.compile(r'(.)\1+'), r'\1'),  # doubled letters: "aa" -> "a", "kk" -> "k"
+]
+
+# Only these known romanized-Hindi spellings are folded: on English words the
+# folds would merge different questions ("sleep"/"slip", "feel"/"fill").
+# Spellings that are also English words ("door") are left out.
+HINGLISH_WORDS = [
+    # symptoms, body, care
+    'bukhaar', 'taap', 'zukam', 'zukaam', 'jukaam', 'zukhaam', 'jukhaam', 'zukham', 'khaansi',
+    'ghaav', 'ghaw', 'khoon', 'neend', 'peeth', 'thakaan', 'kamzori', 'chakkar', 'soojan', 'saans',
+    'aankh', 'daant', 'naak', 'haath', 'dimaag', 'tanaav', 'bhookh', 'pyaas', 'kharaab',
+    'dawa', 'dawai', 'davaai', 'dawaai', 'ilaaj', 'vyaayam', 'vyayaam',
+    # food
+    'khaana', 'paani', 'doodh', 'phal', 'sabzi', 'chaawal', 'chawal', 'daal',
+    # everyday words
+    'theek', 'hoon', 'kyoon', 'zyada', 'zyaada', 'jyaada', 'accha', 'achha', 'acchi', 'achhi',
+    'nahee', 'haan', 'aaj', 'raat', 'shaam', 'zaroor', 'jaroor', 'zarur', 'dhanyawad',
+]
+
+def _fold_latin(word):
+    for pattern, replacement in HINGLISH_FOLDS:
+        word = pattern.sub(replacement, word)
+    return word
+
+HINGLISH_SPELLINGS = {word: _fold_latin(word) for word in HINGLISH_WORDS}
+
+def _fold_devanagari(word):
+    # Nukta dropped, chandrabindu written as anusvara
+    return word.replace('\u093c', '').replace('\u0901', '\u0902')
+
+def normalize_query(text):
+    """Cache key for a message: case, whitespace and punctuation insensitive, Hindi spelling variants folded"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    words = []
+    for word in PUNCTUATION.sub(' ', text).split():
+        words.append(HINGLISH_SPELLINGS.get(word, word) if word.isascii() else _fold_devanagari(word))
+    return ' '.join(words)
+
+# ==================== RESPONSE CACHE ====================
+
+class ResponseCache:
+    """Memoizes chat answers by (normalized message, language)
+
+    A per-worker LRU+TTL tier sits in front of an optional SQLite file that all
+    workers share. Every entry carries the knowledge base generation it was
+    computed under, so a knowledge base edit makes older entries miss
+    everywhere without having to reach other workers.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600, disk_path=None):
+        self.memory = TTLCache(maxsize, ttl)
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self._local = threading.local()
+        self._disk_ready = False
+        self._writes = 0
+
+        self.metrics = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'stores': 0,
+            'invalidations': 0,
+            'disk_errors': 0,
+            'hit_turns': 0,
+            'hit_turn_ms': 0.0,
+            'miss_turns': 0,
+            'miss_turn_ms': 0.0
+        }
+
+    @staticmethod
+    def key(message, language):
+        return f"{language or ''}|{normalize_query(message)}"
+
+    # ---------- disk tier ----------
+
+    def _disk(self):
+        """One connection per thread (and per process, connections don't survive fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.disk_path, timeout=1.0, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if not self._disk_ready:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS response_cache ('
+                'key TEXT PRIMARY KEY, generation TEXT NOT NULL, response TEXT NOT NULL, '
+                'intent TEXT, confidence REAL, expires_at REAL NOT NULL)'
+            )
+            self._disk_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _disk_get(self, key, generation):
+        row = self._disk().execute(
+            'SELECT response, intent, confidence, expires_at FROM response_cache WHERE key = ? AND generation = ?',
+            (key, generation)
+        ).fetchone()
+        if row is None or row[3] <= time.time():
+            return None
+        return CachedResponse(row[0], row[1], row[2]), row[3]
+
+    def _disk_set(self, key, generation, value):
+        conn = self._disk()
+        conn.execute(
+            'INSERT OR REPLACE INTO response_cache (key, generation, response, intent, confidence, expires_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, generation, value.response, value.intent, value.confidence, time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            conn.execute('DELETE FROM response_cache WHERE expires_at <= ?', (time.time(),))
+
+    # ---------- public API ----------
+
+    def get(self, key, generation):
+        """CachedResponse for a key computed under this knowledge base generation, else None"""
+        generation = str(generation)
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[0] == generation:
+                self.metrics['memory_hits'] += 1
+                return entry[1]
+            self.metrics['stale'] += 1
+            self.memory.pop(key)
+
+        if self.disk_path:
+            try:
+                found = self._disk_get(key, generation)
+            except sqlite3.Error as e:
+                self.metrics['disk_errors'] += 1
+                log.warning("⚠️ Response cache disk error: %s", e)
+                found = None
+            if found is not None:
+                value, expires_at = found
+                self.metrics['disk_hits'] += 1
+                self.memory.set(key, (generation, value), min(self.memory.ttl, expires_at - time.time()))
+                return value
+
+        self.metrics['misses'] += 1
+        return None
+
+    def set(self, key, generation, response, intent, confidence):
+        generation = str(generation)
+        value = CachedResponse(response, intent, confidence)
+        self.memory.set(key, (generation, value))
+        self.metrics['stores'] += 1
+        if self.disk_path:
+            try:
+                self._disk_set(key, generation, value)
+            except sqlite3.Error as e:
+                self.metrics['disk_errors'] += 1
+                log.warning("⚠️ Response cache disk error: %s", e)
+
+    def invalidate(self):
+        """Drop everything (knowledge base edited on this worker)"""
+        self.memory.clear()
+        self.metrics['invalidations'] += 1
+        if self.disk_path:
+            try:
+                self._disk().execute('DELETE FROM response_cache')
+            except sqlite3.Error as e:
+                self.metrics['disk_errors'] += 1
+                log.warning("⚠️ Response cache disk error: %s", e)
+
+    def record_turn(self, hit, seconds):
+        """Chat turn latency, split by cache hit/miss"""
+        kind = 'hit' if hit else 'miss'
+        self.metrics[f'{kind}_turns'] += 1
+        self.metrics[f'{kind}_turn_ms'] += seconds * 1000
+
+    def stats(self):
+        hits = self.metrics['memory_hits'] + self.metrics['disk_hits']
+        lookups = hits + self.metrics['misses']
+        hit_turns, miss_turns = self.metrics['hit_turns'], self.metrics['miss_turns']
+        return dict(
+            self.metrics,
+            hit_turn_ms=round(self.metrics['hit_turn_ms'], 3),
+            miss_turn_ms=round(self.metrics['miss_turn_ms'], 3),
+            hit_ratio=round(hits / lookups, 4) if lookups else 0.0,
+            avg_hit_turn_ms=round(self.metrics['hit_turn_ms'] / hit_turns, 3) if hit_turns else 0.0,
+            avg_miss_turn_ms=round(self.metrics['miss_turn_ms'] / miss_turns, 3) if miss_turns else 0.0,
+            disk_enabled=bool(self.disk_path),
+            memory=self.memory.stats()
+        )
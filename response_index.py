@@ -0,0 +1,194 @@
+import sys
+import threading
+import time
+
+# ==================== BUILT-IN RESPONSES ====================
+
+# Default answers per intent and language. Active HealthKnowledgeBase rows whose
+# category matches an intent override or extend these at load time.
+BUILTIN_RESPONSES = {
+    'headache': {
+        'en': """For mild headaches:
+- Rest in a quiet, dark room
+- Drink plenty of water (dehydration causes headaches)
+- Apply cold compress to forehead
+- Take over-the-counter pain relievers if needed
+- Avoid screens and bright lights
+
+⚠️ Seek medical help if:
+- Headache is sudden and severe
+- Persists for more than 3 days
+- Accompanied by fever, stiff neck, or vision changes
+
+⚠️ Medical Disclaimer: This is general information only. Always consult a healthcare professional for medical advice.""",
+        'hi': """हल्के सिरदर्द के लिए:
+- शांत, अंधेरे कमरे में आराम करें
+- भरपूर पानी पिएं (निर्जलीकरण से सिरदर्द होता है)
+- माथे पर ठंडा सेक करें
+- यदि आवश्यक हो तो दर्द निवारक लें
+- स्क्रीन और तेज रोशनी से बचें
+
+⚠️ चिकित्सा सहायता लें यदि:
+- सिरदर्द अचानक और गंभीर है
+- 3 दिनों से अधिक समय तक बना रहता है
+- बुखार, गर्दन में अकड़न या दृष्टि परिवर्तन के साथ
+
+⚠️ चिकित्सा अस्वीकरण: यह केवल सामान्य जानकारी है। चिकित्सा सलाह के लिए हमेशा स्वास्थ्य पेशेवर से परामर्श करें。"""
+    },
+    'fever': {
+        'en': """Managing mild fever (below 102°F/38.9°C):
+
+✅ Do:
+- Rest and stay hydrated
+- Drink plenty of water, juice, or soup
+- Take lukewarm bath (not cold)
+- Wear light clothing
+- Monitor temperature regularly
+
+⚠️ Seek immediate help if:
+- Fever above 103°F (39.4°C)
+- Lasts more than 3 days
+- Accompanied by severe symptoms
+
+⚠️ Medical Disclaimer: This is general information only. Consult a healthcare professional.""",
+        'hi': """हल्के बुखार का प्रबंधन (102°F/38.9°C से नीचे):
+
+✅ करें:
+- आराम करें और हाइड्रेटेड रहें
+- भरपूर पानी, जूस या सूप पिएं
+- गुनगुना स्नान करें (ठंडा नहीं)
+- हल्के कपड़े पहनें
+- नियमित रूप से तापमान की निगरानी करें
+
+⚠️ तत्काल सहायता लें यदि:
+- बुखार 103°F (39.4°C) से ऊपर
+- 3 दिनों से अधिक समय तक रहता है
+- गंभीर लक्षणों के साथ
+
+⚠️ चिकित्सा अस्वीकरण: यह केवल सामान्य जानकारी है। स्वास्थ्य पेशेवर से परामर्श करें।"""
+    },
+    'general': {
+        'en': """I'm here to help with general health information. You can ask me about:
+- Common symptoms (headache, fever, cold)
+- First aid basics
+- Exercise and wellness tips
+- Healthy eating habits
+
+⚠️ For serious health concerns, please consult a healthcare professional immediately.
+
+What would you like to know?""",
+        'hi': """मैं सामान्य स्वास्थ्य जानकारी में मदद के लिए यहां हूं। आप मुझसे पूछ सकते हैं:
+- सामान्य लक्षण (सिरदर्द, बुखार, सर्दी)
+- प्राथमिक चिकित्सा मूल बातें
+- व्यायाम और स्वास्थ्य सुझाव
+- स्वस्थ खान-पान की आदतें
+
+⚠️ गंभीर स्वास्थ्य समस्याओं के लिए, कृपया तुरंत स्वास्थ्य पेशेवर से परामर्श करें।
+
+आप क्या जानना चाहेंगे?"""
+    }
+}
+
+
+# ==================== RESPONSE INDEX ====================
+
+class ResponseIndex:
+    """In-process (intent, language) -> response table, rebuilt off the request path and swapped atomically"""
+
+    def __init__(self, builtin, default_intent='general', default_language='en', refresh_seconds=30):
+        self.builtin = builtin
+        self.default_intent = default_intent
+        self.default_language = default_language
+        self.refresh_seconds = refresh_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.version = None
+        self.loaded_at = None
+
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._table = self._build(())
+
+    def _build(self, entries):
+        """Compile built-in texts plus (category, language, content) entries into a lookup table"""
+        sources = {intent: dict(texts) for intent, texts in self.builtin.items()}
+        # Entries arrive oldest first, so the most recently updated row wins
+        for category, language, content in entries:
+            sources.setdefault(category, {})[language or self.default_language] = content
+
+        fallback = sources[self.default_intent]
+        languages = set()
+        for texts in sources.values():
+            languages.update(texts)
+
+        table = {}
+        for intent, texts in sources.items():
+            row = {}
+            for language in languages:
+                if language in texts:
+                    row[language] = (sys.intern(texts[language]), True)
+                    continue
+                # Resolve fallbacks now so a lookup never has to: same intent in the
+                # default language, then the general answer in the requested language
+                text = texts.get(self.default_language) or fallback.get(language) or fallback[self.default_language]
+                row[language] = (sys.intern(text), False)
+            table[intent] = row
+        return table
+
+    def lookup(self, intent, language):
+        """Return the response text for (intent, language), falling back to the general answer"""
+        table = self._table
+        row = table.get(intent)
+        if row is None:
+            row = table[self.default_intent]
+            self.misses += 1
+            text, _ = row.get(language) or row[self.default_language]
+            return text
+
+        text, exact = row.get(language) or row[self.default_language]
+        if exact:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return text
+
+    def reload(self, entries, version=None):
+        """Rebuild from knowledge base entries and swap the table in one assignment"""
+        table = self._build(entries)
+        with self._lock:
+            self._table = table
+            self.version = version
+            self.loaded_at = time.time()
+            self.reloads += 1
+            self._next_check = time.monotonic() + self.refresh_seconds
+
+    def maybe_reload(self, version_fn, entries_fn):
+        """Reload when the knowledge base version changed, checking at most every refresh_seconds"""
+        if time.monotonic() < self._next_check:
+            return False
+        if not self._lock.acquire(blocking=False):
+            # Another thread is already checking; keep serving the current table
+            return False
+        try:
+            self._next_check = time.monotonic() + self.refresh_seconds
+            version = version_fn()
+            if version == self.version:
+                return False
+        finally:
+            self._lock.release()
+        self.reload(entries_fn(), version)
+        return True
+
+    def stats(self):
+        """Counters for the admin cache stats endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+            'reloads': self.reloads,
+            'intents': len(self._table),
+            'loaded_at': self.loaded_at
+        }
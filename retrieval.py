@@ -0,0 +1,382 @@
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from heapq import heappush, heapreplace
+
+log = logging.getLogger(__name__)
+
+# ==================== TOKENIZATION ====================
+
+# Latin letters/digits for English, the Devanagari block minus the danda
+# punctuation (U+0964/U+0965) for Hindi and romanized Hindi
+TOKEN_PATTERN = re.compile(r'[0-9a-z\u0900-\u0963\u0966-\u097F]+')
+
+STOPWORDS = {
+    'en': {
+        'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'for', 'from', 'have', 'how',
+        'i', 'if', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'should', 'so', 'that', 'the',
+        'this', 'to', 'was', 'what', 'when', 'with', 'you', 'your'
+    },
+    'hi': {
+        'का', 'की', 'के', 'को', 'है', 'हैं', 'में', 'से', 'और', 'या', 'पर', 'यह', 'वह', 'मुझे',
+        'मैं', 'क्या', 'कैसे', 'लिए', 'हो', 'तो', 'भी', 'ka', 'ki', 'ke', 'ko', 'hai', 'mein', 'se',
+        'aur', 'kya', 'kaise', 'mujhe'
+    }
+}
+
+def _stem_en(token):
+    """Very light suffix stripping so 'headaches'/'headache' share a term"""
+    if len(token) > 4:
+        if token.endswith('ies'):
+            return token[:-3] + 'y'
+        if token.endswith('ing'):
+            return token[:-3]
+        if token.endswith('ed'):
+            return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokenize(text, language='en'):
+    """Lowercase, split and drop stopwords; English tokens are lightly stemmed"""
+    stopwords = STOPWORDS.get(language, STOPWORDS['en'])
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in stopwords:
+            continue
+        if language == 'en':
+            token = _stem_en(token)
+        tokens.append(token)
+    return tokens
+
+# ==================== INVERTED INDEX ====================
+
+SearchHit = namedtuple('SearchHit', ['doc_id', 'score', 'category', 'title'])
+
+INDEX_FORMAT_VERSION = 2
+
+class _LanguageIndex:
+    """Postings, document lengths and metadata for one language"""
+
+    def __init__(self):
+        self.postings = {}      # term -> {doc_id: term frequency}
+        self.doc_len = {}       # doc_id -> number of indexed tokens
+        self.doc_terms = {}     # doc_id -> tuple of distinct terms (needed for removal)
+        self.doc_meta = {}      # doc_id -> (category, title)
+        self.total_len = 0
+        self.impacts = {}       # term -> [(tf component, doc_id)] sorted best first, built on demand
+        self.impact_avgdl = None
+
+    def add(self, doc_id, terms, meta):
+        frequencies = Counter(terms)
+        for term, tf in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+            self.impacts.pop(term, None)
+        self.doc_len[doc_id] = len(terms)
+        self.doc_terms[doc_id] = tuple(frequencies)
+        self.doc_meta[doc_id] = meta
+        self.total_len += len(terms)
+
+    def remove(self, doc_id):
+        for term in self.doc_terms.pop(doc_id, ()):
+            self.impacts.pop(term, None)
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id, 0)
+        self.doc_meta.pop(doc_id, None)
+
+
+class RetrievalIndex:
+    """BM25 search over knowledge base entries with incremental updates and on-disk persistence"""
+
+    def __init__(self, path=None, languages=('en', 'hi'), k1=1.2, b=0.75, title_boost=2, refresh_seconds=30):
+        self.path = path
+        self.languages = tuple(languages)
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self.refresh_seconds = refresh_seconds
+
+        self._indexes = {language: _LanguageIndex() for language in self.languages}
+        self._doc_language = {}     # doc_id -> language it is indexed under
+        self._fingerprints = {}     # doc_id -> updated_at string at indexing time
+        self._lock = threading.RLock()
+        self._next_check = 0.0
+        self.version = None
+        self.dirty = False
+
+    # ---------- documents ----------
+
+    def _language_for(self, language):
+        return language if language in self._indexes else self.languages[0]
+
+    def _document_terms(self, language, title, content, tags):
+        terms = tokenize(title or '', language) * self.title_boost
+        terms += tokenize(content or '', language)
+        if tags:
+            if isinstance(tags, str):
+                try:
+                    tags = json.loads(tags)
+                except ValueError:
+                    tags = [tags]
+            terms += tokenize(' '.join(str(tag) for tag in tags), language)
+        return terms
+
+    def upsert(self, doc_id, language, category, title, content, tags=None, updated_at=None, is_active=True):
+        """Index or re-index one entry; inactive entries are removed"""
+        with self._lock:
+            self.remove(doc_id)
+            if not is_active:
+                return
+            language = self._language_for(language)
+            terms = self._document_terms(language, title, content, tags)
+            self._indexes[language].add(doc_id, terms, (category, title))
+            self._doc_language[doc_id] = language
+            self._fingerprints[doc_id] = str(updated_at)
+            self.dirty = True
+
+    def remove(self, doc_id):
+        """Drop an entry from the index if present"""
+        with self._lock:
+            language = self._doc_language.pop(doc_id, None)
+            if language is None:
+                return
+            self._indexes[language].remove(doc_id)
+            self._fingerprints.pop(doc_id, None)
+            self.dirty = True
+
+    def sync(self, fingerprints, fetch_rows):
+        """Bring the index in line with the database, only re-tokenizing rows that changed
+
+        fingerprints: iterable of (id, updated_at, is_active) for every row
+        fetch_rows: callable taking a list of ids and returning full rows with
+                    id, language, category, title, content, tags, updated_at, is_active
+        """
+        with self._lock:
+            live = {}
+            for doc_id, updated_at, is_active in fingerprints:
+                if is_active:
+                    live[doc_id] = str(updated_at)
+
+            for doc_id in [doc_id for doc_id in self._fingerprints if doc_id not in live]:
+                self.remove(doc_id)
+
+            changed = [doc_id for doc_id, stamp in live.items() if self._fingerprints.get(doc_id) != stamp]
+            for start in range(0, len(changed), 500):
+                for row in fetch_rows(changed[start:start + 500]):
+                    self.upsert(row.id, row.language, row.category, row.title, row.content,
+                                row.tags, row.updated_at, row.is_active)
+            return len(changed)
+
+    def maybe_sync(self, version_fn, fingerprints_fn, fetch_rows):
+        """Sync when the knowledge base version changed, checking at most every refresh_seconds"""
+        if time.monotonic() < self._next_check:
+            return False
+        with self._lock:
+            self._next_check = time.monotonic() + self.refresh_seconds
+            version = version_fn()
+            if version == self.version:
+                return False
+            self.sync(fingerprints_fn(), fetch_rows)
+            self.version = version
+            if self.dirty:
+                self.save()
+            return True
+
+    # ---------- search ----------
+
+    def _impact_list(self, index, term, avgdl):
+        """Postings for a term sorted by their BM25 term-frequency component, best first"""
+        if index.impact_avgdl is None or abs(avgdl / index.impact_avgdl - 1) > 0.05:
+            # Lists are ordered for one avgdl; rebuild them once it has drifted noticeably
+            index.impacts.clear()
+            index.impact_avgdl = avgdl
+
+        impacts = index.impacts.get(term)
+        if impacts is None:
+            k1, b, doc_len, base = self.k1, self.b, index.doc_len, index.impact_avgdl
+            impacts = sorted(
+                ((tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len[doc_id] / base)), doc_id)
+                 for doc_id, tf in index.postings[term].items()),
+                reverse=True
+            )
+            index.impacts[term] = impacts
+        return impacts
+
+    def search(self, query, language='en', k=5, min_terms=1, min_score=0.0):
+        """Top-k BM25 hits for a query as SearchHit tuples, best first
+
+        min_terms: distinct query terms a document must contain to be returned
+        min_score: BM25 score a document must reach to be returned
+        """
+        language = self._language_for(language)
+        terms = set(tokenize(query, language))
+        if not terms:
+            return []
+
+        with self._lock:
+            index = self._indexes[language]
+            n_docs = len(index.doc_len)
+            if not n_docs:
+                return []
+
+            avgdl = index.total_len / n_docs
+            k1, b = self.k1, self.b
+            doc_len = index.doc_len
+
+            lists = []
+            for term in terms:
+                docs = index.postings.get(term)
+                if docs:
+                    df = len(docs)
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    lists.append((idf, docs, self._impact_list(index, term, avgdl)))
+            if len(lists) < min_terms:
+                return []
+
+            # Cached impacts were computed for impact_avgdl. A larger avgdl can only
+            # raise a component, by at most this ratio, so scaling keeps the bound safe.
+            bound_scale = max(1.0, avgdl / index.impact_avgdl)
+
+            # Threshold algorithm: walk the impact-ordered lists in parallel, score
+            # each newly seen document exactly, and stop once the k-th best score
+            # beats the best any unseen document could still reach.
+            top = []
+            seen = set()
+            depth = 0
+            while True:
+                threshold = 0.0
+                advanced = False
+                for idf, _, impacts in lists:
+                    if depth >= len(impacts):
+                        continue
+                    advanced = True
+                    impact, doc_id = impacts[depth]
+                    threshold += idf * impact * bound_scale
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+
+                    norm = k1 * (1 - b + b * doc_len[doc_id] / avgdl)
+                    score = 0.0
+                    matched = 0
+                    for term_idf, docs, _ in lists:
+                        tf = docs.get(doc_id)
+                        if tf:
+                            score += term_idf * tf * (k1 + 1) / (tf + norm)
+                            matched += 1
+                    if matched < min_terms or score < min_score:
+                        continue
+                    if len(top) < k:
+                        heappush(top, (score, doc_id))
+                    elif score > top[0][0]:
+                        heapreplace(top, (score, doc_id))
+
+                depth += 1
+                if not advanced or threshold < min_score:
+                    break
+                if len(top) >= k and top[0][0] >= threshold:
+                    break
+
+            return [
+                SearchHit(doc_id, round(score, 4), *index.doc_meta[doc_id])
+                for score, doc_id in sorted(top, reverse=True)
+            ]
+
+    # ---------- persistence ----------
+
+    def save(self):
+        """Write the index next to the database as JSON (atomic replace)"""
+        if not self.path:
+            return
+        with self._lock:
+            state = {
+                'format': INDEX_FORMAT_VERSION,
+                'params': [self.k1, self.b, self.title_boost],
+                'indexes': {
+                    language: {
+                        'postings': {term: list(docs.items()) for term, docs in index.postings.items()},
+                        'documents': [
+                            [doc_id, index.doc_len[doc_id], self._fingerprints[doc_id], *index.doc_meta[doc_id]]
+                            for doc_id in index.doc_len
+                        ]
+                    }
+                    for language, index in self._indexes.items()
+                }
+            }
+            # A temp file of our own: preforked workers may save at the same time
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                            prefix=os.path.basename(self.path) + '.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                    json.dump(state, fh, ensure_ascii=False, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self.dirty = False
+
+    def load(self):
+        """Load a previously saved index; returns False if missing, unreadable or built with other settings"""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                state = json.load(fh)
+            if state.get('format') != INDEX_FORMAT_VERSION or state.get('params') != [self.k1, self.b, self.title_boost]:
+                return False
+            indexes, doc_language, fingerprints = self._decode_indexes(state['indexes'])
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            log.warning("⚠️ Knowledge index unreadable, rebuilding: %s", e)
+            return False
+
+        with self._lock:
+            self._indexes.update(indexes)
+            self._doc_language = doc_language
+            self._fingerprints = fingerprints
+            self.dirty = False
+        return True
+
+    def _decode_indexes(self, saved):
+        """Rebuild per-language indexes from the saved postings and document rows"""
+        indexes = {}
+        doc_language = {}
+        fingerprints = {}
+        for language, data in saved.items():
+            if language not in self._indexes:
+                continue
+            index = _LanguageIndex()
+            for term, docs in data['postings'].items():
+                index.postings[term] = {int(doc_id): int(tf) for doc_id, tf in docs}
+            doc_terms = {}
+            for term, docs in index.postings.items():
+                for doc_id in docs:
+                    doc_terms.setdefault(doc_id, []).append(term)
+            for doc_id, length, fingerprint, category, title in data['documents']:
+                doc_id = int(doc_id)
+                index.doc_len[doc_id] = int(length)
+                index.doc_terms[doc_id] = tuple(doc_terms.get(doc_id, ()))
+                index.doc_meta[doc_id] = (category, title)
+                index.total_len += index.doc_len[doc_id]
+                doc_language[doc_id] = language
+                fingerprints[doc_id] = fingerprint
+            if set(doc_terms) - set(index.doc_len):
+                raise ValueError("postings refer to unknown documents")
+            indexes[language] = index
+        return indexes, doc_language, fingerprints
+
+    def stats(self):
+        """Document and term counts per language"""
+        return {
+            language: {'documents': len(index.doc_len), 'terms': len(index.postings)}
+            for language, index in self._indexes.items()
+        }
@@ -0,0 +1,280 @@
+import datetime
+from collections import Counter
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+# ==================== ANALYTICS ROLLUPS ====================
+
+def _dialect_name(executor):
+    """Dialect of a Session or Connection"""
+    if hasattr(executor, 'dialect'):
+        return executor.dialect.name
+    return executor.get_bind().dialect.name
+
+def _as_date(value):
+    # func.date() comes back as 'YYYY-MM-DD' on SQLite and as a date on PostgreSQL
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+class Rollups:
+    """Incrementally maintained summary tables behind the admin dashboard
+
+    Chat, feedback, sign-up and sign-in writes add their deltas in the same
+    transaction as the rows they describe. Rows that existed before the
+    rollups were introduced are folded in once by backfill(), which walks
+    each source table by id up to a high-water mark recorded at install time.
+    """
+
+    def __init__(self, daily_model, counter_model, active_user_model, watermark_model, sources):
+        self.daily = daily_model.__table__
+        self.counters = counter_model.__table__
+        self.active_users = active_user_model.__table__
+        self.watermarks = watermark_model.__table__
+        # {'messages': Message, 'conversations': Conversation, 'feedback': Feedback, 'users': User}
+        self.sources = sources
+
+    # ---------- upserts ----------
+
+    def _add(self, executor, table, key_columns, value_column, deltas):
+        """Add deltas to counter rows, inserting rows that don't exist yet"""
+        if not deltas:
+            return
+        params = [dict(zip(key_columns, key), **{value_column: amount}) for key, amount in deltas.items()]
+        dialect = _dialect_name(executor)
+
+        if dialect in ('sqlite', 'postgresql'):
+            insert = (sqlite if dialect == 'sqlite' else postgresql).insert(table)
+            stmt = insert.on_conflict_do_update(
+                index_elements=key_columns,
+                set_={value_column: table.c[value_column] + insert.excluded[value_column]}
+            )
+            executor.execute(stmt, params)
+            return
+
+        for row in params:
+            where = [table.c[column] == row[column] for column in key_columns]
+            updated = executor.execute(
+                table.update().where(*where).values({value_column: table.c[value_column] + row[value_column]})
+            ).rowcount
+            if not updated:
+                executor.execute(table.insert().values(**row))
+
+    def add(self, executor, daily=None, counters=None):
+        """Apply {(day, metric, key): n} daily deltas and {name: n} counter deltas"""
+        self._add(executor, self.daily, ['day', 'metric', 'key'], 'count', daily)
+        self._add(executor, self.counters, ['name'], 'value', {(name,): n for name, n in (counters or {}).items()})
+
+    def _mark_active(self, executor, rows):
+        """Record (day, user_id) pairs, ignoring ones already present"""
+        if not rows:
+            return
+        dialect = _dialect_name(executor)
+        if dialect in ('sqlite', 'postgresql'):
+            insert = (sqlite if dialect == 'sqlite' else postgresql).insert(self.active_users)
+            executor.execute(insert.on_conflict_do_nothing(), rows)
+            return
+        for row in rows:
+            exists = executor.execute(
+                select(self.active_users.c.user_id)
+                .where(self.active_users.c.day == row['day'], self.active_users.c.user_id == row['user_id'])
+            ).first()
+            if not exists:
+                executor.execute(self.active_users.insert().values(**row))
+
+    # ---------- write hooks ----------
+
+    def record_messages(self, executor, messages, new_conversations=0):
+        """messages: iterable of (timestamp, sender, intent)"""
+        daily = Counter()
+        counters = Counter()
+        for timestamp, sender, intent in messages:
+            day = _as_date(timestamp)
+            counters['messages'] += 1
+            if sender == 'user':
+                daily[(day, 'queries', '')] += 1
+                counters['queries'] += 1
+            if intent is not None:
+                daily[(day, 'intent', intent)] += 1
+        if new_conversations:
+            counters['conversations'] += new_conversations
+        self.add(executor, daily, counters)
+
+    def record_feedback(self, executor, rating, created_at):
+        rating = rating or 'unrated'
+        self.add(
+            executor,
+            daily={(_as_date(created_at), 'feedback', rating): 1},
+            counters={'feedback': 1, f'feedback:{rating}': 1}
+        )
+
+    def record_new_user(self, executor):
+        self.add(executor, counters={'users': 1})
+
+    def record_sign_in(self, executor, user_id, when):
+        self.record_sign_ins(executor, [(user_id, when)])
+
+    def record_sign_ins(self, executor, sign_ins):
+        """sign_ins: iterable of (user_id, when)"""
+        self._mark_active(executor, [{'day': _as_date(when), 'user_id': user_id} for user_id, when in sign_ins])
+
+    # ---------- catch-up ----------
+
+    def install_watermarks(self, session):
+        """Pin the id boundary below which rows predate the rollups (first run only)"""
+        existing = {row.source for row in session.execute(select(self.watermarks.c.source))}
+        try:
+            for source, model in self.sources.items():
+                if source in existing:
+                    continue
+                boundary = session.execute(select(func.max(model.id))).scalar() or 0
+                session.execute(self.watermarks.insert().values(source=source, last_id=0, boundary_id=boundary))
+            session.commit()
+        except IntegrityError:
+            # A node starting at the same time installed them first
+            session.rollback()
+
+    def backfill(self, session, chunk_size=50000):
+        """Fold pre-existing rows into the rollups, resuming from each source's high-water mark"""
+        self.install_watermarks(session)
+        watermarks = self.watermarks
+        processed = 0
+        for source in session.execute(select(watermarks.c.source)).scalars().all():
+            while True:
+                last_id, boundary_id = session.execute(
+                    select(watermarks.c.last_id, watermarks.c.boundary_id).where(watermarks.c.source == source)
+                ).one()
+                session.commit()
+                if last_id >= boundary_id:
+                    break
+                upto = min(last_id + chunk_size, boundary_id)
+
+                # Claim the chunk before counting it: the update locks the watermark row
+                # (the whole database on SQLite), so a node backfilling at the same time
+                # waits, then matches no row and re-reads the watermark instead of
+                # counting the same chunk again
+                claimed = session.execute(
+                    watermarks.update()
+                    .where(watermarks.c.source == source, watermarks.c.last_id == last_id)
+                    .values(last_id=upto)
+                ).rowcount
+                if not claimed:
+                    session.rollback()
+                    continue
+                self._backfill_chunk(session, source, last_id, upto)
+                # Each chunk commits together with its watermark, so an interrupted backfill resumes cleanly
+                session.commit()
+                processed += upto - last_id
+        return processed
+
+    def _backfill_chunk(self, session, source, low, high):
+        model = self.sources[source]
+        in_range = (model.id > low, model.id <= high)
+        daily = Counter()
+        counters = Counter()
+
+        if source == 'messages':
+            rows = session.execute(
+                select(func.date(model.timestamp), model.sender, model.intent, func.count(model.id))
+                .where(*in_range)
+                .group_by(func.date(model.timestamp), model.sender, model.intent)
+            ).all()
+            for day, sender, intent, count in rows:
+                day = _as_date(day)
+                counters['messages'] += count
+                if sender == 'user':
+                    daily[(day, 'queries', '')] += count
+                    counters['queries'] += count
+                if intent is not None:
+                    daily[(day, 'intent', intent)] += count
+
+        elif source == 'feedback':
+            rows = session.execute(
+                select(func.date(model.created_at), model.rating, func.count(model.id))
+                .where(*in_range)
+                .group_by(func.date(model.created_at), model.rating)
+            ).all()
+            for day, rating, count in rows:
+                rating = rating or 'unrated'
+                daily[(_as_date(day), 'feedback', rating)] += count
+                counters['feedback'] += count
+                counters[f'feedback:{rating}'] += count
+
+        elif source == 'users':
+            counters['users'] += session.execute(select(func.count(model.id)).where(*in_range)).scalar()
+            # Historical sign-ins are only known through last_login
+            self._mark_active(session, [
+                {'day': _as_date(last_login), 'user_id': user_id}
+                for user_id, last_login in session.execute(
+                    select(model.id, model.last_login).where(*in_range, model.last_login.isnot(None))
+                )
+            ])
+
+        elif source == 'conversations':
+            counters['conversations'] += session.execute(select(func.count(model.id)).where(*in_range)).scalar()
+
+        self.add(session, daily, counters)
+
+    # ---------- reads ----------
+
+    def version(self, session, now=None):
+        """Cheap token that changes whenever a dashboard number can have changed"""
+        today = (now or datetime.datetime.utcnow()).date()
+        counters = tuple(session.execute(
+            select(self.counters.c.name, self.counters.c.value).order_by(self.counters.c.name)
+        ).all())
+        signed_in_today = session.execute(
+            select(func.count()).select_from(self.active_users).where(self.active_users.c.day == today)
+        ).scalar()
+        return counters, today, signed_in_today
+
+    def counter_values(self, session):
+        """{counter name: value}, e.g. running row totals per table"""
+        return dict(session.execute(select(self.counters.c.name, self.counters.c.value)).all())
+
+    def dashboard(self, session, now=None):
+        """Dashboard numbers from the summary tables: O(days x intents), not O(messages)"""
+        now = now or datetime.datetime.utcnow()
+        today = now.date()
+
+        counters = self.counter_values(session)
+
+        active_users = session.execute(
+            select(func.count(func.distinct(self.active_users.c.user_id)))
+            .where(self.active_users.c.day >= today - datetime.timedelta(days=30))
+        ).scalar()
+
+        query_trends = session.execute(
+            select(self.daily.c.day, self.daily.c.count)
+            .where(self.daily.c.metric == 'queries', self.daily.c.day >= today - datetime.timedelta(days=7))
+            .order_by(self.daily.c.day)
+        ).all()
+
+        intent_total = func.sum(self.daily.c.count).label('count')
+        top_intents = session.execute(
+            select(self.daily.c.key, intent_total)
+            .where(self.daily.c.metric == 'intent')
+            .group_by(self.daily.c.key)
+            .order_by(desc(intent_total))
+            .limit(5)
+        ).all()
+
+        total_feedback = counters.get('feedback', 0)
+        positive_feedback = counters.get('feedback:positive', 0)
+
+        return {
+            'total_users': counters.get('users', 0),
+            'active_users': active_users,
+            'total_queries': counters.get('queries', 0),
+            'total_conversations': counters.get('conversations', 0),
+            'positive_feedback_percentage': round((positive_feedback / total_feedback * 100), 2) if total_feedback > 0 else 0,
+            'positive_feedback_count': positive_feedback,
+            'total_feedback_count': total_feedback,
+            'query_trends': [{'date': str(row.day), 'count': row.count} for row in query_trends],
+            'top_intents': [{'intent': row.key or 'general', 'count': row.count} for row in top_intents]
+        }
@@ -0,0 +1,96 @@
+import logging
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import Select
+
+log = logging.getLogger(__name__)
+
+# ==================== ENGINES ====================
+
+def normalize_url(url):
+    """Database URL as SQLAlchemy expects it (hosting platforms still hand out postgres://)"""
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800,
+                   statement_timeout_ms=0, application_name='wellbot'):
+    """create_engine() keyword arguments tuned for the backend the URL points at
+
+    SQLite files get a QueuePool instead of SQLAlchemy 1.4's NullPool, so a
+    request reuses a connection (and its pragmas and page cache) instead of
+    opening the file again; overflow stays unbounded as before, SQLite
+    needs no connection cap. In-memory databases keep Flask-SQLAlchemy's
+    defaults. Server databases get a bounded pool whose connections are
+    pinged before use and recycled, so a database failover or an idle
+    timeout on a proxy doesn't surface as a request error. On PostgreSQL
+    every session also carries a statement timeout and an application name.
+    """
+    parsed = make_url(normalize_url(url))
+    backend = parsed.get_backend_name()
+
+    if backend == 'sqlite':
+        if parsed.database in (None, '', ':memory:'):
+            return {}
+        return {
+            'poolclass': QueuePool,
+            'pool_size': pool_size,
+            'max_overflow': -1,
+            # A pooled connection moves between request threads, never used by two at once
+            'connect_args': {'check_same_thread': False}
+        }
+
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': True
+    }
+    if backend == 'postgresql':
+        server_options = f"-c statement_timeout={int(statement_timeout_ms)}" if statement_timeout_ms else ''
+        options['connect_args'] = {'application_name': application_name, 'options': server_options}
+    return options
+
+def dispose_engines(db):
+    """Close every pooled connection of every bind (call with an app context, e.g. after fork)"""
+    for engine in db.engines.values():
+        engine.dispose()
+
+# ==================== READ REPLICA ====================
+
+REPLICA_BIND = 'replica'
+
+class RoutingSession(Session):
+    """Session that sends the reads of @read_replica routes to the 'replica' bind
+
+    Only plain SELECTs are routed; flushes, INSERT/UPDATE/DELETE and
+    SELECT ... FOR UPDATE stay on the primary. Without a replica bind
+    configured everything goes to the primary, so marking a route is free.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and isinstance(clause, Select) and clause._for_update_arg is None
+                and has_app_context() and g.get('read_replica')):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def read_replica(f):
+    """Serve this route's reads from the read replica; for admin analytics that tolerate replication lag
+
+    Goes below @token_required so the user lookup still reads the primary.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.read_replica = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.read_replica = False
+    return decorated
@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Config reads the environment when it is first imported: point every file the
+# app writes at a scratch directory before any test imports it
+SCRATCH = tempfile.mkdtemp(prefix='wellbot-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(SCRATCH, 'wellbot.db')
+os.environ['INTENT_MODEL_PATH'] = os.path.join(SCRATCH, 'wellbot_intents')
+os.environ['KNOWLEDGE_INDEX_PATH'] = os.path.join(SCRATCH, 'wellbot_kb.index')
+os.environ['ARCHIVE_DIR'] = os.path.join(SCRATCH, 'archive')
+os.environ['PROFILE_DIR'] = os.path.join(SCRATCH, 'profiles')
+os.environ.pop('DATABASE_REPLICA_URL', None)
+os.environ.pop('CHAT_WRITE_BEHIND', None)
+
+
+@pytest.fixture(scope='session')
+def backend():
+    """The app module on a scratch database with the full schema"""
+    import app as backend
+    backend.init_db()
+    return backend
+
+
+@pytest.fixture
+def app_context(backend):
+    with backend.app.app_context():
+        yield
+        backend.db.session.remove()
+
+
+@pytest.fixture
+def admin_headers(backend):
+    client = backend.app.test_client()
+    response = client.post('/api/signin', json={'email': 'admin@wellbot.com', 'password': 'admin123'})
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
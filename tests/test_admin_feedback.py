@@ -0,0 +1,70 @@
+import datetime
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+WINDOW = 'since=2001-01-01T00:00:00&until=2001-01-02T00:00:00'
+
+
+def at(minute):
+    return datetime.datetime(2001, 1, 1, 10, minute)
+
+
+@pytest.fixture
+def replayed(backend, app_context):
+    """A conversation replayed out of order: message ids run against time"""
+    db = backend.db
+    user = backend.User(username='replayed', email='replayed@example.com', password_hash=generate_password_hash('secret'))
+    db.session.add(user)
+    db.session.flush()
+    conversation = backend.Conversation(user_id=user.id, start_time=at(0))
+    db.session.add(conversation)
+    db.session.flush()
+
+    messages = {}
+    for name, sender, minute in [('second answer', 'bot', 3), ('second question', 'user', 2),
+                                 ('first answer', 'bot', 1), ('first question', 'user', 0)]:
+        messages[name] = backend.Message(conversation_id=conversation.id, sender=sender, message=name, timestamp=at(minute))
+        db.session.add(messages[name])
+        db.session.flush()
+    feedback = [backend.Feedback(message_id=messages[name].id, user_id=user.id, rating=rating, created_at=at(minute))
+                for name, rating, minute in [('first answer', 'positive', 10), ('second answer', 'negative', 11),
+                                             ('second question', 'negative', 12), ('first answer', 'negative', 13),
+                                             ('second answer', 'positive', 14)]]
+    db.session.add_all(feedback)
+    db.session.commit()
+    yield feedback
+
+    for row in feedback:
+        db.session.delete(row)
+    db.session.delete(conversation)
+    db.session.delete(user)
+    db.session.commit()
+
+
+def test_feedback_pairs_each_answer_with_the_question_before_it(backend, admin_headers, replayed):
+    client = backend.app.test_client()
+    body = client.get(f"/api/admin/feedback?{WINDOW}", headers=admin_headers).get_json()
+    pairs = {(row['user_message'], row['bot_response']) for row in body['feedback']}
+
+    assert pairs == {('first question', 'first answer'), ('second question', 'second answer'),
+                     ('second question', None)}
+
+
+def test_feedback_pages_cover_every_row_once_newest_first(backend, admin_headers, replayed):
+    client = backend.app.test_client()
+    seen, cursor = [], None
+    while True:
+        url = f"/api/admin/feedback?{WINDOW}&limit=2" + (f"&cursor={cursor}" if cursor else '')
+        body = client.get(url, headers=admin_headers).get_json()
+        seen.extend(row['id'] for row in body['feedback'])
+        cursor = body['next_cursor']
+        if not body['has_more']:
+            break
+
+    assert seen == [row.id for row in reversed(replayed)]
+
+
+def test_feedback_rejects_a_bad_cursor(backend, admin_headers):
+    response = backend.app.test_client().get('/api/admin/feedback?cursor=!!!', headers=admin_headers)
+    assert response.status_code == 400
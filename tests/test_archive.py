@@ -0,0 +1,106 @@
+import datetime
+import gzip
+import json
+import os
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+# Archive runs pretend to happen in 2001, so only this module's conversations are due
+NOW = datetime.datetime(2001, 6, 1)
+
+
+def at(minute):
+    return datetime.datetime(2001, 1, 1, 10, minute)
+
+
+def make_user(backend, name):
+    user = backend.User(username=name, email=f"{name}@example.com", password_hash=generate_password_hash('secret'))
+    backend.db.session.add(user)
+    backend.db.session.flush()
+    return user
+
+
+@pytest.fixture
+def old_conversation(backend, app_context):
+    db = backend.db
+    user, other = make_user(backend, 'archivist'), make_user(backend, 'stranger')
+    conversation = backend.Conversation(user_id=user.id, start_time=at(0), end_time=at(5))
+    db.session.add(conversation)
+    db.session.flush()
+    for sender, text, minute in [('user', 'Is a fever dangerous?', 0), ('bot', 'Usually not; rest and drink water.', 1),
+                                 ('user', 'Thanks', 2)]:
+        db.session.add(backend.Message(conversation_id=conversation.id, sender=sender, message=text, timestamp=at(minute)))
+    db.session.flush()
+    answer = db.session.query(backend.Message).filter_by(conversation_id=conversation.id, sender='bot').one()
+    db.session.add(backend.Feedback(message_id=answer.id, user_id=user.id, rating='positive', created_at=at(3)))
+    # The newest conversation and message always stay hot
+    newest = backend.Conversation(user_id=other.id)
+    db.session.add(newest)
+    db.session.flush()
+    db.session.add(backend.Message(conversation_id=newest.id, sender='user', message='hello'))
+    db.session.commit()
+    conversation_id, answer_id = conversation.id, answer.id
+    yield conversation_id, answer_id
+
+    db.session.query(backend.Feedback).filter_by(message_id=answer_id).delete()
+    db.session.query(backend.ArchivedRatedMessage).filter_by(conversation_id=conversation_id).delete()
+    db.session.query(backend.ArchivedConversation).filter_by(id=conversation_id).delete()
+    db.session.query(backend.Message).filter(backend.Message.conversation_id.in_([conversation_id, newest.id])).delete()
+    db.session.query(backend.Conversation).filter(backend.Conversation.id.in_([conversation_id, newest.id])).delete()
+    db.session.query(backend.User).filter(backend.User.id.in_([user.id, other.id])).delete()
+    db.session.commit()
+
+
+def sign_in(client, name):
+    response = client.post('/api/signin', json={'email': f"{name}@example.com", 'password': 'secret'})
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def test_archive_moves_the_conversation_into_a_segment(backend, old_conversation):
+    conversation_id, _ = old_conversation
+    archive = backend.conversation_archive
+
+    report = archive.archive(now=NOW)
+
+    assert (report['conversations'], report['messages']) == (1, 3)
+    assert report['segments'] == ['conversations-2001-01.jsonl.gz']
+    assert backend.db.session.get(backend.Conversation, conversation_id) is None
+    assert backend.db.session.query(backend.Message).filter_by(conversation_id=conversation_id).count() == 0
+    # A segment is a plain .jsonl.gz file
+    with gzip.open(os.path.join(archive.directory, report['segments'][0]), 'rt', encoding='utf-8') as fh:
+        records = [json.loads(line) for line in fh]
+    assert [len(record['messages']) for record in records if record['id'] == conversation_id] == [3]
+
+    assert archive.archive(now=NOW)['conversations'] == 0
+
+
+def test_archived_history_reads_back_from_the_segment(backend, old_conversation):
+    conversation_id, _ = old_conversation
+    backend.conversation_archive.archive(now=NOW)
+    client = backend.app.test_client()
+    headers = sign_in(client, 'archivist')
+
+    history = client.get('/api/conversation/history', headers=headers).get_json()['history']
+    assert [item['conversation_id'] for item in history] == [conversation_id]
+    assert [message['sender'] for message in history[0]['messages']] == ['user', 'bot', 'user']
+
+    body = client.get(f"/api/conversation/{conversation_id}/messages?limit=2", headers=headers).get_json()
+    assert [message['message'] for message in body['messages']] == ['Usually not; rest and drink water.', 'Thanks']
+    older = client.get(f"/api/conversation/{conversation_id}/messages?limit=2&cursor={body['next_cursor']}",
+                       headers=headers).get_json()
+    assert [message['message'] for message in older['messages']] == ['Is a fever dangerous?']
+
+    stranger = sign_in(client, 'stranger')
+    assert client.get(f"/api/conversation/{conversation_id}/messages", headers=stranger).status_code == 404
+
+
+def test_feedback_on_archived_messages_keeps_its_question_and_answer(backend, admin_headers, old_conversation):
+    conversation_id, answer_id = old_conversation
+    backend.conversation_archive.archive(now=NOW)
+
+    body = backend.app.test_client().get('/api/admin/feedback?since=2001-01-01T00:00:00&until=2001-01-02T00:00:00',
+                                         headers=admin_headers).get_json()
+    [row] = body['feedback']
+    assert (row['message_id'], row['conversation_id']) == (answer_id, conversation_id)
+    assert (row['user_message'], row['bot_response']) == ('Is a fever dangerous?', 'Usually not; rest and drink water.')
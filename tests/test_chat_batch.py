@@ -0,0 +1,46 @@
+import pytest
+
+from intent_classifier import IntentClassifier, train_model
+
+EXAMPLES = [
+    ('i have a headache', 'headache'), ('my head hurts', 'headache'), ('sir dard hai', 'headache'),
+    ('i have a fever', 'fever'), ('bukhar hai', 'fever'), ('high temperature', 'fever'),
+    ('hello', 'greet'), ('hi there', 'greet'), ('namaste', 'greet'),
+]
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    weights, metadata = train_model(EXAMPLES, folds=2, epochs=50)
+    return IntentClassifier(weights, metadata)
+
+
+@pytest.fixture
+def trained_backend(backend, classifier, monkeypatch):
+    monkeypatch.setattr(backend, 'intent_classifier', classifier)
+    return backend
+
+
+def test_classify_messages_of_nothing(trained_backend):
+    assert trained_backend.classify_messages([]) == []
+
+
+def test_classify_messages_matches_classify_message(trained_backend):
+    messages = ['I have a headache', 'bukhar hai', 'hello', 'what should I eat']
+    batch = trained_backend.classify_messages(messages)
+    assert len(batch) == len(messages)
+    for (intent, language, confidence), message in zip(batch, messages):
+        one_intent, one_language, one_confidence = trained_backend.classify_message(message)
+        assert (intent, language) == (one_intent, one_language)
+        assert confidence == pytest.approx(one_confidence, abs=1e-5)
+
+
+def test_chat_batch_without_valid_items_reports_each_item(trained_backend, admin_headers):
+    client = trained_backend.app.test_client()
+    response = client.post('/api/chat/batch', json={'messages': ['', '   ', 42]}, headers=admin_headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['processed'] == 0
+    assert body['errors'] == 3
+    assert all('error' in result for result in body['results'])
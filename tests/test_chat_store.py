@@ -0,0 +1,168 @@
+import datetime
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from chat_store import ChatStore
+
+
+@pytest.fixture
+def store(backend, app_context):
+    store = ChatStore(backend.db, backend.Conversation, backend.Message, backend.IdAllocation,
+                      write_behind=True, flush_interval_ms=10)
+    store._engine = backend.db.engine
+    yield store
+    store.stop()
+
+
+@pytest.fixture
+def conversation_id(backend, app_context):
+    conversation = backend.Conversation(user_id=1)
+    backend.db.session.add(conversation)
+    backend.db.session.commit()
+    return conversation.id
+
+
+def make_rows(store, conversation_id, count, **overrides):
+    now = datetime.datetime.utcnow()
+    return [dict({'id': message_id, 'conversation_id': conversation_id, 'sender': 'user', 'message': f"message {message_id}",
+                  'timestamp': now, 'intent': None, 'confidence': 0.0}, **overrides)
+            for message_id in store._allocate_ids(count)]
+
+
+def stored_ids(backend, rows):
+    ids = [row['id'] for row in rows]
+    found = backend.db.session.query(backend.Message.id).filter(backend.Message.id.in_(ids)).all()
+    return sorted(message_id for message_id, in found)
+
+
+def fail_writes(store, should_fail):
+    """Make store._write raise a transient error whenever should_fail(call number) is true; returns the calls"""
+    write, calls = store._write, []
+
+    def flaky_write(rows):
+        calls.append([row['id'] for row in rows])
+        if should_fail(len(calls)):
+            raise OperationalError('INSERT INTO messages', {}, Exception('database is locked'))
+        write(rows)
+
+    store._write = flaky_write
+    return calls
+
+
+def test_flush_commits_queued_rows(backend, store, conversation_id):
+    rows = make_rows(store, conversation_id, 4)
+    store.enqueue(rows)
+    store.flush()
+
+    assert all(store.wait_for(row['id'], timeout=2) for row in rows)
+    assert stored_ids(backend, rows) == [row['id'] for row in rows]
+    assert store.stats()['pending_messages'] == 0
+
+
+def test_rejected_row_is_quarantined_and_the_rest_written(backend, store, conversation_id):
+    good = make_rows(store, conversation_id, 6)
+    bad = make_rows(store, conversation_id, 1, timestamp='not a timestamp')[0]
+    store.enqueue(good[:3] + [bad] + good[3:])
+    store.flush()
+
+    assert stored_ids(backend, good) == [row['id'] for row in good]
+    assert stored_ids(backend, [bad]) == []
+    assert store.is_quarantined(bad['id'])
+    assert store.wait_for(bad['id'], timeout=0.1) is False
+    assert store.wait_for(good[0]['id'], timeout=0.1) is True
+    assert store.metrics['rows_quarantined'] == 1
+
+
+def test_row_committed_by_a_lost_attempt_is_not_quarantined(backend, store, conversation_id):
+    rows = make_rows(store, conversation_id, 2)
+    store._write(rows)
+
+    # Written again, as after a commit whose reply was lost: duplicate key, but the rows are there
+    with store._flush_lock:
+        store._write_rows(rows)
+
+    assert store.metrics['rows_quarantined'] == 0
+    assert not any(store.is_quarantined(row['id']) for row in rows)
+
+
+def test_row_whose_id_holds_another_message_is_quarantined(backend, store, conversation_id):
+    rows = make_rows(store, conversation_id, 2)
+    # A worker without write-behind took the second id for a different message
+    store._write([dict(rows[1], message='someone else')])
+
+    with store._flush_lock:
+        store._write_rows(rows)
+
+    assert store.is_quarantined(rows[1]['id'])
+    assert not store.is_quarantined(rows[0]['id'])
+    assert store.metrics['rows_quarantined'] == 1
+    assert backend.db.session.get(backend.Message, rows[1]['id']).message == 'someone else'
+
+
+def test_full_queue_with_database_down_keeps_rows_for_retry(backend, store, conversation_id):
+    store._ensure_flusher = lambda: None
+    store._queue.maxsize = 1
+    store.enqueue(make_rows(store, conversation_id, 2))
+    fail_writes(store, lambda call: call == 1)
+
+    overflow = make_rows(store, conversation_id, 2)
+    store.enqueue(overflow)  # Queue full, inline write fails: no exception reaches the caller
+
+    assert store.metrics['sync_fallbacks'] == 1
+    assert [row['id'] for row in store._retry] == [row['id'] for row in overflow]
+    assert all(store.is_pending(row['id']) for row in overflow)
+
+    store.flush()
+    assert stored_ids(backend, overflow) == [row['id'] for row in overflow]
+    assert store.stats()['pending_messages'] == 0
+
+
+def test_failed_batch_is_retried_alone(backend, store, conversation_id):
+    store._ensure_flusher = lambda: None
+    calls = fail_writes(store, lambda call: call == 1)
+    first = make_rows(store, conversation_id, 3)
+    store.enqueue(first)
+
+    with pytest.raises(OperationalError):
+        store.flush()
+    assert [row['id'] for row in store._retry] == [row['id'] for row in first]
+
+    second = make_rows(store, conversation_id, 2)
+    store.enqueue(second)
+    store.flush()
+
+    assert calls[1:] == [[row['id'] for row in first], [row['id'] for row in second]]
+    assert stored_ids(backend, first + second) == [row['id'] for row in first + second]
+    assert store.metrics['flush_errors'] == 1
+    assert store.metrics['rows_quarantined'] == 0
+
+
+def test_flush_and_flusher_never_write_a_batch_twice(backend, store, conversation_id):
+    failing = threading.Event()
+    failing.set()
+    fail_writes(store, lambda call: failing.is_set() and call % 3 == 0)
+    written = []
+
+    def producer():
+        for _ in range(20):
+            rows = make_rows(store, conversation_id, 2)
+            written.extend(rows)
+            store.enqueue(rows)
+            try:
+                store.flush()
+            except OperationalError:
+                pass
+
+    threads = [threading.Thread(target=producer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    failing.clear()
+    store.stop()
+
+    assert stored_ids(backend, written) == sorted(row['id'] for row in written)
+    assert store.metrics['rows_quarantined'] == 0
+    assert store.stats()['pending_messages'] == 0
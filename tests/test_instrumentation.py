@@ -0,0 +1,130 @@
+import gc
+import logging
+import threading
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, DateTime, MetaData, Table, create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, StatementError
+
+import db_tuning
+from db_tuning import _statement_finished, _statement_started, install_query_timing, observe_statements
+from instrumentation import Registry, instrument_app
+
+
+def sample_count(rendered, series):
+    for line in rendered.splitlines():
+        if line.startswith(series + ' '):
+            return float(line.split()[-1])
+    return None
+
+
+def test_finished_threads_fold_into_the_retired_total():
+    registry = Registry()
+    registry.counter('test_requests_total', 'Requests')
+
+    def request():
+        registry.inc('test_requests_total')
+        registry.observe('wellbot_stage_seconds', (('stage', 'test'),), 0.002)
+
+    for _ in range(50):
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    gc.collect()
+
+    assert len(registry._shards) <= 1
+    rendered = registry.render()
+    assert sample_count(rendered, 'test_requests_total') == 200
+    assert sample_count(rendered, 'wellbot_stage_seconds_count{stage="test"}') == 200
+
+
+def test_live_threads_keep_their_shards():
+    registry = Registry()
+    registry.counter('test_requests_total', 'Requests')
+    release = threading.Event()
+    recorded = threading.Barrier(4)
+
+    def worker():
+        registry.inc('test_requests_total')
+        recorded.wait()
+        release.wait(5)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    recorded.wait()
+    assert len(registry._shards) == 3
+    assert sample_count(registry.render(), 'test_requests_total') == 3
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    registry.inc('test_requests_total')
+    assert sample_count(registry.render(), 'test_requests_total') == 4
+
+
+@pytest.fixture
+def engine():
+    return create_engine('sqlite://')
+
+
+@pytest.fixture(autouse=True)
+def restore_observers():
+    observers = list(db_tuning._statement_observers)
+    yield
+    db_tuning._statement_observers[:] = observers
+
+
+def test_one_pair_of_timing_listeners_serves_every_observer(engine):
+    first, second = [], []
+    observe_statements(lambda statement, seconds: first.append(statement))
+    observe_statements(lambda statement, seconds: second.append(statement))
+    observe_statements(lambda statement, seconds: None)
+
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+
+    assert event.contains(Engine, 'before_cursor_execute', _statement_started)
+    assert event.contains(Engine, 'after_cursor_execute', _statement_finished)
+    assert first.count('SELECT 1') == second.count('SELECT 1') == 1
+
+
+def test_failed_statement_leaves_no_start_time_behind(engine):
+    observe_statements(lambda statement, seconds: None)
+    events = Table('events', MetaData(), Column('at', DateTime))
+    events.create(engine)
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+        assert conn.info.get('statement_started') == []
+
+        # Refused by a bind processor before any cursor ran
+        with pytest.raises(StatementError):
+            conn.execute(events.insert(), {'at': 'not a timestamp'})
+        conn.execute(text('SELECT 1'))
+        assert conn.info['statement_started'] == []
+
+
+def test_request_metrics_and_timing_headers_count_each_statement_once(engine):
+    app = Flask(__name__)
+    registry = Registry()
+    install_query_timing(app)
+    instrument_app(app, registry, logging.getLogger('test'))
+
+    @app.route('/three')
+    def three():
+        with engine.connect() as conn:
+            for number in range(3):
+                conn.execute(text(f"SELECT {number}"))
+        return 'ok'
+
+    response = app.test_client().get('/three')
+
+    assert response.headers['X-DB-Queries'] == '3'
+    assert sample_count(registry.render(), 'wellbot_request_sql_statements_sum{route="/three"}') == 3
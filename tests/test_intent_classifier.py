@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from intent_classifier import IntentClassifier, train_model
+
+EXAMPLES = [
+    ('i have a headache', 'headache'), ('my head hurts', 'headache'), ('sir dard hai', 'headache'),
+    ('migraine since morning', 'headache'), ('i have a fever', 'fever'), ('bukhar hai', 'fever'),
+    ('high temperature', 'fever'), ('fever since yesterday', 'fever'), ('hello', 'greet'),
+    ('hi there', 'greet'), ('namaste', 'greet'), ('good morning', 'greet'),
+]
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    weights, metadata = train_model(EXAMPLES, folds=2, epochs=50)
+    return IntentClassifier(weights, metadata)
+
+
+def test_predict_proba_many_of_nothing_is_empty(classifier):
+    probs = classifier.predict_proba_many([])
+    assert probs.shape == (0, len(classifier.labels))
+    assert list(probs) == []
+
+
+def test_predict_proba_many_matches_predict_proba(classifier):
+    # Includes texts without any feature, which take the bias-only path
+    texts = ['i have a headache', '', '!!!', 'bukhar hai', 'x']
+    batch = classifier.predict_proba_many(texts)
+    for text, probs in zip(texts, batch):
+        np.testing.assert_allclose(probs, classifier.predict_proba(text), rtol=1e-5, atol=1e-6)
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from intent_matcher import INTENT_KEYWORDS, IntentMatcher, intent_matcher
+
+
+def substring_detect(message, registry=INTENT_KEYWORDS):
+    """The per-keyword substring scan the automaton replaced"""
+    message_lower = message.lower()
+    hindi_chars = any('\u0900' <= char <= '\u097F' for char in message)
+    detected_lang = 'hi' if hindi_chars else 'en'
+
+    detected_intent = 'general'
+    max_matches = 0
+    for intent, keywords in registry.items():
+        matches = sum(1 for keyword in keywords if keyword in message_lower)
+        if matches > max_matches:
+            max_matches = matches
+            detected_intent = intent
+    return detected_intent, detected_lang
+
+
+@pytest.mark.parametrize('message', [
+    '',
+    'hello',
+    'I have a HEADACHE and a fever',
+    'headache, migraine and head pain',
+    'fever fever fever with a headache',
+    'mujhe bukhar hai aur sir dard bhi',
+    'मुझे बुखार है',
+    'सिरदर्द और सर्दी जुकाम',
+    'I cut my finger, bleeding from the wound',
+    'cold food after a workout',
+    'diet and exercise, vyayam aur bhojan',
+    'laptop',
+    'coldflucough',
+    'chotghav',
+])
+def test_detect_matches_the_substring_scan(message):
+    assert intent_matcher.detect(message) == substring_detect(message)
+
+
+def test_detect_matches_the_substring_scan_on_random_text():
+    # Text stitched from keyword fragments exercises overlapping and nested matches
+    pieces = [keyword[:cut] for keywords in INTENT_KEYWORDS.values() for keyword in keywords
+              for cut in (1, len(keyword) // 2, len(keyword))] + [' ', 'a', 'x', 'ह']
+    rng = random.Random(1234)
+    for _ in range(2000):
+        message = ''.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        assert intent_matcher.detect(message) == substring_detect(message), message
+
+
+def test_overlapping_keywords_and_shared_strings():
+    registry = {'a': ['he', 'she', 'hers'], 'b': ['his', 'she'], 'c': ['s']}
+    matcher = IntentMatcher(registry)
+
+    for message in ['ushers', 'she', 'his hers', 'sss', 'nothing here', '']:
+        assert matcher.detect(message) == substring_detect(message, registry), message
+    assert matcher.match('ushers')[2] == {'a': 3, 'b': 1, 'c': 1}
+
+
+def test_detect_many_keeps_order():
+    messages = ['fever', 'headache', 'hello', 'जुकाम']
+    assert intent_matcher.detect_many(messages) == [substring_detect(message) for message in messages]
@@ -0,0 +1,106 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+from kb_pipeline import KnowledgeBaseImporter, clean_entry, read_ndjson
+from models import HealthKnowledgeBase
+
+LANGUAGES = ('en', 'hi')
+VALID = {'category': 'fever', 'title': 'Fever care', 'content': 'Rest and drink fluids.'}
+
+
+def test_clean_entry_normalizes_a_valid_record():
+    entry = clean_entry(dict(VALID, category=' fever ', language=' hi ', tags='home, fluids ', is_active='no'), LANGUAGES)
+
+    assert entry['category'] == 'fever'
+    assert entry['language'] == 'hi'
+    assert json.loads(entry['tags']) == ['home', 'fluids']
+    assert entry['is_active'] is False
+
+
+def test_clean_entry_defaults():
+    entry = clean_entry(dict(VALID), LANGUAGES)
+
+    assert entry['language'] == 'en'
+    assert json.loads(entry['tags']) == []
+    assert entry['is_active'] is True
+
+
+@pytest.mark.parametrize('record', [
+    'not an object',
+    ['a', 'list'],
+    dict(VALID, category=None),
+    dict(VALID, title='   '),
+    dict(VALID, content=42),
+    dict(VALID, category='x' * 101),
+    dict(VALID, title='x' * 256),
+    dict(VALID, language=5),
+    dict(VALID, language=['en']),
+    dict(VALID, language={'code': 'en'}),
+    dict(VALID, language='fr'),
+    dict(VALID, tags={'a': 1}),
+    dict(VALID, tags='[not json'),
+    dict(VALID, is_active='maybe'),
+    ValueError('invalid JSON'),
+])
+def test_clean_entry_rejects_with_value_error(record):
+    with pytest.raises(ValueError):
+        clean_entry(record, LANGUAGES)
+
+
+def test_import_counts_bad_records_and_keeps_going():
+    engine = create_engine('sqlite://')
+    HealthKnowledgeBase.__table__.create(engine)
+    lines = [
+        json.dumps(VALID),
+        '{broken',
+        json.dumps(dict(VALID, title='Numeric language', language=5)),
+        json.dumps(dict(VALID, title='Second', language='hi')),
+    ]
+
+    report = KnowledgeBaseImporter(engine, HealthKnowledgeBase.__table__, LANGUAGES).run(read_ndjson(io.StringIO('\n'.join(lines))))
+
+    assert report['read'] == 4
+    assert report['inserted'] == 2
+    assert report['invalid'] == 2
+    assert [error['record'] for error in report['errors']] == [2, 3]
+
+
+@pytest.fixture
+def paged_entries(backend, app_context):
+    entries = [HealthKnowledgeBase(category='paging_test', title=f"Entry {number}", content=f"Content {number}",
+                                   tags=json.dumps(['paging'])) for number in range(5)]
+    backend.db.session.add_all(entries)
+    backend.db.session.commit()
+    yield entries
+    for entry in entries:
+        backend.db.session.delete(entry)
+    backend.db.session.commit()
+
+
+def test_admin_knowledge_base_pages_cover_every_entry_once(backend, admin_headers, paged_entries):
+    client = backend.app.test_client()
+    seen, cursor = [], None
+    while True:
+        url = '/api/admin/knowledge-base?category=paging_test&limit=2' + (f"&cursor={cursor}" if cursor else '')
+        body = client.get(url, headers=admin_headers).get_json()
+        assert all('content' not in entry for entry in body['knowledge_base'])
+        seen += [entry['id'] for entry in body['knowledge_base']]
+        cursor = body['next_cursor']
+        if not body['has_more']:
+            break
+
+    assert sorted(seen) == sorted(entry.id for entry in paged_entries)
+    assert cursor is None
+
+
+def test_admin_knowledge_base_entry_by_id(backend, admin_headers, paged_entries):
+    client = backend.app.test_client()
+    entry = paged_entries[3]
+
+    body = client.get(f"/api/admin/knowledge-base/{entry.id}", headers=admin_headers).get_json()
+    assert (body['id'], body['title'], body['content'], body['tags']) == (entry.id, 'Entry 3', 'Content 3', ['paging'])
+
+    assert client.get('/api/admin/knowledge-base/999999', headers=admin_headers).status_code == 404
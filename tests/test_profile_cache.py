@@ -0,0 +1,187 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from profile_cache import PROFILE_COLUMNS, LastLoginWriter, ProfileCache, parse_health_conditions
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, ()),
+    ('', ()),
+    ('[]', ()),
+    ('["diabetes", "asthma"]', ('diabetes', 'asthma')),
+])
+def test_parse_health_conditions(value, expected):
+    assert parse_health_conditions(value) == expected
+
+
+@pytest.mark.parametrize('value', ['{not json', '"diabetes"', '{"a": 1}', '42'])
+def test_unreadable_health_conditions_are_logged(value, caplog):
+    with caplog.at_level(logging.WARNING, logger='profile_cache'):
+        assert parse_health_conditions(value, user_id=7) == ()
+    assert [record.user_id for record in caplog.records] == [7]
+
+
+def make_row(user_id, **values):
+    row = dict.fromkeys(PROFILE_COLUMNS)
+    row.update(id=user_id, role='user', is_active=True, preferred_language='en', username=f"user{user_id}",
+               email=f"user{user_id}@example.com", health_conditions='[]')
+    row.update(values)
+    return SimpleNamespace(**row)
+
+
+class FakeUsers:
+    """A users table the caches load from, counting loads"""
+
+    def __init__(self):
+        self.rows = {}
+        self.loads = 0
+
+    def load(self, user_id):
+        self.loads += 1
+        return self.rows.get(user_id)
+
+
+def test_memory_cache_serves_until_invalidated():
+    users = FakeUsers()
+    users.rows[1] = make_row(1, username='before')
+    cache = ProfileCache(users.load, ttl=60)
+
+    assert cache.get(1).username == 'before'
+    users.rows[1] = make_row(1, username='after')
+    assert cache.get(1).username == 'before'
+    assert users.loads == 1
+
+    cache.invalidate(1)
+    assert cache.get(1).username == 'after'
+    assert users.loads == 2
+
+
+def test_missing_user_is_not_cached():
+    users = FakeUsers()
+    cache = ProfileCache(users.load)
+
+    assert cache.get(5) is None
+    users.rows[5] = make_row(5)
+    assert cache.get(5).id == 5
+
+
+def test_invalidation_reaches_other_workers_through_the_disk_tier(tmp_path):
+    users = FakeUsers()
+    users.rows[1] = make_row(1, role='admin', health_conditions='["asthma"]')
+    path = str(tmp_path / 'profiles.db')
+    # Two workers on one host; revalidate=0 checks the shared version on every get
+    first = ProfileCache(users.load, ttl=60, revalidate=0, disk_path=path)
+    second = ProfileCache(users.load, ttl=60, revalidate=0, disk_path=path)
+
+    assert first.get(1).role == 'admin'
+    assert second.get(1) == first.get(1)
+    assert second.get(1).health_conditions == ('asthma',)
+    assert users.loads == 1
+    assert second.metrics['disk_hits'] == 1
+
+    users.rows[1] = make_row(1, role='user')
+    first.invalidate(1)
+    assert second.get(1).role == 'user'
+    assert first.get(1).role == 'user'
+    assert first.metrics['disk_errors'] == second.metrics['disk_errors'] == 0
+
+
+def test_revalidation_waits_for_the_interval(tmp_path):
+    users = FakeUsers()
+    users.rows[1] = make_row(1, username='before')
+    path = str(tmp_path / 'profiles.db')
+    first = ProfileCache(users.load, ttl=60, revalidate=60, disk_path=path)
+    second = ProfileCache(users.load, ttl=60, revalidate=60, disk_path=path)
+    second.get(1)
+
+    users.rows[1] = make_row(1, username='after')
+    first.invalidate(1)
+    # Within the interval the memory entry is trusted without a disk check
+    assert second.get(1).username == 'before'
+
+
+def test_profile_from_the_disk_tier_matches_the_loaded_one(tmp_path):
+    users = FakeUsers()
+    users.rows[1] = make_row(1, health_conditions='["asthma", "diabetes"]')
+    path = str(tmp_path / 'profiles.db')
+    loaded = ProfileCache(users.load, disk_path=path).get(1)
+
+    assert ProfileCache(users.load, disk_path=path).get(1) == loaded
+    assert users.loads == 1
+
+
+def test_shared_entries_expire_after_ttl(tmp_path):
+    users = FakeUsers()
+    users.rows[1] = make_row(1, username='before')
+    path = str(tmp_path / 'profiles.db')
+    ProfileCache(users.load, ttl=0.05, disk_path=path).get(1)
+
+    users.rows[1] = make_row(1, username='after')
+    time.sleep(0.1)
+    assert ProfileCache(users.load, ttl=0.05, disk_path=path).get(1).username == 'after'
+
+
+def test_after_fork_replaces_locks_held_at_fork_time(backend):
+    writer = LastLoginWriter(backend.db, backend.User, interval=60)
+    atexit.unregister(writer.stop)
+    # A flush in another parent thread held the locks when the worker forked
+    writer._flush_lock.acquire()
+    writer._lock.acquire()
+
+    def child():
+        writer.after_fork()
+        writer._ensure_flusher()
+
+    started = threading.Thread(target=child, daemon=True)
+    started.start()
+    started.join(timeout=2)
+
+    assert not started.is_alive()
+    writer.stop()
+
+
+@pytest.fixture
+def member(backend, app_context):
+    user = backend.User(username='member', email='member@example.com', password_hash=generate_password_hash('secret'),
+                        health_conditions=json.dumps(['asthma']))
+    backend.db.session.add(user)
+    backend.db.session.commit()
+    yield user
+    backend.db.session.delete(user)
+    backend.db.session.commit()
+
+
+def sign_in(client):
+    response = client.post('/api/signin', json={'email': 'member@example.com', 'password': 'secret'})
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def test_profile_update_is_served_at_once(backend, member):
+    client = backend.app.test_client()
+    headers = sign_in(client)
+    assert client.get('/api/profile', headers=headers).get_json()['health_conditions'] == ['asthma']
+
+    client.post('/api/profile', json={'name': 'renamed', 'health_conditions': ['diabetes']}, headers=headers)
+    profile = client.get('/api/profile', headers=headers).get_json()
+
+    assert profile['username'] == 'renamed'
+    assert profile['health_conditions'] == ['diabetes']
+
+
+def test_deactivated_user_is_refused_at_once(backend, member):
+    client = backend.app.test_client()
+    headers = sign_in(client)
+    assert client.get('/api/profile', headers=headers).status_code == 200
+
+    # Any ORM update of the user drops the cached profile, though the token stays cached
+    member.is_active = False
+    backend.db.session.commit()
+
+    assert client.get('/api/profile', headers=headers).status_code == 401
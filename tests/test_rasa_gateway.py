@@ -0,0 +1,281 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from rasa_gateway import RasaGateway
+
+
+class StubRasa(ThreadingHTTPServer):
+    """Rasa's REST webhook on an ephemeral port, with switchable failure modes
+
+    mode: 'ok' (reply with replies), 'error' (500) or 'slow' (sleep delay, then reply).
+    healthy: what the probe URL answers. gate: when set, webhook calls wait on it.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.mode = 'ok'
+        self.healthy = True
+        self.delay = 0.0
+        self.replies = [{'text': 'Drink water and rest.'}]
+        self.gate = None
+        self.posts = []
+        self.probes = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/webhooks/rest/webhook"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.server.probes += 1
+        self._reply(200 if self.server.healthy else 500, {'status': 'ok'})
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.posts.append(body)
+        if server.gate is not None:
+            server.gate.wait(5)
+        if server.mode == 'error':
+            return self._reply(500, {'error': 'boom'})
+        if server.mode == 'slow':
+            time.sleep(server.delay)
+        self._reply(200, server.replies)
+
+
+@pytest.fixture
+def rasa():
+    server = StubRasa()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    if server.gate is not None:
+        server.gate.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gateway(rasa):
+    return RasaGateway(rasa.url, connect_timeout=0.5, read_timeout=0.3, failure_threshold=3, probe_interval=0.05,
+                       max_concurrent=4, cacheable_intents=['fever'])
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def run_threads(target, count):
+    results = [None] * count
+
+    def worker(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+# ---------- respond ----------
+
+def test_respond_joins_reply_texts(rasa, gateway):
+    rasa.replies = [{'text': 'Rest.'}, {'image': 'x.png'}, {'text': 'Drink water.'}]
+
+    assert gateway.respond('I have a fever', 'user_1') == 'Rest.\n\nDrink water.'
+    assert rasa.posts == [{'sender': 'user_1', 'message': 'I have a fever'}]
+    assert gateway.metrics['successes'] == 1
+
+
+def test_respond_without_text_is_none(rasa, gateway):
+    rasa.replies = []
+    assert gateway.respond('hello', 'user_1') is None
+    assert gateway.breaker.failures == 0
+
+
+def test_error_and_timeout_fall_back_to_none(rasa, gateway):
+    rasa.mode = 'error'
+    assert gateway.respond('hello', 'user_1') is None
+
+    rasa.mode, rasa.delay = 'slow', 1.0
+    started = time.perf_counter()
+    assert gateway.respond('hello again', 'user_1') is None
+    assert time.perf_counter() - started < 0.9
+
+    assert gateway.metrics['failures'] == 2
+    assert gateway.metrics['timeouts'] == 1
+
+
+def test_breaker_opens_short_circuits_and_closes_after_a_probe(rasa, gateway):
+    rasa.mode, rasa.healthy = 'error', False
+    for number in range(3):
+        assert gateway.respond(f"message {number}", 'user_1') is None
+    assert gateway.breaker.state == 'open'
+    assert gateway.breaker.times_opened == 1
+
+    # Open: nothing reaches Rasa, and the probe keeps it open while Rasa is unhealthy
+    posts = len(rasa.posts)
+    assert gateway.respond('another', 'user_1') is None
+    assert len(rasa.posts) == posts
+    assert gateway.metrics['short_circuited'] == 1
+    assert wait_until(lambda: rasa.probes >= 2)
+    assert gateway.breaker.state == 'open'
+
+    rasa.mode, rasa.healthy = 'ok', True
+    assert wait_until(lambda: gateway.breaker.state == 'closed')
+    assert gateway.respond('back again', 'user_1') == 'Drink water and rest.'
+    assert gateway.breaker.failures == 0
+
+
+def test_a_success_resets_the_failure_count(rasa, gateway):
+    rasa.mode = 'error'
+    gateway.respond('one', 'user_1')
+    gateway.respond('two', 'user_1')
+    rasa.mode = 'ok'
+    gateway.respond('three', 'user_1')
+    rasa.mode = 'error'
+    gateway.respond('four', 'user_1')
+
+    assert gateway.breaker.state == 'closed'
+    assert gateway.breaker.failures == 1
+
+
+def test_identical_requests_share_one_call(rasa, gateway):
+    rasa.gate = threading.Event()
+    threads, results = run_threads(lambda: gateway.respond('My head hurts', 'user_1'), 5)
+    assert wait_until(lambda: len(rasa.posts) == 1)
+    assert wait_until(lambda: gateway.metrics['coalesced'] == 4)
+    rasa.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['Drink water and rest.'] * 5
+    assert len(rasa.posts) == 1
+
+
+def test_different_senders_are_not_coalesced_for_stateful_intents(rasa, gateway):
+    rasa.gate = threading.Event()
+    threads, results = run_threads(lambda: gateway.respond('hello', f"user_{threading.get_ident()}"), 3)
+    assert wait_until(lambda: len(rasa.posts) == 3)
+    rasa.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert gateway.metrics['coalesced'] == 0
+
+
+def test_calls_past_the_cap_skip_rasa(rasa, gateway):
+    rasa.gate = threading.Event()
+    threads, _ = run_threads(lambda: gateway.respond(f"busy {threading.get_ident()}", 'user_1'), 4)
+    assert wait_until(lambda: len(rasa.posts) == 4)
+
+    assert gateway.respond('one too many', 'user_1') is None
+    assert gateway.metrics['rejected_busy'] == 1
+    rasa.gate.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_cacheable_intents_are_answered_from_the_cache(rasa, gateway):
+    assert gateway.respond('I have a fever', 'user_1', intent='fever') == 'Drink water and rest.'
+    assert gateway.respond('  i have a FEVER? ', 'user_2', intent='fever') == 'Drink water and rest.'
+    assert len(rasa.posts) == 1
+
+    gateway.respond('hello', 'user_1', intent='greet')
+    gateway.respond('hello', 'user_1', intent='greet')
+    assert len(rasa.posts) == 3
+
+
+def test_failures_are_not_cached(rasa, gateway):
+    rasa.mode = 'error'
+    assert gateway.respond('fever', 'user_1', intent='fever') is None
+    rasa.mode = 'ok'
+    assert gateway.respond('fever', 'user_1', intent='fever') == 'Drink water and rest.'
+
+
+# ---------- respond_async ----------
+
+def run_async(gateway, *calls):
+    """Run respond_async calls concurrently on a fresh event loop"""
+    async def main():
+        try:
+            return await asyncio.gather(*(gateway.respond_async(*call) for call in calls))
+        finally:
+            await gateway.close_async()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def async_gateway(gateway):
+    pytest.importorskip('aiohttp')
+    return gateway
+
+
+def test_respond_async_returns_the_reply(rasa, async_gateway):
+    assert run_async(async_gateway, ('I have a fever', 'user_1')) == ['Drink water and rest.']
+    assert async_gateway.metrics['successes'] == 1
+
+
+def test_respond_async_error_and_timeout_fall_back_to_none(rasa, async_gateway):
+    rasa.mode = 'error'
+    assert run_async(async_gateway, ('hello', 'user_1')) == [None]
+    rasa.mode, rasa.delay = 'slow', 1.0
+    assert run_async(async_gateway, ('hello again', 'user_1')) == [None]
+
+    assert async_gateway.metrics['failures'] == 2
+    assert async_gateway.metrics['timeouts'] == 1
+
+
+def test_respond_async_breaker_opens_and_closes(rasa, async_gateway):
+    rasa.mode, rasa.healthy = 'error', False
+    run_async(async_gateway, *[(f"message {number}", 'user_1') for number in range(3)])
+    assert async_gateway.breaker.state == 'open'
+
+    posts = len(rasa.posts)
+    assert run_async(async_gateway, ('another', 'user_1')) == [None]
+    assert len(rasa.posts) == posts
+
+    rasa.mode, rasa.healthy = 'ok', True
+    assert wait_until(lambda: async_gateway.breaker.state == 'closed')
+    assert run_async(async_gateway, ('back again', 'user_1')) == ['Drink water and rest.']
+
+
+def test_respond_async_coalesces_identical_requests(rasa, async_gateway):
+    rasa.mode, rasa.delay = 'slow', 0.1
+    results = run_async(async_gateway, *[('My head hurts', 'user_1')] * 5)
+
+    assert results == ['Drink water and rest.'] * 5
+    assert len(rasa.posts) == 1
+    assert async_gateway.metrics['coalesced'] == 4
+
+
+def test_respond_async_uses_the_cache(rasa, async_gateway):
+    run_async(async_gateway, ('I have a fever', 'user_1', 'fever'))
+    assert run_async(async_gateway, ('i have a fever!', 'user_2', 'fever')) == ['Drink water and rest.']
+    assert len(rasa.posts) == 1
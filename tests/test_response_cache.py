@@ -0,0 +1,43 @@
+import pytest
+
+from response_cache import ResponseCache, normalize_query
+
+
+@pytest.mark.parametrize('first, second', [
+    ('I cannot sleep', 'I cannot slip'),
+    ('I feel dizzy', 'I fill dizzy'),
+    ('my feet hurt', 'my fit hurt'),
+    ('good food', 'god fod'),
+    ('swelling', 'svelling'),
+    ('zinc', 'jinc'),
+    ('phone', 'fone'),
+    ('door', 'dur'),
+])
+def test_english_words_are_not_folded(first, second):
+    assert normalize_query(first) != normalize_query(second)
+
+
+@pytest.mark.parametrize('first, second', [
+    ('theek nahi hai', 'thik nahi hai'),
+    ('bukhaar hai', 'bukhar hai'),
+    ('zukam', 'jukam'),
+    ('neend nahi aati', 'nind nahi aati'),
+    ('dawai', 'davai'),
+    ('khaana', 'khana'),
+])
+def test_hinglish_spelling_variants_share_a_key(first, second):
+    assert normalize_query(first) == normalize_query(second)
+
+
+def test_case_punctuation_and_whitespace_are_ignored():
+    assert normalize_query('  What is a FEVER?! ') == normalize_query('what is a fever')
+
+
+def test_devanagari_variants_share_a_key():
+    # Nukta dropped, chandrabindu written as anusvara; the danda is punctuation
+    assert normalize_query('ज़ुकाम।') == normalize_query('जुकाम')
+    assert normalize_query('हँसी') == normalize_query('हंसी')
+
+
+def test_key_includes_language():
+    assert ResponseCache.key('fever', 'en') != ResponseCache.key('fever', 'hi')
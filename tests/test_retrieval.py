@@ -0,0 +1,133 @@
+import json
+import math
+import os
+import pickle
+import random
+
+import pytest
+
+from retrieval import RetrievalIndex, tokenize
+
+WORDS = ['fever', 'headache', 'rest', 'water', 'fluids', 'sleep', 'cough', 'cold', 'diet', 'fruit',
+         'exercise', 'walk', 'pain', 'doctor', 'medicine', 'heat', 'salt', 'sugar', 'tea', 'ginger']
+
+
+def exhaustive_search(index, query, language='en', k=5, min_terms=1, min_score=0.0):
+    """Score every document with BM25 and return (doc_id, score) pairs, best first"""
+    language_index = index._indexes[language]
+    n_docs = len(language_index.doc_len)
+    avgdl = language_index.total_len / n_docs
+    terms = [term for term in set(tokenize(query, language)) if term in language_index.postings]
+
+    scored = []
+    for doc_id, length in language_index.doc_len.items():
+        score, matched = 0.0, 0
+        for term in terms:
+            docs = language_index.postings[term]
+            tf = docs.get(doc_id)
+            if tf:
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                score += idf * tf * (index.k1 + 1) / (tf + index.k1 * (1 - index.b + index.b * length / avgdl))
+                matched += 1
+        if matched and matched >= min_terms and score >= min_score:
+            scored.append((doc_id, score))
+    scored.sort(key=lambda pair: pair[1], reverse=True)
+    return scored[:k]
+
+
+def random_text(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+@pytest.fixture
+def corpus():
+    rng = random.Random(42)
+    index = RetrievalIndex(languages=('en', 'hi'))
+    for doc_id in range(1, 301):
+        index.upsert(doc_id, 'en', 'general', random_text(rng, 1, 3), random_text(rng, 3, 60))
+    return index, rng
+
+
+def assert_same_top_k(index, query, **options):
+    expected = exhaustive_search(index, query, **options)
+    hits = index.search(query, **options)
+
+    # Equal scores may be ordered either way, so compare scores and each hit's exact score
+    assert [hit.score for hit in hits] == [round(score, 4) for _, score in expected], query
+    exact = dict(exhaustive_search(index, query, **dict(options, k=len(index._indexes['en'].doc_len))))
+    for hit in hits:
+        assert hit.score == round(exact[hit.doc_id], 4)
+
+
+def test_threshold_top_k_matches_exhaustive_scoring(corpus):
+    index, rng = corpus
+    for _ in range(200):
+        query = random_text(rng, 1, 4)
+        assert_same_top_k(index, query, k=rng.choice([1, 3, 5, 10]), min_terms=rng.choice([1, 2]))
+
+
+def test_min_score_matches_exhaustive_scoring(corpus):
+    index, rng = corpus
+    for _ in range(50):
+        assert_same_top_k(index, random_text(rng, 1, 3), k=5, min_score=rng.uniform(0.5, 4.0))
+
+
+def test_top_k_stays_exact_after_updates(corpus):
+    # Upserts move avgdl away from the value the cached impact lists were built for
+    index, rng = corpus
+    index.search('fever rest')
+    for doc_id in rng.sample(range(1, 301), 120):
+        if rng.random() < 0.3:
+            index.remove(doc_id)
+        else:
+            index.upsert(doc_id, 'en', 'general', random_text(rng, 1, 3), random_text(rng, 40, 120))
+    for _ in range(100):
+        assert_same_top_k(index, random_text(rng, 1, 4), k=5)
+
+
+def test_save_and_load_round_trip(tmp_path, corpus):
+    index, rng = corpus
+    index.upsert(1000, 'hi', 'fever', 'बुखार', 'आराम करें और पानी पिएं', updated_at='2026-01-01')
+    index.path = str(tmp_path / 'kb.index')
+    index.save()
+    json.loads((tmp_path / 'kb.index').read_text(encoding='utf-8'))
+
+    loaded = RetrievalIndex(path=index.path, languages=('en', 'hi'))
+    assert loaded.load()
+    assert loaded.stats() == index.stats()
+    assert loaded._fingerprints == index._fingerprints
+    for _ in range(50):
+        query = random_text(rng, 1, 3)
+        assert loaded.search(query, k=5) == index.search(query, k=5)
+    assert loaded.search('बुखार', 'hi') == index.search('बुखार', 'hi')
+
+    loaded.remove(1000)
+    assert loaded.search('बुखार', 'hi') == []
+
+
+class Exploit:
+    def __reduce__(self):
+        return (os.mkdir, (self.marker,))
+
+
+@pytest.mark.parametrize('content', [b'', b'{not json', b'[]', b'{"format": 2, "params": [1.2, 0.75, 2], "indexes": {"en": {}}}'])
+def test_unreadable_index_is_rebuilt(tmp_path, content):
+    path = tmp_path / 'kb.index'
+    path.write_bytes(content)
+    assert RetrievalIndex(path=str(path)).load() is False
+
+
+def test_pickled_index_is_never_unpickled(tmp_path):
+    Exploit.marker = str(tmp_path / 'pwned')
+    path = tmp_path / 'kb.index'
+    path.write_bytes(pickle.dumps(Exploit()))
+
+    assert RetrievalIndex(path=str(path)).load() is False
+    assert not os.path.exists(Exploit.marker)
+
+
+def test_index_saved_with_other_settings_is_ignored(tmp_path, corpus):
+    index, _ = corpus
+    index.path = str(tmp_path / 'kb.index')
+    index.save()
+    assert RetrievalIndex(path=index.path, k1=1.5).load() is False
@@ -0,0 +1,172 @@
+import datetime
+import random
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from models import (Conversation, DailyActiveUser, Feedback, Message, StatsCounter, StatsDaily, StatsWatermark, User,
+                    db)
+from rollups import Rollups
+
+NOW = datetime.datetime(2026, 3, 20, 12, 0, 0)
+INTENTS = ['headache', 'fever', 'cold_flu', 'diet', None]
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'rollups.db'))
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def rollups():
+    return Rollups(StatsDaily, StatsCounter, DailyActiveUser, StatsWatermark, {
+        'messages': Message, 'conversations': Conversation, 'feedback': Feedback, 'users': User
+    })
+
+
+def add_history(session, rng, users=12, conversations=30, messages=400, feedback=60):
+    """Rows written before the rollups existed"""
+    user_ids = []
+    for number in range(users):
+        last_login = NOW - datetime.timedelta(days=rng.randint(0, 20), hours=rng.randint(0, 5)) if number % 4 else None
+        user = User(username=f"user{number}", email=f"user{number}@example.com", password_hash='x', last_login=last_login)
+        session.add(user)
+        session.flush()
+        user_ids.append(user.id)
+
+    conversation_ids = []
+    for _ in range(conversations):
+        conversation = Conversation(user_id=rng.choice(user_ids), start_time=NOW - datetime.timedelta(days=10))
+        session.add(conversation)
+        session.flush()
+        conversation_ids.append(conversation.id)
+
+    message_ids = []
+    for _ in range(messages):
+        sender = rng.choice(['user', 'bot'])
+        message = Message(conversation_id=rng.choice(conversation_ids), sender=sender, message='text',
+                          intent=rng.choice(INTENTS) if sender == 'bot' else None,
+                          timestamp=NOW - datetime.timedelta(days=rng.randint(0, 6), minutes=rng.randint(0, 600)))
+        session.add(message)
+        session.flush()
+        message_ids.append(message.id)
+
+    for _ in range(feedback):
+        session.add(Feedback(message_id=rng.choice(message_ids), user_id=rng.choice(user_ids),
+                             rating=rng.choice(['positive', 'negative', None]),
+                             created_at=NOW - datetime.timedelta(days=rng.randint(0, 6))))
+    session.commit()
+    return user_ids, conversation_ids
+
+
+def add_live_traffic(session, rollups, rng, user_ids, conversation_ids, turns=50):
+    """Rows written after install, counted by the write hooks as the app does"""
+    for _ in range(turns):
+        conversation_id = rng.choice(conversation_ids)
+        intent = rng.choice(INTENTS)
+        sent = NOW - datetime.timedelta(minutes=rng.randint(0, 300))
+        session.add_all([Message(conversation_id=conversation_id, sender='user', message='q', timestamp=sent),
+                         Message(conversation_id=conversation_id, sender='bot', message='a', intent=intent, timestamp=sent)])
+        rollups.record_messages(session, [(sent, 'user', None), (sent, 'bot', intent)])
+
+        if rng.random() < 0.2:
+            rating = rng.choice(['positive', 'negative'])
+            session.add(Feedback(message_id=1, user_id=rng.choice(user_ids), rating=rating, created_at=sent))
+            rollups.record_feedback(session, rating, sent)
+        session.commit()
+
+    conversation = Conversation(user_id=user_ids[0], start_time=NOW)
+    session.add(conversation)
+    rollups.record_messages(session, [], new_conversations=1)
+    user = User(username='late', email='late@example.com', password_hash='x', last_login=NOW)
+    session.add(user)
+    session.flush()
+    rollups.record_new_user(session)
+    rollups.record_sign_in(session, user.id, NOW)
+    session.commit()
+
+
+def live_aggregates(session):
+    """The dashboard numbers computed straight from the source tables, as before the rollups"""
+    positive = session.execute(select(func.count(Feedback.id)).where(Feedback.rating == 'positive')).scalar()
+    total_feedback = session.execute(select(func.count(Feedback.id))).scalar()
+    return {
+        'total_users': session.execute(select(func.count(User.id))).scalar(),
+        'active_users': session.execute(
+            select(func.count(User.id)).where(User.last_login >= NOW - datetime.timedelta(days=30))
+        ).scalar(),
+        'total_queries': session.execute(select(func.count(Message.id)).where(Message.sender == 'user')).scalar(),
+        'total_conversations': session.execute(select(func.count(Conversation.id))).scalar(),
+        'positive_feedback_count': positive,
+        'total_feedback_count': total_feedback,
+        'positive_feedback_percentage': round(positive / total_feedback * 100, 2) if total_feedback else 0,
+        'query_trends': [
+            {'date': day, 'count': count} for day, count in session.execute(
+                select(func.date(Message.timestamp), func.count(Message.id))
+                .where(Message.sender == 'user').group_by(func.date(Message.timestamp)).order_by(func.date(Message.timestamp))
+            )
+        ],
+        'intents': dict(session.execute(
+            select(Message.intent, func.count(Message.id)).where(Message.intent.isnot(None)).group_by(Message.intent)
+        ).all())
+    }
+
+
+def rollup_aggregates(session, rollups):
+    stats = rollups.dashboard(session, now=NOW)
+    intents = dict(session.execute(
+        select(StatsDaily.key, func.sum(StatsDaily.count)).where(StatsDaily.metric == 'intent').group_by(StatsDaily.key)
+    ).all())
+    del stats['top_intents']
+    return dict(stats, intents=intents)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 50000])
+def test_rollups_after_backfill_equal_live_aggregates(session, rollups, chunk_size):
+    rng = random.Random(chunk_size)
+    user_ids, conversation_ids = add_history(session, rng)
+
+    rollups.install_watermarks(session)
+    add_live_traffic(session, rollups, rng, user_ids, conversation_ids)
+    rollups.backfill(session, chunk_size=chunk_size)
+
+    assert rollup_aggregates(session, rollups) == live_aggregates(session)
+
+
+def test_backfill_runs_once(session, rollups):
+    rng = random.Random(3)
+    add_history(session, rng)
+
+    first = rollups.backfill(session, chunk_size=100)
+    expected = rollup_aggregates(session, rollups)
+
+    assert first > 0
+    assert rollups.backfill(session) == 0
+    assert rollup_aggregates(session, rollups) == expected == live_aggregates(session)
+
+
+def test_interrupted_backfill_resumes_without_double_counting(session, rollups, monkeypatch):
+    rng = random.Random(5)
+    add_history(session, rng)
+    backfill_chunk = rollups._backfill_chunk
+    calls = []
+
+    def failing_chunk(session, source, low, high):
+        calls.append(source)
+        if len(calls) == 3:
+            raise RuntimeError('worker killed')
+        backfill_chunk(session, source, low, high)
+
+    monkeypatch.setattr(rollups, '_backfill_chunk', failing_chunk)
+    with pytest.raises(RuntimeError):
+        rollups.backfill(session, chunk_size=50)
+    session.rollback()
+
+    monkeypatch.setattr(rollups, '_backfill_chunk', backfill_chunk)
+    rollups.backfill(session, chunk_size=50)
+
+    assert rollup_aggregates(session, rollups) == live_aggregates(session)
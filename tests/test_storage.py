@@ -0,0 +1,132 @@
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.pool import QueuePool
+
+from migrations import MIGRATIONS, status, upgrade
+from models import SchemaMigration, db as models_db
+from storage import REPLICA_BIND, RoutingSession, engine_options, normalize_url, read_replica
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('postgres://user:secret@db:5432/wellbot', 'postgresql://user:secret@db:5432/wellbot'),
+    ('postgresql://db/wellbot', 'postgresql://db/wellbot'),
+    ('sqlite:///wellbot.db', 'sqlite:///wellbot.db'),
+    (None, None),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_sqlite_file_gets_a_queue_pool():
+    options = engine_options('sqlite:///wellbot.db', pool_size=3)
+    assert options['poolclass'] is QueuePool
+    assert options['pool_size'] == 3
+    assert options['max_overflow'] == -1
+    assert options['connect_args'] == {'check_same_thread': False}
+
+
+@pytest.mark.parametrize('url', ['sqlite://', 'sqlite:///:memory:'])
+def test_in_memory_sqlite_keeps_the_defaults(url):
+    assert engine_options(url) == {}
+
+
+def test_server_databases_get_a_bounded_checked_pool():
+    options = engine_options('postgres://db/wellbot', pool_size=4, max_overflow=2, statement_timeout_ms=1500)
+    assert (options['pool_size'], options['max_overflow'], options['pool_pre_ping']) == (4, 2, True)
+    assert options['connect_args'] == {'application_name': 'wellbot', 'options': '-c statement_timeout=1500'}
+
+    mysql = engine_options('mysql://db/wellbot')
+    assert mysql['pool_pre_ping'] is True
+    assert 'connect_args' not in mysql
+
+
+# ---------- read replica routing ----------
+
+routed_db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+class Note(routed_db.Model):
+    __tablename__ = 'notes'
+    id = routed_db.Column(routed_db.Integer, primary_key=True)
+    text = routed_db.Column(routed_db.String(50))
+
+
+def make_app(tmp_path, replica=True):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'primary.db')
+    if replica:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: 'sqlite:///' + str(tmp_path / 'replica.db')}
+    routed_db.init_app(app)
+    with app.app_context():
+        databases = {None: 'primary', REPLICA_BIND: 'replica'} if replica else {None: 'primary'}
+        for bind, text in databases.items():
+            engine = routed_db.engines[bind]
+            Note.__table__.create(engine)
+            with engine.begin() as conn:
+                conn.execute(Note.__table__.insert().values(id=1, text=text))
+
+    @app.route('/report')
+    @read_replica
+    def report():
+        return routed_db.session.get(Note, 1).text
+
+    @app.route('/plain')
+    def plain():
+        return routed_db.session.get(Note, 1).text
+
+    @app.route('/write', methods=['POST'])
+    @read_replica
+    def write():
+        routed_db.session.add(Note(id=2, text='written'))
+        routed_db.session.commit()
+        return routed_db.session.query(Note).filter(Note.id == 2).with_for_update().one().text
+
+    return app
+
+
+def test_marked_routes_read_from_the_replica(tmp_path):
+    client = make_app(tmp_path).test_client()
+    assert client.get('/report').text == 'replica'
+    assert client.get('/plain').text == 'primary'
+
+
+def test_writes_and_locking_reads_stay_on_the_primary(tmp_path):
+    app = make_app(tmp_path)
+    assert app.test_client().post('/write').text == 'written'
+    with app.app_context():
+        with routed_db.engines[REPLICA_BIND].connect() as conn:
+            assert conn.execute(Note.__table__.select().where(Note.id == 2)).first() is None
+
+
+def test_without_a_replica_everything_reads_the_primary(tmp_path):
+    assert make_app(tmp_path, replica=False).test_client().get('/report').text == 'primary'
+
+
+# ---------- migrations ----------
+
+def test_upgrade_creates_the_schema_and_applies_each_migration_once(tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'fresh.db'))
+
+    assert upgrade(engine, models_db.metadata, SchemaMigration) == [name for _, name, _ in MIGRATIONS]
+    assert set(models_db.metadata.tables) <= set(inspect(engine).get_table_names())
+    assert upgrade(engine, models_db.metadata, SchemaMigration) == []
+    assert all(applied_at is not None for _, _, applied_at in status(engine, SchemaMigration))
+
+
+def test_status_before_any_upgrade(tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'empty.db'))
+    assert status(engine, SchemaMigration) == [(version, name, None) for version, name, _ in MIGRATIONS]
+
+
+def test_upgrade_adds_missing_indexes_to_existing_tables(tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'old.db'))
+    messages = models_db.metadata.tables['messages']
+    messages.create(engine)
+    for index in messages.indexes:
+        index.drop(engine)
+
+    upgrade(engine, models_db.metadata, SchemaMigration)
+
+    assert {index['name'] for index in inspect(engine).get_indexes('messages')} >= {index.name for index in messages.indexes}
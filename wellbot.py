@@ -0,0 +1,144 @@
+"""WellBot command line: `python -m wellbot serve --workers N --threads M`"""
+import argparse
+import gc
+import os
+import sys
+
+from config import Config
+from storage import dispose_engines
+
+# ==================== WORKER HOOKS ====================
+
+def post_fork(server, worker):
+    """Give each worker its own database connections and id block"""
+    from app import app, db, chat_store, last_login_writer
+    with app.app_context():
+        # Pooled connections opened by the master (every bind) must never be used by two processes
+        dispose_engines(db)
+    chat_store.after_fork()
+    last_login_writer.after_fork()
+
+def worker_exit(server, worker):
+    """Write out queued chat rows and sign-ins before the worker goes away"""
+    from app import chat_store, last_login_writer
+    chat_store.stop()
+    last_login_writer.stop()
+
+def on_reload(server):
+    """SIGHUP: refresh knowledge base tables in the master so replacement workers inherit them"""
+    from app import app, db, refresh_lookup_tables
+    refresh_lookup_tables()
+    with app.app_context():
+        dispose_engines(db)
+    gc.freeze()
+    print("🔄 Lookup tables refreshed, replacing workers")
+
+# ==================== SERVER ====================
+
+def preload():
+    """Import the app, initialize the database once and build every lookup table before forking"""
+    from app import app, db, init_db
+    init_db()
+    with app.app_context():
+        dispose_engines(db)
+    # Move everything loaded so far out of the garbage collector's reach so
+    # collections in the workers don't touch (and un-share) those pages
+    gc.freeze()
+    return app
+
+def serve_gunicorn(application, args):
+    from gunicorn.app.base import BaseApplication
+
+    class WellBotServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    WellBotServer(application, {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'accesslog': '-',
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+        'on_reload': on_reload
+    }).run()
+
+def serve_asgi(args):
+    import uvicorn
+    # Workers import asgi.py themselves (uvicorn spawns rather than forks); init_db already ran here
+    uvicorn.run(
+        'asgi:app',
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=5
+    )
+
+def serve(args):
+    application = preload()
+    print("\n" + "="*60)
+    print("🏥 WellBot Backend Server Starting...")
+    print("="*60)
+    print(f"📡 Server: http://{args.host}:{args.port}")
+    if args.asgi:
+        print(f"⚡ Async workers: {args.workers}, up to {Config.ASYNC_MAX_IN_FLIGHT} requests in flight each")
+    else:
+        print(f"⚙️ Workers: {args.workers} x {args.threads} threads")
+        print("🔄 kill -HUP <master pid> refreshes lookup tables and replaces workers gracefully")
+    print("🛑 kill -TERM <master pid> drains in-flight requests, then stops")
+    print("="*60 + "\n")
+
+    if args.asgi:
+        serve_asgi(args)
+        return
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        # e.g. Windows development machines: one process, threaded
+        print("⚠️ gunicorn is not installed, falling back to the single-process threaded server")
+        application.run(host=args.host, port=args.port, threaded=True, debug=False)
+        return
+    serve_gunicorn(application, args)
+
+# ==================== MAIN ====================
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m wellbot', description='WellBot server')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='Run the production server (preforked workers)')
+    serve_parser.add_argument('--host', default=Config.HOST)
+    serve_parser.add_argument('--port', type=int, default=Config.PORT)
+    serve_parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS or os.cpu_count() or 1)
+    serve_parser.add_argument('--threads', type=int, default=Config.SERVER_THREADS)
+    serve_parser.add_argument('--timeout', type=int, default=Config.SERVER_TIMEOUT_SECONDS)
+    serve_parser.add_argument('--graceful-timeout', type=int, default=Config.SERVER_GRACEFUL_TIMEOUT_SECONDS)
+    serve_parser.add_argument('--max-requests', type=int, default=Config.SERVER_MAX_REQUESTS)
+    serve_parser.add_argument('--asgi', action='store_true',
+                              help='Serve chat, history and feedback on asyncio (uvicorn) instead of threads')
+    serve_parser.set_defaults(handler=serve)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())